@@ -1,12 +1,95 @@
 """
-Emits VM commands into a file, using VM command syntax.
+Emits VM commands into a file, using VM command syntax. Commands are kept in an in-memory instruction buffer, where
+later passes can address and rewrite them, and are written to the file in bulk by flush(), as text or as vmBytecode.
 """
+import vmBytecode
 
 arithmetic_table = {'-': 'sub', '+': 'add', '=': 'eq', '>':'gt', '<': 'lt' , '&': 'and', '|':'or', '~': 'not'}
 
+# pre-rendered push/pop commands for the hot segment indexes, other commands are rendered once and cached here.
+push_commands = {}
+pop_commands = {}
+for _segment in ('constant', 'argument', 'local', 'static', 'this', 'that', 'pointer', 'temp'):
+    for _index in range(16):
+        push_commands[_segment, _index] = f"push {_segment} {_index}"
+        if _segment != 'constant':
+            pop_commands[_segment, _index] = f"pop {_segment} {_index}"
+
+
+def constant_commands(value):
+    """
+    Return the push commands of a signed 16-bit value, push constant only takes 0..32767.
+    :param value: int
+    :return: list of VM command strings
+    """
+    if value >= 0:
+        return [f"push constant {value}"]
+    elif value > -32768:
+        return [f"push constant {-value}", 'neg']
+    return ['push constant 32767', 'not']
+
+
+# longest add sequence multiply_commands emits in place of a Math.multiply call. Translated by hackWriter, a call site
+# of Math.multiply takes 18 Hack instructions and the textbook Math.multiply runs about 1500 cycles, while a sequence
+# of 32 commands takes 114 instructions and as many cycles: the cap covers every factor below 64 and the round ones
+# such as 100, for at most 96 more instructions per call site (see test_VMWriter).
+max_multiply_commands = 32
+
+
+def multiply_commands(value):
+    """
+    Return add commands multiplying the top of the stack by a constant, doubling it once per binary digit of value
+    and adding the original value for every set bit. temp 1 duplicates the top of the stack and temp 2 keeps the
+    original value, temp 0 being left to the code around.
+    :param value: int, the constant factor
+    :return: list of VM command strings, or None when a call of Math.multiply is shorter
+    """
+    factor = abs(value)
+    if factor < 2 or factor > 32767:
+        return None
+    digits = bin(factor)[3:]  # the leading 1 is the value itself
+    double = ['pop temp 1', 'push temp 1', 'push temp 1', 'add']
+    if '1' not in digits:
+        commands = double * len(digits)
+    else:
+        commands = ['pop temp 2', 'push temp 2']
+        for digit in digits:
+            commands += double
+            if digit == '1':
+                commands += ['push temp 2', 'add']
+    if value < 0:
+        commands.append('neg')
+    if len(commands) > max_multiply_commands:
+        return None
+    return commands
+
+
 class VMWritter:
-    def __init__(self, vm_file):
+    def __init__(self, vm_file, optimizer=None, bytecode=False):
+        """
+        Initialize VMWritter with the file object passed in.
+        :param vm_file: file object for the .vm output, a binary one for bytecode
+        :param optimizer: optional vmOptimizer.PeepholeOptimizer run over the buffer before it is written
+        :param bytecode: write the binary .vmb format of vmBytecode instead of text
+        """
         self.vm_file = vm_file
+        self.optimizer = optimizer
+        self.bytecode = bytecode
+        self.instructions = []
+
+    def flush(self):
+        """
+        writes every buffered VM command to the vm_file in a single write and empties the buffer.
+        :return:
+        """
+        instructions = self.instructions
+        if self.optimizer is not None:
+            instructions = self.optimizer.optimize(instructions)
+        if self.bytecode:
+            self.vm_file.write(vmBytecode.encode(instructions))
+        elif instructions:
+            self.vm_file.write('\n'.join(instructions) + '\n')
+        self.instructions = []
 
     def writePush(self, segment, index):
         """
@@ -15,7 +98,10 @@ class VMWritter:
         :param index: integer
         :return:
         """
-        self.vm_file.write(f"push {segment} {index}\n")
+        command = push_commands.get((segment, index))
+        if command is None:
+            command = push_commands[segment, index] = f"push {segment} {index}"
+        self.instructions.append(command)
 
     def writePop(self, segment, index):
         """
@@ -24,10 +110,33 @@ class VMWritter:
         :param index:
         :return:
         """
-        self.vm_file.write(f"pop {segment} {index}\n")
+        command = pop_commands.get((segment, index))
+        if command is None:
+            command = pop_commands[segment, index] = f"pop {segment} {index}"
+        self.instructions.append(command)
 
 
 
+    def writeConstant(self, value):
+        """
+        writes the VM commands pushing a signed 16-bit value
+        :param value: int
+        :return:
+        """
+        self.instructions += constant_commands(value)
+
+    def writeString(self, string):
+        """
+        writes the VM commands building a new String object holding string
+        :param string: string constant, without quotes
+        :return:
+        """
+        self.writePush('constant', len(string))
+        self.writeCall('String.new', 1)
+        for char in string:
+            self.writePush('constant', ord(char))
+            self.writeCall('String.appendChar', 2)
+
     def writeArithmetic(self, command, unary=False):
         """
         writes a VM arithmetic command.
@@ -39,9 +148,9 @@ class VMWritter:
         elif command == '/':
             self.writeCall('Math.divide', 2)
         elif command == '-' and unary == True:
-            self.vm_file.write('neg\n')
+            self.instructions.append('neg')
         else:
-            self.vm_file.write(f"{arithmetic_table[command]}\n")
+            self.instructions.append(arithmetic_table[command])
 
     def writeLabel(self, label):
         """
@@ -49,7 +158,7 @@ class VMWritter:
         :param label: string
         :return:
         """
-        self.vm_file.write(f"label {label}\n")
+        self.instructions.append(f"label {label}")
 
 
 
@@ -59,7 +168,7 @@ class VMWritter:
         :param label: string
         :return:
         """
-        self.vm_file.write(f"goto {label}\n")
+        self.instructions.append(f"goto {label}")
 
     def writeIf(self, label):
         """
@@ -67,7 +176,7 @@ class VMWritter:
         :param label:
         :return:
         """
-        self.vm_file.write(f"if-goto {label}\n")
+        self.instructions.append(f"if-goto {label}")
 
     def writeCall(self, name, nArgs):
         """
@@ -76,7 +185,7 @@ class VMWritter:
         :param nArgs:
         :return:
         """
-        self.vm_file.write(f"call {name} {nArgs}\n")
+        self.instructions.append(f"call {name} {nArgs}")
 
     def writeFunction(self, name, nlocals):
         """
@@ -85,7 +194,7 @@ class VMWritter:
         :param nlocals:
         :return:
         """
-        self.vm_file.write(f'function {name} {nlocals}\n')
+        self.instructions.append(f'function {name} {nlocals}')
 
 
 
@@ -94,4 +203,4 @@ class VMWritter:
         writes a VM return command
         :return:
         """
-        self.vm_file.write(f"return\n")
\ No newline at end of file
+        self.instructions.append("return")
@@ -0,0 +1,289 @@
+"""
+Benchmark suite of the compiler. Generates synthetic Jack programs of controllable size and shape, then times each phase
+of the compiler separately: tokenizing, parsing into the AST, VM emission and XML emission. Reports tokens per second,
+peak memory and how the time scales with the number of classes and with the size of a single class, and saves the
+results as JSON so two runs can be compared against a regression threshold:
+
+    python benchmark.py --json before.json
+    python benchmark.py --compare before.json --threshold 0.1
+"""
+
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import tokenizer, compilationEngine, tokenStream, codeGenerator, VMWriter, vmOptimizer, xmlWriter
+
+phases = ('tokenize', 'parse', 'vm', 'xml')
+
+# program shapes of the suite, as generate_program arguments
+shapes = {
+    'mixed': {'classes': 8, 'subroutines': 6, 'statements': 30},
+    'classes': {'classes': 60, 'subroutines': 2, 'statements': 5},
+    'expressions': {'classes': 2, 'subroutines': 4, 'statements': 20, 'depth': 40},
+    'strings': {'classes': 2, 'subroutines': 4, 'statements': 30, 'string_length': 400},
+    'locals': {'classes': 2, 'subroutines': 4, 'statements': 60, 'locals': 200},
+}
+
+# scaling curves, as the generate_program argument they grow and the fixed arguments of their programs: more classes
+# of the default size, or a single class whose one method grows
+scaling_curves = {
+    'classes': {},
+    'statements': {'classes': 1, 'subroutines': 1},
+}
+
+
+def generate_expression(depth, locals):
+    """
+    Generate a Jack expression nested depth parentheses deep.
+    :param depth: nesting depth
+    :param locals: number of local variables l0.. the expression can read
+    :return: string of jack expression
+    """
+    expression = 'p'
+    for level in range(depth):
+        expression = f'(l{level % locals} - ({expression}) + {level}) * q'
+    return expression
+
+
+def generate_program(classes=8, subroutines=6, statements=30, depth=3, string_length=20, locals=8):
+    """
+    Generate the sources of a Jack program of a given shape. Every class calls into the next one, so the program
+    compiles as a whole.
+    :param classes: number of classes, besides Main
+    :param subroutines: number of methods of each class
+    :param statements: number of statements of each method
+    :param depth: nesting depth of the expressions
+    :param string_length: length of the string literals
+    :param locals: number of local variables of each method
+    :return: dict of class name to its jack source
+    """
+    text = ('The quick brown fox jumps over the lazy dog. ' * (string_length // 45 + 1))[:string_length]
+    names = [f'C{i}' for i in range(classes)]
+    sources = {'Main': '\n'.join(['class Main {', '    function void main() {', '        var C0 c;',
+                                  '        let c = C0.new();', '        do c.m0(1, 2);', '        return;', '    }',
+                                  '}', ''])}
+    local_names = ', '.join(f'l{i}' for i in range(locals))
+    for index, name in enumerate(names):
+        other = names[(index + 1) % classes]
+        lines = [f'class {name} {{', '    field int f0, f1;', '    static int s0;',
+                 f'    constructor {name} new() {{', '        let f0 = 0;', '        let f1 = 1;',
+                 '        return this;', '    }',
+                 '    function int helper(int a, int b) {', '        return a + b;', '    }']
+        for subroutine in range(subroutines):
+            lines += [f'    method int m{subroutine}(int p, int q) {{', f'        var int {local_names};',
+                      '        var String s;', '        var Array arr;', '        let arr = Array.new(4);']
+            for statement in range(statements):
+                local = f'l{statement % locals}'
+                kind = statement % 6
+                if kind == 0:
+                    lines.append(f'        let {local} = {generate_expression(depth, locals)};')
+                elif kind == 1:
+                    lines += [f'        let s = "{text}";', '        do Output.printString(s);']
+                elif kind == 2:
+                    lines += [f'        while ({local} < {statement}) {{', f'            let {local} = {local} + 1;',
+                              '        }']
+                elif kind == 3:
+                    lines += [f'        if ({local} > p) {{', f'            let f0 = {local};', '        } else {',
+                              '            let f1 = ~f0 & q;', '        }']
+                elif kind == 4:
+                    lines.append(f'        let arr[{statement % 4}] = {other}.helper({local}, s0);')
+                else:
+                    lines.append(f'        let s0 = s0 + {local} * 2;')
+            lines += ['        return l0;', '    }']
+        lines += ['}', '']
+        sources[name] = '\n'.join(lines)
+    return sources
+
+
+def time_phases(sources, optimize=0):
+    """
+    Compile jack sources in memory, one phase at a time over all of them.
+    :param sources: dict of class name to jack source
+    :param optimize: optimization level of the VM code
+    :return: tuple of (number of tokens, dict of phase name to seconds)
+    """
+    seconds = {}
+    start = time.perf_counter()
+    token_lists = []
+    for source in sources.values():
+        tokenizer_object = tokenizer.Tokenizer(io.StringIO(source), None)
+        token_lists.append(list(tokenizer_object.generate_tokens()))
+    seconds['tokenize'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    trees = []
+    for tokens in token_lists:
+        compile_object = compilationEngine.CompilationEngline(None, io.StringIO(), optimize)
+        compile_object.tokens = tokenStream.TokenStream(tokens)
+        trees.append(compile_object.parseClass())
+    seconds['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for tree in trees:
+        vm_writer = VMWriter.VMWritter(io.StringIO(), vmOptimizer.optimizer(optimize))
+        codeGenerator.CodeGenerator(vm_writer, optimize >= 1, False, optimize >= 1).compileClass(tree)
+    seconds['vm'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for tokens, tree in zip(token_lists, trees):
+        token_file = io.StringIO()
+        token_file.write('<tokens>\n' + ''.join(map(tokenizer.xml_line, tokens)) + '</tokens>\n')
+        xmlWriter.XMLWriter(io.StringIO()).writeClass(tree)
+    seconds['xml'] = time.perf_counter() - start
+    return sum(map(len, token_lists)), seconds
+
+
+def peak_memory(sources, optimize=0):
+    """
+    Return the peak memory allocated while compiling jack sources, measured apart from the timings as tracemalloc
+    slows everything down.
+    :param sources: dict of class name to jack source
+    :param optimize: optimization level of the VM code
+    :return: bytes
+    """
+    tracemalloc.start()
+    try:
+        time_phases(sources, optimize)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_shape(sources, repeat=3, optimize=0):
+    """
+    Benchmark the phases of the compiler over jack sources, keeping the best time of each phase over repeat runs.
+    :param sources: dict of class name to jack source
+    :param repeat: number of runs
+    :param optimize: optimization level of the VM code
+    :return: dict of files, tokens, seconds (per phase), tokens_per_second (per phase and total) and peak_memory
+    """
+    best = {}
+    for run_index in range(repeat):
+        tokens, seconds = time_phases(sources, optimize)
+        for phase in phases:
+            best[phase] = min(best.get(phase, seconds[phase]), seconds[phase])
+    best['total'] = sum(best[phase] for phase in phases)
+    return {'files': len(sources), 'tokens': tokens, 'seconds': best,
+            'tokens_per_second': {phase: tokens / max(elapsed, 1e-9) for phase, elapsed in best.items()},
+            'peak_memory': peak_memory(sources, optimize)}
+
+
+def scaling(sizes=(1, 2, 4, 8, 16), repeat=3, optimize=0, dimension='classes'):
+    """
+    Benchmark programs of growing size, which should take a constant time per token if the compiler scales linearly.
+    :param sizes: values of the dimension of the generated programs
+    :param repeat: number of runs of each size
+    :param optimize: optimization level of the VM code
+    :param dimension: name of the scaling curve, see scaling_curves
+    :return: list of dicts of the dimension (its size), tokens, seconds and us_per_token
+    """
+    curve = []
+    for size in sizes:
+        result = benchmark_shape(generate_program(**scaling_curves[dimension], **{dimension: size}), repeat, optimize)
+        seconds = result['seconds']['total']
+        curve.append({dimension: size, 'tokens': result['tokens'], 'seconds': seconds,
+                      'us_per_token': seconds / result['tokens'] * 1e6})
+    return curve
+
+
+def run_suite(repeat=3, optimize=0, sizes=(1, 2, 4, 8, 16), statements=(1000, 2000, 4000, 8000, 16000)):
+    """
+    Run every shape of the suite and the scaling curves.
+    :param repeat: number of runs of each benchmark
+    :param optimize: optimization level of the VM code
+    :param sizes: numbers of classes of the classes scaling curve
+    :param statements: numbers of statements of the single class of the statements scaling curve
+    :return: dict of the results, as saved in JSON
+    """
+    return {'compiler_version': compilationEngine.compiler_version, 'python': platform.python_version(),
+            'repeat': repeat, 'optimize': optimize,
+            'shapes': {name: benchmark_shape(generate_program(**shape), repeat, optimize)
+                       for name, shape in shapes.items()},
+            'scaling': {'classes': scaling(sizes, repeat, optimize, 'classes'),
+                        'statements': scaling(statements, repeat, optimize, 'statements')}}
+
+
+def compare(baseline, results, threshold=0.1):
+    """
+    Compare results to a baseline run, per shape and phase, on the time per token.
+    :param baseline: dict of results of run_suite
+    :param results: dict of results of run_suite
+    :param threshold: largest relative slowdown that is not a regression, 0.1 for 10%
+    :return: list of (shape, phase, relative change) of the regressions
+    """
+    regressions = []
+    for name, result in results['shapes'].items():
+        before = baseline['shapes'].get(name)
+        if before is None:
+            continue
+        for phase in phases + ('total',):
+            old = before['seconds'][phase] / before['tokens']
+            new = result['seconds'][phase] / result['tokens']
+            change = new / old - 1 if old else 0.0
+            if change > threshold:
+                regressions.append((name, phase, change))
+    return regressions
+
+
+def print_results(results):
+    """
+    Print the results of run_suite as tables.
+    :param results: dict of results of run_suite
+    :return:
+    """
+    print(f"{'shape':<12} {'tokens':>8} " + ' '.join(f'{phase + " ktok/s":>14}' for phase in phases + ('total',))
+          + f" {'peak KiB':>10}")
+    for name, result in results['shapes'].items():
+        rates = ' '.join(f"{result['tokens_per_second'][phase] / 1000:>14.1f}" for phase in phases + ('total',))
+        print(f"{name:<12} {result['tokens']:>8} {rates} {result['peak_memory'] / 1024:>10.0f}")
+    for dimension, curve in results['scaling'].items():
+        print()
+        print(f"{dimension:>10} {'tokens':>10} {'seconds':>10} {'us/token':>10}")
+        for point in curve:
+            print(f"{point[dimension]:>10} {point['tokens']:>10} {point['seconds']:>10.3f} "
+                  f"{point['us_per_token']:>10.2f}")
+
+
+def main(argv=None):
+    """
+    Run the benchmark suite from the command line.
+    :param argv: list of command line arguments, defaults to sys.argv
+    :return: exit status, 1 if a regression is found by --compare
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the phases of the Jack compiler.")
+    parser.add_argument('--repeat', type=int, default=3, help="runs of each benchmark, the best is kept (default: 3)")
+    parser.add_argument('-O', dest='optimize', type=int, choices=(0, 1), default=0,
+                        help="optimization level of the VM code (default: 0)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16], metavar='N',
+                        help="numbers of classes of the scaling curve (default: 1 2 4 8 16)")
+    parser.add_argument('--statements', type=int, nargs='+', default=[1000, 2000, 4000, 8000, 16000], metavar='N',
+                        help="numbers of statements of the single class scaling curve "
+                             "(default: 1000 2000 4000 8000 16000)")
+    parser.add_argument('--json', metavar='PATH', help="save the results as JSON")
+    parser.add_argument('--compare', metavar='PATH', help="compare to the JSON results of a previous run")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="relative slowdown per token reported as a regression by --compare (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.repeat, args.optimize, args.sizes, args.statements)
+    print_results(results)
+    if args.json is not None:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+    if args.compare is not None:
+        with open(args.compare, 'r') as json_file:
+            regressions = compare(json.load(json_file), results, args.threshold)
+        for name, phase, change in regressions:
+            print(f"regression: {name} {phase} {change:+.1%} time per token", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"no regression above {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Persistent on-disk cache of compiled outputs. Each .jack file is keyed on a hash of its source, the compiler version
+and the compile options, so an unchanged file has its outputs restored from the cache instead of being recompiled.
+Entries are evicted by age and by total size, least recently used first. Next to the outputs, an entry keeps the
+metadata of the compilation that produced them, such as its token count.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import compilationEngine
+
+# version of the layout of the entries, part of every key
+entry_version = 2
+metadata_file = 'metadata.json'
+
+
+class BuildCache:
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024, max_age=30 * 24 * 3600):
+        """
+        Initialize BuildCache stored under directory.
+        :param directory: os path of the cache directory, created if missing
+        :param max_size: maximum total size of the cached outputs in bytes
+        :param max_age: maximum age in seconds of an entry since it was last used
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source, options):
+        """
+        Return the cache key of a source compiled with the given options.
+        :param source: bytes of the .jack file
+        :param options: dict of the compile options that change the outputs
+        :return: hex digest string
+        """
+        digest = hashlib.sha256()
+        digest.update(f'{compilationEngine.compiler_version}/{entry_version}'.encode())
+        digest.update(json.dumps(options, sort_keys=True).encode())
+        digest.update(source)
+        return digest.hexdigest()
+
+    def restore(self, key, output_paths):
+        """
+        Copy the cached outputs of key to output_paths.
+        :param key: cache key
+        :param output_paths: list of os paths to restore, matched by file name
+        :return: dict of the metadata stored with the outputs if every output was cached and restored, else None
+        """
+        entry = os.path.join(self.directory, key)
+        cached = [os.path.join(entry, os.path.basename(path)) for path in output_paths + [metadata_file]]
+        if not all(os.path.isfile(file) for file in cached):
+            return None
+        for file, path in zip(cached, output_paths):
+            shutil.copyfile(file, path)
+        with open(cached[-1], 'r') as file:
+            metadata = json.load(file)
+        # the entry mtime records its last use for eviction
+        os.utime(entry)
+        return metadata
+
+    def store(self, key, output_paths, metadata=None):
+        """
+        Add outputs to the cache under key. The entry is written aside and renamed into place, so concurrent
+        compilers never see a partial entry.
+        :param key: cache key
+        :param output_paths: list of os paths of the compiled outputs
+        :param metadata: JSON serializable dict returned by restore() along with the outputs
+        :return:
+        """
+        entry = os.path.join(self.directory, key)
+        if os.path.isdir(entry):
+            return
+        staging = os.path.join(self.directory, f'.{key}.{uuid.uuid4().hex}')
+        os.makedirs(staging)
+        for path in output_paths:
+            shutil.copyfile(path, os.path.join(staging, os.path.basename(path)))
+        with open(os.path.join(staging, metadata_file), 'w') as file:
+            json.dump(metadata or {}, file)
+        try:
+            os.rename(staging, entry)
+        except OSError:  # another process stored the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def evict(self):
+        """
+        Remove entries not used within max_age, then the least recently used entries until the cache fits max_size.
+        :return: number of entries removed
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isdir(entry):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+            entries.append((os.path.getmtime(entry), size, entry))
+        entries.sort()
+
+        now = time.time()
+        total = sum(size for mtime, size, entry in entries)
+        removed = 0
+        for mtime, size, entry in entries:
+            if now - mtime <= self.max_age and total <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
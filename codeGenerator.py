@@ -0,0 +1,535 @@
+"""
+Generates VM code from the AST of a Jack class, the second back end next to XMLWriter. Emits its commands through a
+VMWritter, and owns the symbol table of the class being compiled.
+"""
+
+import jackAST
+import symbolTable
+import VMWriter
+
+keyword_constants = {'true': -1, 'false': 0, 'null': 0}
+
+
+def wrap(value):
+    """
+    Return value wrapped into a signed 16-bit integer, as Jack integers overflow.
+    """
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+def fold_constant(operator, x, y):
+    """
+    Evaluate a binary operator on two constants with Jack's 16-bit semantics.
+    :param operator: jack operator
+    :param x: left operand
+    :param y: right operand
+    :return: int, or None if the operation has to be left to runtime (division by zero)
+    """
+    if operator == '+':
+        return wrap(x + y)
+    elif operator == '-':
+        return wrap(x - y)
+    elif operator == '*':
+        return wrap(x * y)
+    elif operator == '/':
+        if y == 0:
+            return None
+        quotient = abs(x) // abs(y)  # Math.divide truncates toward zero
+        return wrap(quotient if (x < 0) == (y < 0) else -quotient)
+    elif operator == '&':
+        return x & y
+    elif operator == '|':
+        return x | y
+    elif operator == '<':
+        return -1 if x < y else 0
+    elif operator == '>':
+        return -1 if x > y else 0
+    return -1 if x == y else 0
+
+
+def is_boolean(node):
+    """
+    Return whether an expression always evaluates to 0 or -1, the only values for which jumping on the condition and
+    jumping on its negation (not; if-goto) take the same branches.
+    :param node: jackAST.Expression
+    :return: bool
+    """
+    boolean = is_boolean_term(node.term)
+    for operator, term in node.operations:
+        if operator in ('<', '>', '='):
+            boolean = True
+        elif operator in ('&', '|'):
+            boolean = boolean and is_boolean_term(term)
+        else:
+            boolean = False
+    return boolean
+
+
+def is_boolean_term(node):
+    """
+    Return whether a term always evaluates to 0 or -1: true, false, or ~ of such a term, or such an expression in
+    parentheses.
+    :param node: term node
+    :return: bool
+    """
+    kind = type(node)
+    if kind is jackAST.KeywordConstant:
+        return node.value in ('true', 'false')
+    elif kind is jackAST.ParenExpression:
+        return is_boolean(node.expression)
+    elif kind is jackAST.UnaryOp:
+        return node.operator == '~' and is_boolean_term(node.term)
+    return False
+
+
+class CodeGenerator:
+
+    def __init__(self, vm_writer, fold_constants=False, pool_strings=False, branch_on_true=False):
+        """
+        Initialize CodeGenerator writing through vm_writer.
+        :param vm_writer: VMWriter.VMWritter
+        :param fold_constants: fold constant subexpressions at compile time
+        :param pool_strings: build each distinct string literal of the class once, see CompilationEngline
+        :param branch_on_true: lay out if and while statements whose condition is_boolean to jump on the condition
+        rather than on its negation, saving the not of the condition (and the goto of every loop iteration)
+        """
+        self.vm_file = vm_writer
+        self.fold_constants = fold_constants
+        self.pool_strings = pool_strings
+        self.branch_on_true = branch_on_true
+        self.symbol_table = symbolTable.symbolTable()
+        self.class_name = None
+        self.while_count = 0
+        self.if_count = 0
+        self.string_pool = {}  # string literal: its index in the pool
+        self.uses_string_pool = False  # whether the current subroutine pushes pooled literals
+        self.statements = {
+            jackAST.LetStatement: self.compileLet,
+            jackAST.IfStatement: self.compileIf,
+            jackAST.WhileStatement: self.compileWhile,
+            jackAST.DoStatement: self.compileDo,
+            jackAST.ReturnStatement: self.compileReturn,
+        }
+
+    def lookup(self, name):
+        """
+        look up a variable in the symbol table
+        :param name: varName
+        :return: symbolTable.Symbol
+        """
+        symbol = self.symbol_table.lookup(name)
+        if symbol is None:
+            raise TypeError(f"Undefined variable {name} in {self.class_name}")
+        return symbol
+
+    def compileClass(self, node):
+        """
+        compile a complete class, then flush its VM code.
+        :param node: jackAST.Class
+        :return:
+        """
+        self.startClass(node)
+        for subroutine in node.subroutines:
+            self.compileSubroutine(subroutine)
+        self.finishClass()
+
+    def startClass(self, node):
+        """
+        starts compiling a class, defining its class variables. Its subroutines are then compiled one at a time by
+        compileSubroutine, and finishClass ends it.
+        :param node: jackAST.Class, its subroutines are ignored
+        :return:
+        """
+        self.class_name = node.name
+        for class_var in node.class_vars:
+            for name in class_var.names:
+                self.symbol_table.define(name, class_var.type, class_var.kind)
+
+    def finishClass(self):
+        """
+        ends the class started by startClass, writing its string pool and flushing its VM code.
+        :return:
+        """
+        if self.string_pool:
+            self.writeStringPool()
+        self.vm_file.flush()
+
+    def compileSubroutine(self, node):
+        """
+        compiles a complete method, function, or constructor.
+        :param node: jackAST.SubroutineDec
+        :return:
+        """
+        # remove symbols from previous subroutine
+        self.symbol_table.startSubroutine()
+        if node.kind == 'method':
+            # in methods declaration: argument 0 is always name this, and type is set to class name
+            self.symbol_table.define('this', self.class_name, 'argument')
+        for type, name in node.parameters:
+            self.symbol_table.define(name, type, 'argument')
+        for var_dec in node.var_decs:
+            for name in var_dec.names:
+                self.symbol_table.define(name, var_dec.type, 'local')
+
+        self.vm_file.writeFunction(f'{self.class_name}.{node.name}', self.symbol_table.VarCount('local'))
+        body_start = len(self.vm_file.instructions)
+        self.uses_string_pool = False
+
+        if node.kind == 'method':
+            # VM code for method callee
+            self.vm_file.writePush('argument', 0)
+            self.vm_file.writePop('pointer', 0)
+
+        elif node.kind == 'constructor':
+            self.vm_file.writePush('constant', self.symbol_table.VarCount('field'))
+            self.vm_file.writeCall('Memory.alloc', 1)
+            self.vm_file.writePop('pointer', 0)
+
+        self.compileStatements(node.statements)
+
+        if self.uses_string_pool:
+            # builds the pooled literals on the first call of any subroutine using them
+            ready = '$strings$ready'
+            self.vm_file.instructions[body_start:body_start] = [
+                f'push static {self.pool_slot(0)}', f'if-goto {ready}',
+                f'call {self.class_name}.$strings 0', 'pop temp 0', f'label {ready}']
+
+    def pool_slot(self, index):
+        """
+        Return the static index holding a pooled string literal, the pool follows the static variables of the class.
+        :param index: index of the literal in the string pool
+        :return: int
+        """
+        return self.symbol_table.VarCount('static') + index
+
+    def writeStringPool(self):
+        """
+        writes the {class}.$strings function, which builds every pooled string literal into its static slot.
+        :return:
+        """
+        self.vm_file.writeFunction(f'{self.class_name}.$strings', 0)
+        # the first slot is written last, it marks the pool as built
+        for string, index in sorted(self.string_pool.items(), key=lambda item: -item[1]):
+            self.vm_file.writeString(string)
+            self.vm_file.writePop('static', self.pool_slot(index))
+        self.vm_file.writePush('constant', 0)
+        self.vm_file.writeReturn()
+
+    def compileStatements(self, statements):
+        """
+        compiles a sequence of statements.
+        :param statements: list of statement nodes
+        :return:
+        """
+        for statement in statements:
+            kind = type(statement)
+            if kind is jackAST.IfStatement:
+                self.if_count += 1
+            elif kind is jackAST.WhileStatement:
+                self.while_count += 1
+            self.statements[kind](statement)
+
+    def compileDo(self, node):
+        """
+        compiles a do statement, discarding the returned value.
+        :param node: jackAST.DoStatement
+        :return:
+        """
+        self.compileCall(node.call)
+        # do subroutine returns void: therefore pop temp 0
+        self.vm_file.writePop('temp', 0)
+
+    def compileCall(self, node):
+        """
+        compiles a subroutine call.
+        :param node: jackAST.SubroutineCall
+        :return:
+        """
+        if node.receiver is None:  # subroutineName(): a method called on this
+            self.vm_file.writePush('pointer', 0)
+            function_name = self.class_name + '.' + node.name
+            arg_count = 1
+        else:
+            symbol = self.symbol_table.lookup(node.receiver)
+            if symbol is not None:  # varName.subroutineName(): push the varName object into stack
+                self.vm_file.writePush(symbol.segment, symbol.index)
+                function_name = symbol.type + '.' + node.name
+                arg_count = 1  # start with 1 arg as the method object itself
+            else:  # className.subroutineName()
+                function_name = node.receiver + '.' + node.name
+                arg_count = 0
+
+        for argument in node.arguments:
+            self.compileExpression(argument)
+        self.vm_file.writeCall(function_name, arg_count + len(node.arguments))
+
+    def compileLet(self, node):
+        """
+        compiles a let statement.
+        :param node: jackAST.LetStatement
+        :return:
+        """
+        symbol = self.lookup(node.name)
+        if node.index is not None:
+            # VM code for varName[expression]:
+            self.vm_file.writePush(symbol.segment, symbol.index)
+            # VM code for computing and pushing the value of expression1
+            self.compileExpression(node.index)
+            # ADD the offset from expression 1.
+            self.vm_file.writeArithmetic('+')
+
+            # VM code for computing and pushing the value of expression2
+            self.compileExpression(node.value)
+
+            self.vm_file.writePop('temp', 0)  # // temp 0 = the value of expression2
+            self.vm_file.writePop('pointer', 1)
+            self.vm_file.writePush('temp', 0)
+            self.vm_file.writePop('that', 0)
+        else:
+            self.compileExpression(node.value)
+            self.vm_file.writePop(symbol.segment, symbol.index)
+
+    def compileWhile(self, node):
+        """
+        compiles a while statement.
+        :param node: jackAST.WhileStatement
+        :return:
+        """
+        while_count = self.while_count
+
+        if self.branch_on_true and is_boolean(node.condition):
+            # the loop is rotated to test its condition at the bottom, jumping back while it holds. W{n}false still
+            # marks the end of the loop for vmEmulator and vmCost.
+            label = 'W' + str(while_count)
+            self.vm_file.writeGoto(label + 'test')
+            self.vm_file.writeLabel(label + 'true')
+            self.compileStatements(node.statements)
+            self.vm_file.writeLabel(label + 'test')
+            self.compileExpression(node.condition)
+            self.vm_file.writeIf(label + 'true')
+            self.vm_file.writeLabel(label + 'false')
+            return
+
+        # while label for VM code label L1
+        self.vm_file.writeLabel('W' + str(while_count) + 'true')
+
+        self.compileExpression(node.condition)
+        # VM code for not, if-goto L2
+        self.vm_file.writeArithmetic('~')
+        self.vm_file.writeIf('W' + str(while_count) + 'false')
+
+        self.compileStatements(node.statements)
+
+        # VM code for goto L1
+        self.vm_file.writeGoto('W' + str(while_count) + 'true')
+
+        # VM code for L2
+        self.vm_file.writeLabel('W' + str(while_count) + 'false')
+
+    def compileReturn(self, node):
+        """
+        compiles a return statement.
+        :param node: jackAST.ReturnStatement
+        :return:
+        """
+        if node.value is not None:
+            self.compileExpression(node.value)
+        else:
+            # return void: push constant 0
+            self.vm_file.writePush('constant', 0)
+        self.vm_file.writeReturn()
+
+    def compileIf(self, node):
+        """
+        compiles a If statement, possibly with a trailing else clause
+        :param node: jackAST.IfStatement
+        :return:
+        """
+        label = f'{self.class_name}IF' + str(self.if_count)
+
+        self.compileExpression(node.condition)
+
+        if self.branch_on_true and is_boolean(node.condition):
+            # jump to the statements of the condition, laid out after the else statements
+            self.vm_file.writeIf(label + 'true')
+            if node.else_statements is not None:
+                self.compileStatements(node.else_statements)
+            self.vm_file.writeGoto(label + 'false')
+            self.vm_file.writeLabel(label + 'true')
+            self.compileStatements(node.statements)
+            self.vm_file.writeLabel(label + 'false')
+            return
+
+        # VM Code not to negate expression
+        self.vm_file.writeArithmetic('~')
+        # VM Code for if-go L1
+        self.vm_file.writeIf(label + 'true')
+
+        self.compileStatements(node.statements)
+
+        # handles else statements
+        if node.else_statements is not None:
+            # VM code for goto L2
+            self.vm_file.writeGoto(label + 'false')
+            # VM code for label L1
+            self.vm_file.writeLabel(label + 'true')
+            self.compileStatements(node.else_statements)
+            # VM code for label L2
+            self.vm_file.writeLabel(label + 'false')
+
+        else:
+            # VM code for label L1
+            self.vm_file.writeLabel(label + 'true')
+
+    def compileExpression(self, node):
+        """
+        compiles an expression.
+        :param node: jackAST.Expression
+        :return:
+        """
+        value = self.foldExpression(node)
+        if value is not None:
+            self.vm_file.writeConstant(value)
+
+    def foldExpression(self, node):
+        """
+        compiles an expression, folding constant subexpressions when fold_constants is set. Jack has no operator
+        precedence, so operations are folded strictly from left to right.
+        :param node: jackAST.Expression
+        :return: value of the expression if it is constant, in which case no VM code is written for it, else None
+        """
+        instructions = self.vm_file.instructions
+        start = len(instructions)
+        value = self.compileTerm(node.term)
+        for operator, term in node.operations:
+            right_start = len(instructions)
+            right = self.compileTerm(term)
+            value = self.foldOperation(operator, value, right, start, right_start)
+        return value
+
+    def foldOperation(self, operator, left, right, start, right_start):
+        """
+        writes the VM code of a binary operation whose operands may be constants that were not written yet.
+        :param operator: jack operator
+        :param left: value of the left operand if constant, else None
+        :param right: value of the right operand if constant, else None
+        :param start: index in the VM instructions where the code of the left operand starts
+        :param right_start: index in the VM instructions where the code of the right operand starts
+        :return: value of the operation if it is constant, else None
+        """
+        instructions = self.vm_file.instructions
+        if left is not None and right is not None:
+            value = fold_constant(operator, left, right)
+            if value is not None:
+                return value
+        elif left is not None:
+            if (operator == '+' and left == 0) or (operator == '*' and left == 1):  # 0 + x, 1 * x
+                return None
+            if operator == '*' and left == 0:  # 0 * x
+                return self.discard(right_start)
+            if operator == '*' and self.multiplyConstant(left):  # c * x
+                return None
+        elif right is not None:
+            if (operator in ('+', '-') and right == 0) or (operator in ('*', '/') and right == 1):  # x + 0, x * 1
+                return None
+            if operator == '*' and right == 0:  # x * 0
+                return self.discard(start)
+            if operator in ('*', '/') and right == -1:  # x * -1, x / -1
+                self.vm_file.writeArithmetic('-', unary=True)
+                return None
+            if operator == '*' and self.multiplyConstant(right):  # x * c
+                return None
+            if operator in ('+', '-') and -32768 < right < 0:  # x - (-c) is x + c
+                operator, right = ('-' if operator == '+' else '+'), -right
+
+        # the left constant goes before the code of the right operand
+        if left is not None:
+            instructions[right_start:right_start] = VMWriter.constant_commands(left)
+        if right is not None:
+            self.vm_file.writeConstant(right)
+        self.vm_file.writeArithmetic(operator)
+        return None
+
+    def multiplyConstant(self, value):
+        """
+        writes the multiplication of the top of the stack by a constant as adds, when that is short enough to replace
+        the call of Math.multiply. There is no cheaper form of division: the VM has no shift, so Math.divide stays.
+        :param value: the constant factor
+        :return: True if the multiplication was written
+        """
+        commands = VMWriter.multiply_commands(value)
+        if commands is None:
+            return False
+        self.vm_file.instructions += commands
+        return True
+
+    def discard(self, start):
+        """
+        drops the value computed by the VM code written from start, removing the code if it has no side effects.
+        :param start: index in the VM instructions
+        :return: 0, the constant replacing the value
+        """
+        instructions = self.vm_file.instructions
+        if any(command.startswith('call ') for command in instructions[start:]):
+            self.vm_file.writePop('temp', 0)
+        else:
+            del instructions[start:]
+        return 0
+
+    def compileTerm(self, node):
+        """
+        compiles a term.
+        :param node: term node
+        :return: value of the term if it is a constant folded by foldExpression, else None
+        """
+        kind = type(node)
+        if kind is jackAST.VarName:
+            symbol = self.lookup(node.name)
+            self.vm_file.writePush(symbol.segment, symbol.index)
+
+        elif kind is jackAST.IntegerConstant:
+            if self.fold_constants:
+                return node.value
+            self.vm_file.writePush('constant', node.value)
+
+        elif kind is jackAST.SubroutineCall:
+            self.compileCall(node)
+
+        elif kind is jackAST.ArrayAccess:
+            symbol = self.lookup(node.name)
+            self.vm_file.writePush(symbol.segment, symbol.index)
+            self.compileExpression(node.index)
+            # VM code to access value of arry[i] and put on top of stack
+            self.vm_file.writeArithmetic('+')
+            self.vm_file.writePop('pointer', 1)
+            self.vm_file.writePush('that', 0)
+
+        elif kind is jackAST.ParenExpression:
+            return self.foldExpression(node.expression)
+
+        elif kind is jackAST.UnaryOp:
+            value = self.compileTerm(node.term)
+            if value is not None:
+                return wrap(-value) if node.operator == '-' else ~value
+            self.vm_file.writeArithmetic(node.operator, unary=True)
+
+        elif kind is jackAST.KeywordConstant:
+            token = node.value
+            if self.fold_constants and token in keyword_constants:
+                return keyword_constants[token]
+            elif token in ('null', 'false'):
+                self.vm_file.writePush('constant', 0)
+            elif token == 'true':
+                self.vm_file.writePush('constant', 1)
+                self.vm_file.writeArithmetic('-', unary=True)
+            else:  # this
+                self.vm_file.writePush('pointer', 0)
+
+        else:  # StringConstant
+            if self.pool_strings:
+                index = self.string_pool.setdefault(node.value, len(self.string_pool))
+                self.vm_file.writePush('static', self.pool_slot(index))
+                self.uses_string_pool = True
+            else:
+                self.vm_file.writeString(node.value)
+        return None
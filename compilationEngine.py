@@ -1,40 +1,35 @@
-import os
-import re
-import tokenizer, symbolTable, VMWriter
+import tokenizer, tokenStream, vmOptimizer, VMWriter, jackAST, xmlWriter, codeGenerator
 """
-Gets input from Tokenizer and emits its output to and output file.
+Gets input from Tokenizer, parses it into a jackAST tree and emits its output to and output file through the XML and
+VM back ends.
 """
 jack_operators = ('+', '-', '*', '/', '&', '|', '<', '>','=')
 
+# bumped whenever the generated output changes, so cached outputs of older versions are not reused.
+compiler_version = '1.8'
 
-def token_type(token):
-    """
-    Return the current type of token as constant.
-    """
-    if token in tokenizer.keyword:
-        return 'keyword'
-    elif token in tokenizer.symbol:
-        return 'symbol'
-    elif "\"" in token:
-        return 'stringConstant'
-    else:
-        if re.search(r'\d', token[0]):
-            return 'integerConstant'
-        else:
-            return 'identifier'
 
 class CompilationEngline:
 
-    def __init__(self, compile_file, vm_file):
-        self.tokens = []
-        self.temp_token = None
+    def __init__(self, compile_file, vm_file, optimize=0, pool_strings=False, bytecode=False):
+        """
+        Initialize CompilationEngline with file objects passed in.
+        :param compile_file: file object for the .xml output, or None to only emit VM code
+        :param vm_file: file object for the .vm output
+        :param optimize: optimization level, 0 for none, 1 for constant folding, branches on true conditions and the
+        peephole optimizer
+        :param pool_strings: build each distinct string literal of the class once and keep it in a static slot,
+        instead of building a new String every time the literal is evaluated. Programs that modify or dispose
+        string literals must not use it, as every use of a literal shares the same String object.
+        :param bytecode: write vm_file in the binary format of vmBytecode, vm_file then being a binary file object
+        """
+        self.tokens = tokenStream.TokenStream()
         self.compile_file = compile_file
-        # initialize a symbol table
-        self.symbol_table = symbolTable.symbolTable()
+        self.xml_writer = xmlWriter.XMLWriter(compile_file) if compile_file is not None else None
         self.class_name = None  # className of the .jack file compiled
-        self.vm_file = VMWriter.VMWritter(vm_file)
-        self.while_count = 0
-        self.if_count = 0
+        self.optimizer = vmOptimizer.optimizer(optimize)
+        self.vm_file = VMWriter.VMWritter(vm_file, self.optimizer, bytecode)
+        self.code_generator = codeGenerator.CodeGenerator(self.vm_file, optimize >= 1, pool_strings, optimize >= 1)
 
     def add_tokens(self, token):
         """
@@ -44,555 +39,320 @@ class CompilationEngline:
         """
         self.tokens.append(token)
 
+    def add_token_source(self, tokens):
+        """
+        Pull tokens lazily from an iterable, such as Tokenizer.generate_tokens(), instead of building up a token list.
+        :param tokens: iterable of tokens
+        :return:
+        """
+        self.tokens = tokenStream.TokenStream(tokens)
+
     def eat(self, token=None):
         """
         if token given, check popped token against parameter token match, else raise error
         :param token:
-        :return: token popped from token list
+        :return: value of the token popped from token list
         """
-        popped = self.tokens.pop(0)
-        if token == None:
-            return popped
-        elif popped == token:
-            return popped
+        popped = self.tokens.advance()
+        if token == None or popped.value == token:
+            return popped.value
         else:
-            raise TypeError(f"Expect {token} token followed by {self.tokens[:20]}, but {popped} popped")
+            raise TypeError(f"Expect {token} token followed by {self.tokens.context()}, but {popped} popped")
 
-    def check_token(self):
+    def check_token(self, k=0):
         """
         check what is the next token without popping from the token list
-        :return: token
+        :param k: lookahead distance, 0 is the next token
+        :return: token value
         """
-        return self.tokens[0]
+        token = self.tokens.peek(k)
+        return token.value if token is not None else None
 
-    def write(self, xml_code):
+    def check_type(self, k=0):
         """
-        write xml_code to compile_file
-        :param xml_code:
-        :return:
+        check the type code of the next token without popping from the token list
+        :param k: lookahead distance, 0 is the next token
+        :return: tokenizer type code
         """
-        self.compile_file.write(xml_code)
-
-    def write_token(self, token):
-        """
-        write terminal token in xml_code with respective token_type
-        :param token:
-        :return: token
-        """
-        type = token_type(token)
-        if type == 'stringConstant':  # remove the leading double quote from the stringConstant
-            self.compile_file.write(f"<{type}>" + token[1:] + f'</{type}>' + '\n')
-        elif token in tokenizer.special_symbols:
-            self.compile_file.write(
-                '<' + type + '>' + tokenizer.special_symbols[token] + '</' + type + '>' + '\n'
-            )
-        else:
-            self.compile_file.write(f"<{type}>" + token + f'</{type}>' + '\n')
-
-        return token
+        token = self.tokens.peek(k)
+        return token.type if token is not None else None
 
     def compileClass(self):
         """
-        compile a complete class.
-        :return:
+        compile a complete class: parses it, then writes it through the XML back end when there is a compile_file,
+        and the VM back end.
+        :return: jackAST.Class
         """
+        tree = self.parseClass()
+        if self.xml_writer is not None:
+            self.xml_writer.writeClass(tree)
+        self.code_generator.compileClass(tree)
+        return tree
 
-        # handles class keyword
-        self.write('<class>\n')
-        self.write_token(self.eat('class'))
-        # handles className and '{'
-        self.class_name = self.write_token(self.eat())
-        self.write_token(self.eat('{'))
-
-        # handles classVarDec and subRoutineDec recursively
-        self.compileClassVarDec()
-
-        # handles SubroutineDec recursively
-        self.compileSubroutine()
-
-        # handles enclosing '}'
+    def parseClass(self):
+        """
+        parses a complete class.
+        :return: jackAST.Class
+        """
+        self.eat('class')
+        self.class_name = self.eat()
+        self.eat('{')
+        class_vars = self.parseClassVarDec()
+        subroutines = self.parseSubroutine()
+        self.eat('}')
 
-        self.write_token(self.eat('}'))
-        self.write('</class>\n')
+        # drains the token source, a .jack file holds a single class
+        if not self.tokens.at_end():
+            raise TypeError(f"Unexpected tokens after class {self.class_name}: {self.tokens.context()}")
+        return jackAST.Class(self.class_name, class_vars, subroutines)
 
-    def compileClassVarDec(self):
+    def parseNames(self):
         """
-        compiles a static declaration or a field declaration.
-        :param token: current token passed in
-        :return:
+        parses varName (, varName)* ;
+        :return: list of varNames
         """
-        # token passed in should be 'static' or 'field'
+        names = [self.eat()]
+        while self.check_token() == ',':
+            self.eat(',')
+            names.append(self.eat())
+        self.eat(';')
+        return names
 
-        # handles 'static' or 'field' keyword
+    def parseClassVarDec(self):
+        """
+        parses the static declarations and field declarations.
+        :return: list of jackAST.ClassVarDec
+        """
+        class_vars = []
         while self.check_token() in ('field', 'static'):
-            self.write('<classVarDec>\n')
-
-            # consume token, add token to current_variable, and write to XML file
-            kind = self.write_token(self.eat())
-
-            # handles type and varName
-            type = self.write_token(self.eat())
-            name = self.write_token(self.eat())
-
-            self.symbol_table.define(name, type, kind)
+            kind = self.eat()
+            type = self.eat()
+            class_vars.append(jackAST.ClassVarDec(kind, type, self.parseNames()))
+        return class_vars
 
-            # handles (, varName)*
-            while self.check_token() == ',':
-                self.write_token(self.eat(','))  # writes ','
-                name = self.write_token(self.eat())  # writes varName
-                self.symbol_table.define(name, type, kind)
-            # handles ';'
-            self.write_token(self.eat(';'))
-            self.write('</classVarDec>\n')
-
-    def compileSubroutine(self):
+    def parseSubroutine(self):
         """
-        compiles a complete method, function, or constructor.
-        :param token: current token passed in for writing
-        :return:
+        parses the complete methods, functions, and constructors.
+        :return: list of jackAST.SubroutineDec
         """
-
-        # handles keywords: constructor, function, or method
+        subroutines = []
         while self.check_token() in ('constructor', 'function', 'method'):
-            self.write('<subroutineDec>\n')
-            # remove symbols from previous subroutine
-            self.symbol_table.startSubroutine()
-            subroutine_type = self.write_token(self.eat())
-            if subroutine_type == 'method':
-                # in methods declaration: argument 0 is always name this, and type is set to class name
-                self.symbol_table.define('this', self.class_name, 'argument')
-
-
-
-
-
-            # handles (type|void), subroutineName, and '('
-            self.write_token(self.eat())  # (type|void)
-            subroutineName = self.write_token(self.eat())
-            self.write_token(self.eat('('))
-
-            self.compileParameterList()
-
-
+            kind = self.eat()
+            return_type = self.eat()  # (type|void)
+            name = self.eat()
+            self.eat('(')
+            parameters = self.parseParameterList()
+            self.eat(')')
 
             # handles subroutineBody
-            self.write('<subroutineBody>\n')
-            self.write_token(self.eat('{'))
-            # handles varDec
-            self.compileVarDec()
-
-            # writes VM code for function after function var declarations.
-            self.vm_file.writeFunction(f'{self.class_name}.{subroutineName}', self.symbol_table.VarCount('local'))
-
-            if subroutine_type == 'method':
-                # VM code for method callee
-                self.vm_file.writePush('argument', 0)
-                self.vm_file.writePop('pointer', 0)
-
-            elif subroutine_type == 'constructor':
-                self.vm_file.writePush('constant', self.symbol_table.VarCount('field'))
-                self.vm_file.writeCall('Memory.alloc', 1)
-                self.vm_file.writePop('pointer', 0)
-
-            # handles statements next
-            self.compileStatements()
-            self.write_token(self.eat('}'))
-            self.write('</subroutineBody>\n')
+            self.eat('{')
+            var_decs = self.parseVarDec()
+            statements = self.parseStatements()
+            self.eat('}')
+            subroutines.append(jackAST.SubroutineDec(kind, return_type, name, parameters, var_decs, statements))
+        return subroutines
 
-            # print(self.symbol_table.symbol_table)
-            self.write('</subroutineDec>\n')
-
-    def compileParameterList(self):
+    def parseParameterList(self):
         """
-        compiles a possibly empty parameter list, not including the enclosing '()'
-        :return:
+        parses a possibly empty parameter list, not including the enclosing '()'
+        :return: list of (type, varName)
         """
-        # writes paramList even if empty
-        self.write('<parameterList>\n')
+        parameters = []
         # next token == ')' signals end of paramList
-        token = self.check_token()
-        if token != ')':
-            type = self.write_token(self.eat())  # type
-            name = self.write_token(self.eat())  # varName
-            self.symbol_table.define(name, type, 'argument')
+        if self.check_token() != ')':
+            parameters.append((self.eat(), self.eat()))
             while self.check_token() == ',':
-                self.write_token(self.eat(','))  # more param, writes ','
-                type = self.write_token(self.eat())  # more type varName
-                name = self.write_token(self.eat())
-                self.symbol_table.define(name, type, 'argument')
-
-        self.write('</parameterList>\n')
-        self.write_token(self.eat(')'))  # writes the ')'
+                self.eat(',')
+                parameters.append((self.eat(), self.eat()))
+        return parameters
 
-    def compileVarDec(self):
+    def parseVarDec(self):
         """
-        compiles a var declaration.
-        :return:
+        parses the var declarations.
+        :return: list of jackAST.VarDec
         """
-        # writes 'var' token and varDec:
-
+        var_decs = []
         while self.check_token() == 'var':
-            self.write('<varDec>\n')
-            self.write_token(self.eat('var'))
-            # handles type varName
-            type = self.write_token(self.eat())
-            name = self.write_token(self.eat())
-            self.symbol_table.define(name, type, 'local')
-
-            # handles list of varName if ',' present
-
-            while self.check_token() == ',':
-                self.write_token(self.eat(','))
-                name = self.write_token(self.eat())
-                self.symbol_table.define(name, type, 'local')
-
-            self.write_token(self.eat(';'))  # writes the ';' at the end of varDec
-            self.write('</varDec>\n')
+            self.eat('var')
+            type = self.eat()
+            var_decs.append(jackAST.VarDec(type, self.parseNames()))
+        return var_decs
 
-    def compileStatements(self):
+    def parseStatements(self):
         """
-        compiles a sequence of statements, not including the enclosing '{}'
-        :return:
+        parses a sequence of statements, not including the enclosing '{}'
+        :return: list of statement nodes
         """
-        self.write('<statements>\n')
+        statements = []
         token = self.check_token()
         while token != '}':
             # check type of statement with the token given
             if token == 'let':
-                self.compileLet()
+                statements.append(self.parseLet())
             elif token == 'if':
-                self.if_count += 1
-                self.compileIf()
-
+                statements.append(self.parseIf())
             elif token == 'while':
-                self.while_count += 1
-                self.compileWhile()
+                statements.append(self.parseWhile())
             elif token == 'do':
-                self.compileDo()
+                statements.append(self.parseDo())
             elif token == 'return':
-                self.compileReturn()
+                statements.append(self.parseReturn())
             else:
-                raise TypeError(f"Statement type error: {self.tokens[:20]}")
+                raise TypeError(f"Statement type error: {self.tokens.context()}")
             token = self.check_token()
-        self.write('</statements>\n')
+        return statements
 
-    def compileDo(self):
+    def parseBlock(self):
         """
-        compiles a do statement.
-        :return:
+        parses { statements }
+        :return: list of statement nodes
         """
-        self.write('<doStatement>\n')
-        self.write_token(self.eat('do'))
-        # handles subroutine call
-        function_name = self.write_token(self.eat())  # function_name = subroutineName, varName or className
-
-        if self.check_token() == '(': # subroutineName()
-            self.vm_file.writePush('pointer', 0)
-            # continue compiling Expressionlist
-            self.write_token(self.eat('('))
-            arg_count = self.compileExpressionList()
-            self.write_token(self.eat(')'))
-
-            function_name = self.class_name + '.' + function_name
-            arg_count += 1
-
-        else: # className | varName.subroutineName()
-            self.write_token(self.eat('.'))
+        self.eat('{')
+        statements = self.parseStatements()
+        self.eat('}')
+        return statements
 
-            if self.symbol_table.Typeof(function_name):  # function_name == varName
-                if self.symbol_table.KindOf(function_name) == 'field':  # push the varName object into stack
-                    self.vm_file.writePush('this', self.symbol_table.IndexOf(function_name))
-                else:
-                    self.vm_file.writePush(self.symbol_table.KindOf(function_name),
-                                           self.symbol_table.IndexOf(function_name))
-                function_name = self.symbol_table.Typeof(function_name) + '.' + self.write_token(self.eat())  # varName.subroutineName
-                arg_count = 1  # start with 1 arg as the method object itself
-            else:  # function_name == className
-                function_name = function_name + '.' + self.write_token(self.eat())  # className.subroutineName
-                arg_count = 0
-
-            # continue compiling Expressionlist
-            self.write_token(self.eat('('))
-            arg_count += self.compileExpressionList()
-            self.write_token(self.eat(')'))
-
-
-        self.write_token(self.eat(';'))
-        # writes to call VM codes
-        self.vm_file.writeCall(function_name, arg_count)
-        # do subroutine returns void: therefore pop temp 0
-        self.vm_file.writePop('temp', 0)
-        self.write('</doStatement>\n')
+    def parseCondition(self):
+        """
+        parses ( expression )
+        :return: jackAST.Expression
+        """
+        self.eat('(')
+        condition = self.parseExpression()
+        self.eat(')')
+        return condition
 
-    def compileLet(self):
+    def parseDo(self):
         """
-        compiles a let statement.
-        :return:
+        parses a do statement.
+        :return: jackAST.DoStatement
         """
-        self.write('<letStatement>\n')
-        self.write_token(self.eat('let'))  # writes 'let' keyword
+        self.eat('do')
+        call = self.parseSubroutineCall()
+        self.eat(';')
+        return jackAST.DoStatement(call)
 
-        varName = self.write_token(self.eat())  # writes varName
+    def parseSubroutineCall(self):
+        """
+        parses subroutineName ( expressionList ) or (className | varName) . subroutineName ( expressionList )
+        :return: jackAST.SubroutineCall
+        """
+        receiver = None
+        name = self.eat()
+        if self.check_token() == '.':
+            self.eat('.')
+            receiver, name = name, self.eat()
+        self.eat('(')
+        arguments = self.parseExpressionList()
+        self.eat(')')
+        return jackAST.SubroutineCall(receiver, name, arguments)
 
+    def parseLet(self):
+        """
+        parses a let statement.
+        :return: jackAST.LetStatement
+        """
+        self.eat('let')
+        name = self.eat()
+        index = None
         # next token could be '[' or '='
-        # handles ('[' expression ']')? if token != '='
         if self.check_token() == '[':
-            # # VM code for varName[expression]:
-            self.vm_file.writePush(self.symbol_table.KindOf(varName), self.symbol_table.IndexOf(varName))
-            self.write_token(self.eat('['))  # [
-            # VM code for computing and pushing the value of expression1
-            self.compileExpression()  # expression
-            self.write_token(self.eat(']'))   # ]
-            # ADD the offset from expression 1.
-            self.vm_file.writeArithmetic('+')
-
-            # VM code for computing and pushing the value of expression2
-            self.write(self.eat('='))
-            self.compileExpression()
-
-            self.vm_file.writePop('temp', 0)  # // temp 0 = the value of expression2
-            self.vm_file.writePop('pointer', 1)
-            self.vm_file.writePush('temp', 0)
-            self.vm_file.writePop('that', 0)
-
-
-        else:
-            self.write_token(self.eat('='))
-            self.compileExpression()
-
-            # handles object
-            if self.symbol_table.KindOf(varName) == 'field':
-                self.vm_file.writePop('this', self.symbol_table.IndexOf(varName))
-            else:
-                self.vm_file.writePop(self.symbol_table.KindOf(varName), self.symbol_table.IndexOf(varName))
-
-        self.write_token(self.eat(';'))
-        self.write('</letStatement>\n')
+            self.eat('[')
+            index = self.parseExpression()
+            self.eat(']')
+        self.eat('=')
+        value = self.parseExpression()
+        self.eat(';')
+        return jackAST.LetStatement(name, index, value)
 
-    def compileWhile(self):
+    def parseWhile(self):
         """
-        compiles a while statement.
-        :return:
+        parses a while statement.
+        :return: jackAST.WhileStatement
         """
-        self.write('<whileStatement>\n')
-        self.write_token(self.eat('while'))
-
-        while_count = self.while_count
-
-        # while label for VM code label L1
-        self.vm_file.writeLabel('W' + str(while_count) + 'true')
-
-        self.write_token(self.eat('('))
-        self.compileExpression()
-        self.write_token(self.eat(')'))
-        # VM code for not, if-goto L2
-        self.vm_file.writeArithmetic('~')
-        self.vm_file.writeIf('W' + str(while_count) + 'false')
-
-        self.write_token(self.eat('{'))
-        self.compileStatements()
-        self.write_token(self.eat('}'))
-
-        # VM code for goto L1
-        self.vm_file.writeGoto('W' + str(while_count) + 'true')
+        self.eat('while')
+        condition = self.parseCondition()
+        return jackAST.WhileStatement(condition, self.parseBlock())
 
-        # VM code for L2
-        self.vm_file.writeLabel('W' + str(while_count) + 'false')
-
-
-        self.write('</whileStatement>\n')
-
-    def compileReturn(self):
+    def parseReturn(self):
         """
-        compiles a return statement.
-        :return:
+        parses a return statement.
+        :return: jackAST.ReturnStatement
         """
-        self.write('<returnStatement>\n')
-        self.write_token(self.eat('return'))
+        self.eat('return')
+        value = None
         if self.check_token() != ';':
-            self.compileExpression()
-            self.write_token(self.eat(';'))
-        else:
-            self.write_token(self.eat(';'))
-            # return void: push constant 0
-            self.vm_file.writePush('constant', 0)
-        self.vm_file.writeReturn()
-        self.write('</returnStatement>\n')
+            value = self.parseExpression()
+        self.eat(';')
+        return jackAST.ReturnStatement(value)
 
-    def compileIf(self):
+    def parseIf(self):
         """
-        compiles a If statement, possibly with a trailing else clause
-        :return:
+        parses a If statement, possibly with a trailing else clause
+        :return: jackAST.IfStatement
         """
-        current_if_count = self.if_count
-
-        self.write('<ifStatement>\n')
-        self.write_token(self.eat('if'))
-        self.write_token(self.eat('('))
-        self.compileExpression()
-        self.write_token(self.eat(')'))
-
-        # VM Code not to negate expression
-        self.vm_file.writeArithmetic('~')
-        # VM Code for if-go L1
-        self.vm_file.writeIf(f'{self.class_name}IF' + str(current_if_count) + 'true')
-
-
-        self.write_token(self.eat('{'))
-        self.compileStatements()
-        self.write_token(self.eat('}'))
-
-
-
-
-
-        # handles else statements
+        self.eat('if')
+        condition = self.parseCondition()
+        statements = self.parseBlock()
+        else_statements = None
         if self.check_token() == 'else':
+            self.eat('else')
+            else_statements = self.parseBlock()
+        return jackAST.IfStatement(condition, statements, else_statements)
 
-            # VM code for goto L2
-            self.vm_file.writeGoto(f'{self.class_name}IF' + str(current_if_count) + 'false')
-            self.write_token(self.eat('else'))
-
-            # VM code for label L1
-            self.vm_file.writeLabel(f'{self.class_name}IF' + str(current_if_count) + 'true')
-
-            self.write_token(self.eat('{'))
-            self.compileStatements()
-            self.write_token(self.eat('}'))
-
-            # VM code for label L2
-            self.vm_file.writeLabel(f'{self.class_name}IF' + str(current_if_count) + 'false')
-
-        else:
-            # VM code for label L1
-            self.vm_file.writeLabel(f'{self.class_name}IF' + str(current_if_count) + 'true')
-
-        self.write('</ifStatement>\n')
-
-    def compileExpression(self):
+    def parseExpression(self):
         """
-        compiles an expression.
-        :return:
+        parses an expression.
+        :return: jackAST.Expression
         """
-        self.write('<expression>\n')
-
-        self.compileTerm()
+        term = self.parseTerm()
+        operations = []
         while self.check_token() in jack_operators:
-            token = self.write_token(self.eat())
-            self.compileTerm()
-            self.vm_file.writeArithmetic(token)
-
-        self.write('</expression>\n')
-
-
-
-    def compileTerm(self):
-        """
-        compiles a term.
-        :return:
-        """
-        self.write('<term>\n')
-
-        if token_type(self.check_token()) == 'identifier':
-
-            if self.tokens[1] == '[': # varName [ expression ]
-                varName = self.write_token(self.eat())
-                self.vm_file.writePush(self.symbol_table.KindOf(varName), self.symbol_table.IndexOf(varName))
-                self.write_token(self.eat('['))
-                self.compileExpression()
-                self.write_token(self.eat(']'))
-                # VM code to access value of arry[i] and put on top of stack
-                self.vm_file.writeArithmetic('+')
-                self.vm_file.writePop('pointer', 1)
-                self.vm_file.writePush('that', 0)
-
-            elif self.tokens[1] == '.':  # subroutine call: varName|className . subroutineName ( ExpressionList )
-                function_name = self.write_token(self.eat())  # varName|className
-                # check if varName or className
-                if self.symbol_table.symbol_table.get(function_name):
-                    if self.symbol_table.KindOf(function_name) == 'field':
-                        self.vm_file.writePush('this', self.symbol_table.IndexOf(function_name))
-                    else:
-                        self.vm_file.writePush(self.symbol_table.KindOf(function_name), self.symbol_table.IndexOf(function_name))
-                    # function_name is varName/object
-                    function_name = self.symbol_table.Typeof(function_name)  # convert function Name to className
-                    arg_count = 1
-                else:
-                    # function_name is className
-                    arg_count = 0
-
-                self.write_token(self.eat('.'))
-                function_name = function_name + '.' + self.write_token(self.eat())  # subroutineName
-                self.write_token(self.eat('('))
-                arg_count += self.compileExpressionList()
-                self.write_token(self.eat(')'))
-                # VM code to call the function
-                self.vm_file.writeCall(function_name, arg_count)
-
-            elif self.tokens[1] == '(': # subroutine call: subroutineName ( ExpressionList )
-                function_name = self.write_token(self.eat())  # subroutineName
-                self.write_token(self.eat('('))
-                arg_count = self.compileExpressionList()
-                self.write_token(self.eat(')'))
-                self.vm_file.writeCall(function_name, arg_count)
-
-            else:  # varName
-                token = self.write_token(self.eat())
-
-                if self.symbol_table.KindOf(token) == 'field':
-                    self.vm_file.writePush('this', self.symbol_table.IndexOf(token))
-                else:
-                    self.vm_file.writePush(self.symbol_table.KindOf(token), self.symbol_table.IndexOf(token))
-
-
-
+            operator = self.eat()
+            operations.append((operator, self.parseTerm()))
+        return jackAST.Expression(term, operations)
+
+    def parseTerm(self):
+        """
+        parses a term.
+        :return: term node
+        """
+        token_type = self.check_type()
+        if token_type == tokenizer.IDENTIFIER:
+            lookahead = self.check_token(1)
+            if lookahead == '[':  # varName [ expression ]
+                name = self.eat()
+                self.eat('[')
+                index = self.parseExpression()
+                self.eat(']')
+                return jackAST.ArrayAccess(name, index)
+            elif lookahead in ('.', '('):  # subroutine call
+                return self.parseSubroutineCall()
+            return jackAST.VarName(self.eat())
+
+        elif token_type == tokenizer.INTEGER_CONSTANT:
+            text = self.eat()
+            return jackAST.IntegerConstant(int(text), text)
+        elif token_type == tokenizer.STRING_CONSTANT:
+            return jackAST.StringConstant(self.eat()[1:])  # removing the leading "
+        elif token_type == tokenizer.KEYWORD and self.check_token() in ('true', 'false', 'null', 'this'):
+            return jackAST.KeywordConstant(self.eat())
         elif self.check_token() == '(':
-            self.write_token(self.eat('('))
-            self.compileExpression()
-            self.write_token(self.eat(')'))
+            return jackAST.ParenExpression(self.parseCondition())
         elif self.check_token() in ('-', '~'):
-            token = self.write_token(self.eat())
-            self.compileTerm()
-            self.vm_file.writeArithmetic(token, unary=True)
-        else:
-            # keywordConstant, stringConstant, integerConstant
-            token = self.write_token(self.eat())
-
-            if token in ('null', 'false'):
-                self.vm_file.writePush('constant', 0)
-            elif token == 'true':
-                self.vm_file.writePush('constant', 1)
-                self.vm_file.writeArithmetic('-', unary=True)
-            elif token == 'this':
-                self.vm_file.writePush('pointer', 0)
-            elif token[0] == '\"':  # handles string constant
-                string_constant = token[1:]  # removing the leading "
-                self.vm_file.writePush('constant', len(string_constant))
-                self.vm_file.writeCall('String.new', 1)
-                for char in string_constant:
-                    self.vm_file.writePush('constant', ord(char))
-                    self.vm_file.writeCall('String.appendChar', 2)
-            else:
-                self.vm_file.writePush('constant', token)
+            operator = self.eat()
+            return jackAST.UnaryOp(operator, self.parseTerm())
+        raise TypeError(f"Term expected: {self.tokens.context()}")
 
-
-        self.write('</term>\n')
-
-    def compileExpressionList(self):
+    def parseExpressionList(self):
         """
-        Compiles a possibly empty a comma seperated list of expressions.
-        :return: number of expressions
+        parses a possibly empty a comma seperated list of expressions.
+        :return: list of jackAST.Expression
         """
-        self.write('<expressionList>\n')
-        exp_count = 0
-        while self.check_token() != ')':
-            self.compileExpression()
-            exp_count += 1
+        expressions = []
+        if self.check_token() != ')':
+            expressions.append(self.parseExpression())
             while self.check_token() == ',':
-                self.write_token(self.eat(','))
-                self.compileExpression()
-                exp_count += 1
-
-        self.write('</expressionList>\n')
-
-        return exp_count
\ No newline at end of file
+                self.eat(',')
+                expressions.append(self.parseExpression())
+        return expressions
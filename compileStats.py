@@ -0,0 +1,159 @@
+"""
+Statistics of a compilation, collected for --stats. Nothing in the compiler knows about them: instrument() wraps the
+methods of one tokenizer and engine pair with counting and timing versions, so a compilation without statistics runs
+exactly the code it runs without this module.
+
+Phases are timed exclusively: time spent writing outputs is counted as write, not in the phase that writes, and time
+spent pulling tokens from the tokenizer while parsing is counted as tokenize, not as parse.
+"""
+
+import collections
+import time
+import vmBytecode
+
+
+class Stats:
+
+    def __init__(self):
+        """
+        Initialize empty statistics.
+        """
+        self.phases = collections.Counter()  # phase name: seconds
+        self.vm_commands = collections.Counter()  # first word of the VM command: count, as written
+        self.symbol_table = collections.Counter()  # symbolTable method: calls
+        self.tokens = 0
+        self.stack = []  # phases being timed, innermost last
+        self.mark = None  # time the innermost phase was last resumed
+
+    def enter(self, phase):
+        """
+        start timing phase, pausing the phase it is nested in
+        :param phase: phase name
+        :return:
+        """
+        now = time.perf_counter()
+        if self.stack:
+            self.phases[self.stack[-1]] += now - self.mark
+        self.stack.append(phase)
+        self.mark = now
+
+    def exit(self):
+        """
+        stop timing the innermost phase, resuming the phase it is nested in
+        :return:
+        """
+        now = time.perf_counter()
+        self.phases[self.stack.pop()] += now - self.mark
+        self.mark = now
+
+    def timed(self, phase, function):
+        """
+        Return function, timed as phase.
+        """
+        def timed_function(*args, **kwargs):
+            self.enter(phase)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.exit()
+        return timed_function
+
+    def counted(self, name, function):
+        """
+        Return function, counting its calls in symbol_table.
+        """
+        def counted_function(*args, **kwargs):
+            self.symbol_table[name] += 1
+            return function(*args, **kwargs)
+        return counted_function
+
+    def timed_tokens(self, tokens):
+        """
+        Yield tokens from an iterable, timing the production of each token as tokenize.
+        :param tokens: iterable of tokens, such as Tokenizer.generate_tokens()
+        :return:
+        """
+        iterator = iter(tokens)
+        while True:
+            self.enter('tokenize')
+            try:
+                token = next(iterator, None)
+            finally:
+                self.exit()
+            if token is None:
+                return
+            self.tokens += 1
+            yield token
+
+    def report(self):
+        """
+        Return the statistics as a plain dict, which can be sent back from a worker process and saved as JSON.
+        :return: dict of phases (seconds), tokens, vm_commands and symbol_table
+        """
+        return {'phases': dict(self.phases), 'tokens': self.tokens, 'vm_commands': dict(self.vm_commands),
+                'symbol_table': dict(self.symbol_table)}
+
+
+class StatsFile:
+    """Output file timing its writes as the write phase, and counting the VM commands written if it is a .vm file."""
+
+    def __init__(self, file, stats, vm=False):
+        self.file = file
+        self.stats = stats
+        self.vm = vm
+
+    def write(self, text):
+        if self.vm:
+            if isinstance(text, bytes):  # --bytecode
+                commands = (vmBytecode.opcodes[record[0]] for record in vmBytecode.BytecodeFile(text).records())
+            else:
+                commands = (line.split(' ', 1)[0] for line in text.splitlines())
+            self.stats.vm_commands.update(commands)
+        self.stats.enter('write')
+        try:
+            return self.file.write(text)
+        finally:
+            self.stats.exit()
+
+
+def instrument(stats, tokenizer_object, compile_object):
+    """
+    Wrap the methods of a tokenizer and engine pair to collect statistics. The engine must not have a token source yet,
+    instrument() gives it the tokens of tokenizer_object.
+    :param stats: Stats
+    :param tokenizer_object: tokenizer.Tokenizer
+    :param compile_object: compilationEngine.CompilationEngline
+    :return:
+    """
+    if tokenizer_object.token_file is not None:
+        tokenizer_object.token_file = StatsFile(tokenizer_object.token_file, stats)
+    compile_object.add_token_source(stats.timed_tokens(tokenizer_object.generate_tokens()))
+    compile_object.parseClass = stats.timed('parse', compile_object.parseClass)
+
+    if compile_object.xml_writer is not None:
+        xml_writer = compile_object.xml_writer
+        xml_writer.compile_file = StatsFile(xml_writer.compile_file, stats)
+        xml_writer.writeClass = stats.timed('xml', xml_writer.writeClass)
+
+    code_generator = compile_object.code_generator
+    code_generator.compileClass = stats.timed('vm', code_generator.compileClass)
+    compile_object.vm_file.vm_file = StatsFile(compile_object.vm_file.vm_file, stats, vm=True)
+    symbol_table = code_generator.symbol_table
+    for name in ('define', 'lookup', 'startSubroutine', 'VarCount'):
+        setattr(symbol_table, name, stats.counted(name, getattr(symbol_table, name)))
+
+
+def merge(reports):
+    """
+    Add up the statistics of several files.
+    :param reports: iterable of Stats.report() dicts
+    :return: dict in the same format, with peak_memory being the largest peak
+    """
+    total = {'phases': collections.Counter(), 'tokens': 0, 'vm_commands': collections.Counter(),
+             'symbol_table': collections.Counter(), 'peak_memory': 0}
+    for report in reports:
+        for key in ('phases', 'vm_commands', 'symbol_table'):
+            total[key].update(report[key])
+        total['tokens'] += report['tokens']
+        total['peak_memory'] = max(total['peak_memory'], report.get('peak_memory', 0))
+    return {key: dict(value) if isinstance(value, collections.Counter) else value for key, value in total.items()}
@@ -0,0 +1,242 @@
+"""
+Assembler and CPU simulator of the Hack platform, to check and measure the assembly of hackWriter. The VM code of a
+directory is translated both by HackWriter and by the textbook StandardWriter, each translation is assembled and run
+from its bootstrap until it halts, and both must print what vmEmulator prints running the VM code. The OS functions the
+program does not define run as the Python stand-ins of vmEmulator, called from the trap stubs of
+hackWriter.translate(os_traps=True).
+
+    python hackEmulator.py Pong/my_jack --max-cycles 100000000
+"""
+
+import argparse
+import json
+import sys
+import hackWriter, vmEmulator
+
+predefined_symbols = dict({f'R{index}': index for index in range(16)}, SP=0, LCL=1, ARG=2, THIS=3, THAT=4,
+                          SCREEN=16384, KBD=24576)
+first_variable = 16
+
+# comp field of the C-instructions without the a bit, x being D and y A (or M with the a bit set)
+comp_codes = {'0': 0b101010, '1': 0b111111, '-1': 0b111010, 'D': 0b001100, 'A': 0b110000, '!D': 0b001101,
+              '!A': 0b110001, '-D': 0b001111, '-A': 0b110011, 'D+1': 0b011111, 'A+1': 0b110111, 'D-1': 0b001110,
+              'A-1': 0b110010, 'D+A': 0b000010, 'D-A': 0b010011, 'A-D': 0b000111, 'D&A': 0b000000, 'D|A': 0b010101}
+alu_functions = {
+    0b101010: lambda x, y: 0, 0b111111: lambda x, y: 1, 0b111010: lambda x, y: -1, 0b001100: lambda x, y: x,
+    0b110000: lambda x, y: y, 0b001101: lambda x, y: ~x, 0b110001: lambda x, y: ~y, 0b001111: lambda x, y: -x,
+    0b110011: lambda x, y: -y, 0b011111: lambda x, y: x + 1, 0b110111: lambda x, y: y + 1,
+    0b001110: lambda x, y: x - 1, 0b110010: lambda x, y: y - 1, 0b000010: lambda x, y: x + y,
+    0b010011: lambda x, y: x - y, 0b000111: lambda x, y: y - x, 0b000000: lambda x, y: x & y,
+    0b010101: lambda x, y: x | y,
+}
+jump_codes = {'': 0, 'JGT': 1, 'JEQ': 2, 'JGE': 3, 'JLT': 4, 'JNE': 5, 'JLE': 6, 'JMP': 7}
+
+
+def comp_code(comp):
+    """
+    Return the a bit and comp field of a comp mnemonic, such as M-D.
+    :param comp: string
+    :return: int of 7 bits
+    """
+    code = comp_codes.get(comp.replace('M', 'A'))
+    if code is None and len(comp) == 3:  # commutative operators written the other way, such as M+D
+        code = comp_codes.get(comp[::-1].replace('M', 'A'))
+        if comp[1] not in '+&|':
+            code = None
+    if code is None:
+        raise TypeError(f"Invalid comp {comp}")
+    return ('M' in comp) << 6 | code
+
+
+def assemble(lines):
+    """
+    Assemble Hack assembly into machine code.
+    :param lines: iterable of assembly lines, comments and blank lines are ignored
+    :return: list of 16-bit instruction words
+    """
+    instructions = [line.split('//', 1)[0].strip() for line in lines]
+    symbols = dict(predefined_symbols)
+    address = 0
+    for instruction in instructions:
+        if instruction.startswith('('):
+            symbols[instruction[1:-1]] = address
+        elif instruction:
+            address += 1
+    if address > 32768:
+        raise TypeError(f"{address} instructions do not fit in the 32K instruction ROM")
+    words = []
+    variable = first_variable
+    for instruction in instructions:
+        if not instruction or instruction.startswith('('):
+            continue
+        if instruction.startswith('@'):
+            symbol = instruction[1:]
+            if symbol.isdigit():
+                value = int(symbol)
+            else:
+                if symbol not in symbols:
+                    symbols[symbol] = variable
+                    variable += 1
+                value = symbols[symbol]
+            if value > 32767:
+                raise TypeError(f"Address out of range in {instruction}")
+            words.append(value)
+            continue
+        dest, _, rest = instruction.rpartition('=')
+        comp, _, jump = rest.partition(';')
+        if jump not in jump_codes or not set(dest) <= set('AMD'):
+            raise TypeError(f"Invalid instruction {instruction}")
+        dest_bits = ('A' in dest) << 2 | ('D' in dest) << 1 | ('M' in dest)
+        words.append(0b111 << 13 | comp_code(comp) << 6 | dest_bits << 3 | jump_codes[jump])
+    return words
+
+
+class HackCPU:
+
+    def __init__(self, rom, traps=()):
+        """
+        Initialize HackCPU with a program, ready to run() from address 0.
+        :param rom: list of instruction words, as returned by assemble()
+        :param traps: (function name, argument count) of the OS stubs, as returned by hackWriter.translate()
+        """
+        self.rom = rom
+        self.traps = list(traps)
+        self.ram = [0] * 32768
+        self.cycles = 0
+        self.output = []
+        self.strings = {}
+        self.functions = set()  # the OS stand-ins of vmEmulator are only reached through the traps
+        self.halted = False
+        self.builtins = vmEmulator.os_functions(self)
+
+    def decode(self):
+        """
+        Split the instruction words into (A value or None, a bit, ALU function, dest A, dest D, dest M, jump bits)
+        tuples.
+        :return: list of tuples
+        """
+        decoded = []
+        for word in self.rom:
+            if not word & 0x8000:
+                decoded.append((word, 0, None, 0, 0, 0, 0))
+                continue
+            alu = alu_functions.get(word >> 6 & 0x3F)
+            if alu is None:
+                raise RuntimeError(f"Invalid instruction {word:016b}")
+            decoded.append((None, word >> 12 & 1, alu, word & 0x20, word & 0x10, word & 0x08, word & 7))
+        return decoded
+
+    def run(self, max_cycles=1_000_000_000):
+        """
+        Run the program until it halts, by Sys.halt or in a loop jumping to itself.
+        :param max_cycles: maximum number of instructions executed before giving up
+        :return:
+        """
+        code = self.decode()
+        ram = self.ram
+        a = d = pc = 0
+        cycles = self.cycles
+        trap = hackWriter.trap_address
+        while cycles < max_cycles:
+            cycles += 1
+            value, use_m, alu, dest_a, dest_d, dest_m, jump = code[pc]
+            if alu is None:
+                a = value
+                pc += 1
+                continue
+            address = a & 0x7FFF  # the 15 low bits of A address the RAM and the ROM
+            out = ((alu(d, ram[address] if use_m else a) + 0x8000) & 0xFFFF) - 0x8000
+            if dest_m:
+                ram[address] = out
+                if address == trap:
+                    self.trap(out)
+                    if self.halted:
+                        break
+            if dest_a:
+                a = out
+            if dest_d:
+                d = out
+            if jump and (jump & 4 and out < 0 or jump & 2 and out == 0 or jump & 1 and out > 0):
+                if address == pc - 1:  # @loop; 0;JMP at loop
+                    break
+                pc = address
+            else:
+                pc += 1
+        else:
+            raise RuntimeError(f"Program did not halt within {max_cycles} cycles")
+        self.cycles = cycles
+
+    def trap(self, number):
+        """
+        Run the OS stand-in of a trap stub, its arguments being the argument segment of the stub.
+        :param number: index of the stub in traps
+        :return:
+        """
+        name, nArgs = self.traps[number]
+        if name not in self.builtins:
+            raise RuntimeError(f"Call to undefined function {name}")
+        ram = self.ram
+        arguments = ram[vmEmulator.ARG]
+        result = self.builtins[name](*ram[arguments:arguments + nArgs])
+        ram[hackWriter.trap_address] = vmEmulator.wrap(result or 0)
+
+
+def compare(classes, max_cycles=1_000_000_000):
+    """
+    Run a program with vmEmulator and translated by StandardWriter and HackWriter.
+    :param classes: dict of class name to its list of VM commands
+    :param max_cycles: maximum number of instructions executed by each translation
+    :return: dict of output (of vmEmulator), steps (VM commands executed) and standard and cached, the results of
+    each translation: instructions (program size), cycles (instructions executed) and output
+    """
+    emulator = vmEmulator.VMEmulator()
+    for class_name, commands in classes.items():
+        emulator.load(class_name, commands)
+    emulator.run()
+    result = {'output': ''.join(emulator.output), 'steps': emulator.steps}
+    for name, standard in (('standard', True), ('cached', False)):
+        translation = hackWriter.translate(classes, os_traps=True, standard=standard)
+        cpu = HackCPU(assemble(translation['asm']), translation['traps'])
+        cpu.run(max_cycles)
+        result[name] = {'instructions': translation['instructions'], 'cycles': cpu.cycles,
+                        'output': ''.join(cpu.output)}
+    return result
+
+
+def main(argv=None):
+    """
+    Check and measure the Hack translations of a directory of VM code.
+    :param argv: list of command line arguments, defaults to sys.argv
+    :return: exit status, 1 if a translation does not print what vmEmulator prints
+    """
+    parser = argparse.ArgumentParser(description="Run the Hack translations of VM code against vmEmulator.")
+    parser.add_argument('path', help=".vm file or directory of .vm files, such as a my_jack output directory")
+    parser.add_argument('--bytecode', action='store_true', help="read the .vmb files of the directory instead")
+    parser.add_argument('--max-cycles', type=int, default=1_000_000_000, help="stop after this many instructions")
+    parser.add_argument('--json', metavar='FILE', help="write the results as JSON to FILE")
+    args = parser.parse_args(argv)
+
+    try:
+        result = compare(hackWriter.read_directory(args.path, args.bytecode), args.max_cycles)
+    except (TypeError, RuntimeError) as error:
+        print(f"{args.path}: error: {error}", file=sys.stderr)
+        return 1
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(result, json_file, indent=2)
+    status = 0
+    print(f"{result['steps']} VM commands executed")
+    for name in ('standard', 'cached'):
+        translation = result[name]
+        matches = translation['output'] == result['output']
+        status |= not matches
+        print(f"{name:>8}: {translation['instructions']:>7} instructions, {translation['cycles']:>10} cycles, "
+              f"output {'matches' if matches else 'differs'}")
+    standard, cached = result['standard'], result['cached']
+    print(f"top of stack caching: {cached['cycles'] / standard['cycles']:.2f}x cycles, "
+          f"{cached['instructions'] / standard['instructions']:.2f}x instructions")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,523 @@
+"""
+Hack assembly back end: translates the VM commands VMWritter emits straight into Hack assembly, without a separate VM
+translator pass. HackWriter keeps the top of the stack in the D register across commands. It tracks at translation time
+whether D holds the top of the stack (cached) or the whole stack is in RAM (flushed): a push only spills D to RAM when
+it is cached, an arithmetic command or a pop only reloads D when it is flushed, and a pop leaves the stack flushed.
+Labels, goto and calls start from a flushed stack, a call returns with the value cached. push and pop are specialized
+by segment and index, and calls and returns jump to shared trampolines ($call.N per argument count and $return)
+instead of being expanded at every call site. lt and gt subtract their operands like the standard translation does,
+so they only hold for operands less than 32768 apart.
+
+StandardWriter is the textbook translation, every push and pop going through RAM and calls expanded inline. It is the
+reference HackWriter is checked against by hackEmulator.py.
+
+    python hackWriter.py Pong/my_jack -o Pong.asm
+"""
+
+import argparse
+import os
+import sys
+import vmBytecode, wholeProgram
+
+segment_pointers = {'local': 'LCL', 'argument': 'ARG', 'this': 'THIS', 'that': 'THAT'}
+binary_comps = {'add': 'D+M', 'sub': 'M-D', 'and': 'D&M', 'or': 'D|M'}
+unary_comps = {'neg': '-D', 'not': '!D'}
+comparison_jumps = {'eq': 'JEQ', 'gt': 'JGT', 'lt': 'JLT'}
+stack_base = 256
+# RAM address written by the OS stubs of translate(os_traps=True), where hackEmulator runs the OS stand-in named by the
+# value written and leaves its result
+trap_address = 32767
+# highest segment index reached by a chain of A=A+1 rather than by adding the index to the segment base
+max_index_chain = 8
+
+
+def fixed_address(class_name, segment, index):
+    """
+    Return the assembly symbol or address of an entry of the static, temp and pointer segments.
+    :param class_name: name of the class, which scopes its static segment
+    :param segment: static, temp or pointer
+    :param index: int
+    :return: string
+    """
+    if segment == 'static':
+        return f'{class_name}.{index}'
+    if segment == 'temp' and index < 8:
+        return str(5 + index)
+    if segment == 'pointer' and index < 2:
+        return ('THIS', 'THAT')[index]
+    raise TypeError(f"Invalid segment entry {segment} {index}")
+
+
+class HackWriter:
+
+    def __init__(self):
+        """
+        Initialize HackWriter, translate a program with writeBootstrap(), writeClass() for every class and
+        writeTrampolines(), then read the assembly from lines.
+        """
+        self.lines = []
+        self.class_name = None
+        self.function = None
+        self.cached = False  # True while D holds the top of the stack
+        self.label_count = 0
+        self.functions = set()
+        self.calls = {}  # called function name: argument count of its first call
+        self.call_arities = set()  # argument counts of the $call trampolines used
+
+    def newLabel(self, kind):
+        """
+        Return a new assembly label of the current function.
+        :param kind: string naming what the label is for
+        :return: string
+        """
+        self.label_count += 1
+        return f'{self.function}${kind}.{self.label_count}'
+
+    def cache(self):
+        """
+        emits the instructions loading the top of the stack into D, unless it is there already
+        :return:
+        """
+        if not self.cached:
+            self.lines += ('@SP', 'AM=M-1', 'D=M')
+            self.cached = True
+
+    def flush(self):
+        """
+        emits the instructions spilling D to the stack in RAM, if it holds the top of the stack
+        :return:
+        """
+        if self.cached:
+            self.lines += ('@SP', 'AM=M+1', 'A=A-1', 'M=D')
+            self.cached = False
+
+    def writeClass(self, class_name, commands):
+        """
+        translates the VM commands of a class
+        :param class_name: name of the class, which scopes its static segment
+        :param commands: iterable of VM command strings
+        :return:
+        """
+        self.class_name = class_name
+        for command in commands:
+            words = command.split()
+            name = words[0]
+            if name == 'push':
+                self.writePush(words[1], int(words[2]))
+            elif name == 'pop':
+                self.writePop(words[1], int(words[2]))
+            elif name in binary_comps or name in unary_comps or name in comparison_jumps:
+                self.writeArithmetic(name)
+            elif name == 'label':
+                self.writeLabel(words[1])
+            elif name == 'goto':
+                self.writeGoto(words[1])
+            elif name == 'if-goto':
+                self.writeIf(words[1])
+            elif name == 'call':
+                self.writeCall(words[1], int(words[2]))
+            elif name == 'function':
+                self.writeFunction(words[1], int(words[2]))
+            elif name == 'return':
+                self.writeReturn()
+            else:
+                raise TypeError(f"Unknown VM command {command!r}")
+
+    def segmentAddress(self, segment, index):
+        """
+        Return the instructions setting A to the address of a segment entry, leaving D unchanged.
+        :param segment: local, argument, this, that, static, temp or pointer
+        :param index: int, at most max_index_chain for the segments addressed through a pointer
+        :return: list of assembly lines
+        """
+        if segment not in segment_pointers:
+            return ['@' + fixed_address(self.class_name, segment, index)]
+        if index == 0:
+            return ['@' + segment_pointers[segment], 'A=M']
+        return ['@' + segment_pointers[segment], 'A=M+1'] + ['A=A+1'] * (index - 1)
+
+    def writePush(self, segment, index):
+        """
+        writes a VM push command, the pushed value ending up cached in D
+        :param segment: constant, argument, local, static, this, that, pointer or temp
+        :param index: integer
+        :return:
+        """
+        self.flush()
+        if segment == 'constant':
+            if index > 32767:
+                raise TypeError(f"Constant {index} is out of range")
+            self.lines += ('D=0',) if index == 0 else ('D=1',) if index == 1 else (f'@{index}', 'D=A')
+        elif segment in segment_pointers and index > 2:
+            self.lines += (f'@{index}', 'D=A', '@' + segment_pointers[segment], 'A=D+M', 'D=M')
+        else:
+            self.lines += self.segmentAddress(segment, index) + ['D=M']
+        self.cached = True
+
+    def writePop(self, segment, index):
+        """
+        writes a VM pop command, which leaves the stack flushed
+        :param segment: argument, local, static, this, that, pointer or temp
+        :param index: integer
+        :return:
+        """
+        if segment in segment_pointers and index > max_index_chain:
+            pointer = '@' + segment_pointers[segment]
+            if self.cached:
+                # D + address is kept in R13, A=M-D then gets the address back while D still holds the value
+                self.lines += (pointer, 'D=D+M', f'@{index}', 'D=D+A', '@R13', 'M=D', pointer, 'D=D-M', f'@{index}',
+                               'D=D-A', '@R13', 'A=M-D', 'M=D')
+            else:
+                self.lines += (f'@{index}', 'D=A', pointer, 'D=D+M', '@R13', 'M=D', '@SP', 'AM=M-1', 'D=M', '@R13',
+                               'A=M', 'M=D')
+        else:
+            self.cache()
+            self.lines += self.segmentAddress(segment, index) + ['M=D']
+        self.cached = False
+
+    def writeArithmetic(self, command):
+        """
+        writes a VM arithmetic command, on the cached top of the stack
+        :param command: add, sub, neg, eq, gt, lt, and, or, not
+        :return:
+        """
+        self.cache()
+        if command in unary_comps:
+            self.lines.append('D=' + unary_comps[command])
+        elif command in binary_comps:
+            self.lines += ('@SP', 'AM=M-1', 'D=' + binary_comps[command])
+        elif command == 'eq':
+            # D is 0 when equal, which !D turns into true, otherwise the false value is the negated true
+            label = self.newLabel('eq')
+            self.lines += ('@SP', 'AM=M-1', 'D=M-D', f'@{label}', 'D;JEQ', 'D=-1', f'({label})', 'D=!D')
+        else:
+            true, end = self.newLabel(command), self.newLabel(command)
+            self.lines += ('@SP', 'AM=M-1', 'D=M-D', f'@{true}', 'D;' + comparison_jumps[command], 'D=0',
+                           f'@{end}', '0;JMP', f'({true})', 'D=-1', f'({end})')
+
+    def writeLabel(self, label):
+        """
+        writes a VM label command
+        :param label: string
+        :return:
+        """
+        self.flush()
+        self.lines.append(f'({self.function}${label})')
+
+    def writeGoto(self, label):
+        """
+        writes a VM goto command
+        :param label: string
+        :return:
+        """
+        self.flush()
+        self.lines += (f'@{self.function}${label}', '0;JMP')
+
+    def writeIf(self, label):
+        """
+        writes a VM if-goto command. The condition is tested in D, so both paths continue with the stack flushed.
+        :param label: string
+        :return:
+        """
+        self.cache()
+        self.lines += (f'@{self.function}${label}', 'D;JNE')
+        self.cached = False
+
+    def writeCall(self, name, nArgs):
+        """
+        writes a VM call command, jumping to the $call trampoline of nArgs with the function address in R13 and the
+        return address in D. The callee returns its value cached in D.
+        :param name: function name
+        :param nArgs: number of arguments on the stack
+        :return:
+        """
+        self.flush()
+        self.calls.setdefault(name, nArgs)
+        self.call_arities.add(nArgs)
+        return_label = self.newLabel('ret')
+        self.lines += (f'@{name}', 'D=A', '@R13', 'M=D', f'@{return_label}', 'D=A', f'@$call.{nArgs}', '0;JMP',
+                       f'({return_label})')
+        self.cached = True
+
+    def writeFunction(self, name, nLocals):
+        """
+        writes a VM function command, clearing its locals in RAM
+        :param name: function name
+        :param nLocals: number of local variables
+        :return:
+        """
+        if name in self.functions:
+            raise TypeError(f"Function {name} is defined twice")
+        self.functions.add(name)
+        self.function = name
+        self.cached = False
+        self.lines.append(f'({name})')
+        if nLocals == 1:
+            self.lines += ('@SP', 'AM=M+1', 'A=A-1', 'M=0')
+        elif nLocals > 1:
+            self.lines += ['@SP', 'A=M', 'M=0'] + ['A=A+1', 'M=0'] * (nLocals - 1) + ['D=A+1', '@SP', 'M=D']
+
+    def writeReturn(self):
+        """
+        writes a VM return command, jumping to the $return trampoline with the value in D
+        :return:
+        """
+        self.cache()
+        self.lines += ('@$return', '0;JMP')
+        self.cached = False
+
+    def writePushD(self):
+        """
+        writes the instructions pushing D, the stack being flushed
+        :return:
+        """
+        self.cached = True
+
+    def writeTrap(self, name, number):
+        """
+        writes a stub of an undefined OS function that writes its number to trap_address and returns what is then
+        found there, for hackEmulator to run the OS stand-in in between
+        :param name: function name
+        :param number: index of the function in the traps of translate()
+        :return:
+        """
+        self.writeFunction(name, 0)
+        self.lines += (f'@{number}', 'D=A', f'@{trap_address}', 'M=D', 'D=M')
+        self.writePushD()
+        self.writeReturn()
+
+    def writeBootstrap(self, entry):
+        """
+        writes the code setting up the stack and calling the entry function, halting in a loop once it returns
+        :param entry: function name
+        :return:
+        """
+        self.lines += (f'@{stack_base}', 'D=A', '@SP', 'M=D')
+        self.function = '$bootstrap'
+        self.writeCall(entry, 0)
+        self.lines += ('($halt)', '@$halt', '0;JMP')
+        self.cached = False
+
+    def writeTrampolines(self):
+        """
+        writes the call and return code shared by every call site
+        :return:
+        """
+        for nArgs in sorted(self.call_arities):
+            # D is the return address, R13 the function address and SP just past the arguments
+            self.lines.append(f'($call.{nArgs})')
+            self.lines += ('@SP', 'A=M', 'M=D')
+            for pointer in ('LCL', 'ARG', 'THIS', 'THAT'):
+                self.lines += (f'@{pointer}', 'D=M', '@SP', 'AM=M+1', 'M=D')
+            self.lines += ('@SP', 'MD=M+1', '@LCL', 'M=D', f'@{nArgs + 5}', 'D=D-A', '@ARG', 'M=D', '@R13', 'A=M',
+                           '0;JMP')
+        # D is the return value, which stays in D for the caller, the stack being cut back to the arguments
+        self.lines += ('($return)', '@R13', 'M=D', '@LCL', 'D=M', '@5', 'A=D-A', 'D=M', '@R14', 'M=D', '@ARG',
+                       'D=M', '@SP', 'M=D')
+        for pointer in ('THAT', 'THIS', 'ARG', 'LCL'):
+            self.lines += ('@LCL', 'AM=M-1', 'D=M', f'@{pointer}', 'M=D')
+        self.lines += ('@R13', 'D=M', '@R14', 'A=M', '0;JMP')
+
+
+class StandardWriter(HackWriter):
+    """Textbook translation without caching: every command goes through the stack in RAM, calls are expanded inline."""
+
+    def writePush(self, segment, index):
+        """
+        writes a VM push command
+        :param segment: constant, argument, local, static, this, that, pointer or temp
+        :param index: integer
+        :return:
+        """
+        if segment == 'constant':
+            self.lines += (f'@{index}', 'D=A')
+        elif segment in segment_pointers:
+            self.lines += (f'@{index}', 'D=A', '@' + segment_pointers[segment], 'A=D+M', 'D=M')
+        else:
+            self.lines += ('@' + fixed_address(self.class_name, segment, index), 'D=M')
+        self.writePushD()
+
+    def writePushD(self):
+        """
+        writes the instructions pushing D
+        :return:
+        """
+        self.lines += ('@SP', 'A=M', 'M=D', '@SP', 'M=M+1')
+
+    def writePop(self, segment, index):
+        """
+        writes a VM pop command
+        :param segment: argument, local, static, this, that, pointer or temp
+        :param index: integer
+        :return:
+        """
+        if segment in segment_pointers:
+            self.lines += (f'@{index}', 'D=A', '@' + segment_pointers[segment], 'D=D+M', '@R13', 'M=D', '@SP',
+                           'AM=M-1', 'D=M', '@R13', 'A=M', 'M=D')
+        else:
+            self.lines += ('@SP', 'AM=M-1', 'D=M', '@' + fixed_address(self.class_name, segment, index), 'M=D')
+
+    def writeArithmetic(self, command):
+        """
+        writes a VM arithmetic command
+        :param command: add, sub, neg, eq, gt, lt, and, or, not
+        :return:
+        """
+        if command in unary_comps:
+            self.lines += ('@SP', 'A=M-1', 'M=' + unary_comps[command].replace('D', 'M'))
+        elif command in binary_comps:
+            self.lines += ('@SP', 'AM=M-1', 'D=M', 'A=A-1', 'M=' + binary_comps[command])
+        else:
+            true, end = self.newLabel(command), self.newLabel(command)
+            self.lines += ('@SP', 'AM=M-1', 'D=M', 'A=A-1', 'D=M-D', f'@{true}', 'D;' + comparison_jumps[command],
+                           '@SP', 'A=M-1', 'M=0', f'@{end}', '0;JMP', f'({true})', '@SP', 'A=M-1', 'M=-1', f'({end})')
+
+    def writeIf(self, label):
+        """
+        writes a VM if-goto command
+        :param label: string
+        :return:
+        """
+        self.lines += ('@SP', 'AM=M-1', 'D=M', f'@{self.function}${label}', 'D;JNE')
+
+    def writeCall(self, name, nArgs):
+        """
+        writes a VM call command, pushing the frame of the callee inline
+        :param name: function name
+        :param nArgs: number of arguments on the stack
+        :return:
+        """
+        self.calls.setdefault(name, nArgs)
+        return_label = self.newLabel('ret')
+        self.lines += (f'@{return_label}', 'D=A')
+        self.writePushD()
+        for pointer in ('LCL', 'ARG', 'THIS', 'THAT'):
+            self.lines += (f'@{pointer}', 'D=M')
+            self.writePushD()
+        self.lines += ('@SP', 'D=M', f'@{nArgs + 5}', 'D=D-A', '@ARG', 'M=D', '@SP', 'D=M', '@LCL', 'M=D', f'@{name}',
+                       '0;JMP', f'({return_label})')
+
+    def writeFunction(self, name, nLocals):
+        """
+        writes a VM function command, pushing 0 for each local variable
+        :param name: function name
+        :param nLocals: number of local variables
+        :return:
+        """
+        super().writeFunction(name, 0)
+        for index in range(nLocals):
+            self.writePush('constant', 0)
+
+    def writeReturn(self):
+        """
+        writes a VM return command, restoring the frame of the caller inline
+        :return:
+        """
+        self.lines += ('@LCL', 'D=M', '@R13', 'M=D', '@5', 'A=D-A', 'D=M', '@R14', 'M=D', '@SP', 'AM=M-1', 'D=M',
+                       '@ARG', 'A=M', 'M=D', '@ARG', 'D=M+1', '@SP', 'M=D')
+        for pointer in ('THAT', 'THIS', 'ARG', 'LCL'):
+            self.lines += ('@R13', 'AM=M-1', 'D=M', f'@{pointer}', 'M=D')
+        self.lines += ('@R14', 'A=M', '0;JMP')
+
+    def writeTrampolines(self):
+        """
+        nothing is shared between call sites
+        :return:
+        """
+
+
+def translate(classes, os_traps=False, standard=False):
+    """
+    Translate a whole program into Hack assembly, starting from Sys.init, or from Main.main without an OS.
+    :param classes: dict of class name to its list of VM commands
+    :param os_traps: give the functions called but not defined a stub calling the OS stand-ins of hackEmulator,
+    instead of failing
+    :param standard: use the reference StandardWriter instead of HackWriter
+    :return: dict of asm (list of assembly lines), instructions (number of instructions) and traps (list of the
+    (function name, argument count) of the stubs, by number)
+    """
+    defined = {command.split()[1] for commands in classes.values() for command in commands
+               if command.startswith('function ')}
+    entry = next((name for name in wholeProgram.entry_points if name in defined), None)
+    if entry is None:
+        raise TypeError(f"The program defines none of {', '.join(wholeProgram.entry_points)}")
+    writer = StandardWriter() if standard else HackWriter()
+    writer.writeBootstrap(entry)
+    for class_name, commands in classes.items():
+        writer.writeClass(class_name, commands)
+    undefined = sorted(name for name in writer.calls if name not in writer.functions)
+    if undefined and not os_traps:
+        raise TypeError(f"Calls to undefined functions {', '.join(undefined)}, the OS .vm files are needed")
+    traps = []
+    for name in undefined:
+        writer.writeTrap(name, len(traps))
+        traps.append((name, writer.calls[name]))
+    writer.writeTrampolines()
+    return {'asm': writer.lines, 'instructions': sum(1 for line in writer.lines if not line.startswith('(')),
+            'traps': traps}
+
+
+def read_directory(path, bytecode=False):
+    """
+    Read the VM code of every .vm file of a directory, or of a single file.
+    :param path: os path of a directory or a .vm file
+    :param bytecode: read the .vmb files of the directory instead
+    :return: dict of class name to its list of VM commands, sorted by class name
+    """
+    extension = '.vmb' if bytecode else '.vm'
+    files = [path] if os.path.isfile(path) else sorted(
+        os.path.join(path, file) for file in os.listdir(path) if file.endswith(extension))
+    classes = {}
+    for file in files:
+        class_name = os.path.splitext(os.path.basename(file))[0]
+        if file.endswith('.vmb'):
+            classes[class_name] = vmBytecode.load(file).commands()
+            continue
+        with open(file, 'r') as vm_file:
+            commands = [line.split('//', 1)[0].strip() for line in vm_file]
+        classes[class_name] = [command for command in commands if command]
+    return classes
+
+
+def translate_directory(path, asm_path, bytecode=False, standard=False):
+    """
+    Translate the VM code of a directory into a single .asm file.
+    :param path: os path of a directory of .vm files, the OS classes included
+    :param asm_path: os path of the .asm file written
+    :param bytecode: read the .vmb files of the directory instead
+    :param standard: use the reference StandardWriter instead of HackWriter
+    :return: dict of translate()
+    """
+    result = translate(read_directory(path, bytecode), standard=standard)
+    with open(asm_path, 'w') as asm_file:
+        asm_file.write('\n'.join(result['asm']) + '\n')
+    return result
+
+
+def main(argv=None):
+    """
+    Translate a directory of VM code into Hack assembly.
+    :param argv: list of command line arguments, defaults to sys.argv
+    :return: exit status
+    """
+    parser = argparse.ArgumentParser(description="Translate VM code into Hack assembly.")
+    parser.add_argument('path', help="directory of .vm files, OS classes included, or a single .vm file")
+    parser.add_argument('-o', '--output', metavar='FILE', help="output .asm file (default: DIR/DIR.asm)")
+    parser.add_argument('--bytecode', action='store_true', help="read the .vmb files of the directory instead")
+    parser.add_argument('--standard', action='store_true',
+                        help="use the textbook translation, without top of stack caching and trampolines")
+    args = parser.parse_args(argv)
+    asm_path = args.output or os.path.splitext(os.path.normpath(args.path))[0] + '.asm'
+    if args.output is None and os.path.isdir(args.path):
+        asm_path = os.path.join(args.path, os.path.basename(os.path.abspath(args.path)) + '.asm')
+    try:
+        result = translate_directory(args.path, asm_path, args.bytecode, args.standard)
+    except TypeError as error:
+        print(f"{args.path}: error: {error}", file=sys.stderr)
+        return 1
+    print(f"{asm_path}: {result['instructions']} instructions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Recompiles a Jack class after an edit, redoing only the subroutines that changed. The tokens of the class are split into
+its header (class name and class variables) and one slice per subroutine. The AST of an unchanged slice is reused, and
+so is its VM code as long as the header is unchanged and the if/while label counters are the same at its start, which
+is what the VM code of a subroutine depends on. The peephole optimizer still runs over the whole class, so the output
+is the same as a full compilation.
+"""
+
+import io
+import tokenizer, tokenStream, compilationEngine, codeGenerator, VMWriter, vmOptimizer, xmlWriter, jackAST
+
+subroutine_keywords = ('constructor', 'function', 'method')
+
+
+def split_class(tokens):
+    """
+    Split the tokens of a class into its header, its subroutines and its tail.
+    :param tokens: list of tokenizer.Token
+    :return: tuple of (header tokens, list of the token lists of each subroutine, tail tokens), the tail being the
+    closing brace of the class and anything after it, or None if the tokens are not laid out as a class
+    """
+    header, subroutines = None, []
+    depth = 0
+    start = None  # index of the keyword of the subroutine being split
+    for index, token in enumerate(tokens):
+        if token.type == tokenizer.SYMBOL:
+            if token.value == '{':
+                depth += 1
+            elif token.value == '}':
+                depth -= 1
+                if depth == 1 and start is not None:
+                    subroutines.append(tokens[start:index + 1])
+                    start = None
+                elif depth == 0:
+                    if header is None:
+                        header = tokens[:index]
+                    return header, subroutines, tokens[index:]
+        elif depth == 1 and start is None:
+            if token.type == tokenizer.KEYWORD and token.value in subroutine_keywords:
+                if header is None:
+                    header = tokens[:index]
+                start = index
+            elif header is not None:  # tokens between subroutines
+                return None
+    return None
+
+
+class IncrementalCompiler:
+
+    def __init__(self, xml=True, optimize=0, pool_strings=False):
+        """
+        Initialize IncrementalCompiler for one class, with the options of CompilationEngline.
+        :param xml: False to only produce VM code
+        :param optimize: optimization level of the VM code
+        :param pool_strings: build each string literal once per class. The string pool spans the whole class, so the
+        VM code of subroutines is then always regenerated, only their AST is reused.
+        """
+        self.xml = xml
+        self.optimize = optimize
+        self.pool_strings = pool_strings
+        self.optimizer = vmOptimizer.optimizer(optimize)
+        self.header = None  # token values of the class header of the last compilation
+        self.subroutines = {}  # token values of a subroutine: its jackAST.SubroutineDec
+        self.vm_code = {}  # (token values, while_count, if_count): (VM commands, while_count and if_count increments)
+
+    def compile(self, source):
+        """
+        Compile the source of the class, reusing what is unchanged since the last call.
+        :param source: string of jack source
+        :return: dict of vm (VM code), xml and tokens_xml (None without xml), tokens (number of tokens), subroutines,
+        parsed (number of subroutines parsed again) and generated (number of subroutines whose VM code was generated
+        again)
+        """
+        tokens = list(tokenizer.Tokenizer(io.StringIO(source), None).generate_tokens())
+        layout = split_class(tokens)
+        engine = compilationEngine.CompilationEngline(None, None, self.optimize)
+        if layout is None:
+            # not laid out as a class: the full parser reports the error
+            engine.tokens = tokenStream.TokenStream(tokens)
+            engine.parseClass()
+            raise TypeError(f"Unexpected tokens between the subroutines of {engine.class_name}")
+        header, slices, tail = layout
+        engine.tokens = tokenStream.TokenStream(header + tail)
+        class_node = engine.parseClass()
+        header_key = tuple(token.value for token in header)
+        if header_key != self.header:
+            self.vm_code = {}
+
+        vm_file = io.StringIO()
+        vm_writer = VMWriter.VMWritter(vm_file, self.optimizer)
+        generator = codeGenerator.CodeGenerator(vm_writer, self.optimize >= 1, self.pool_strings,
+                                                self.optimize >= 1)
+        generator.startClass(class_node)
+        subroutines, vm_code, nodes = {}, {}, []
+        parsed = generated = 0
+        for tokens_slice in slices:
+            key = tuple(token.value for token in tokens_slice)
+            node = subroutines.get(key) or self.subroutines.get(key)
+            if node is None:
+                engine.tokens = tokenStream.TokenStream(tokens_slice)
+                node, = engine.parseSubroutine()
+                parsed += 1
+            subroutines[key] = node
+            nodes.append(node)
+
+            code_key = (key, generator.while_count, generator.if_count)
+            code = None if self.pool_strings else self.vm_code.get(code_key)
+            if code is None:
+                start = len(vm_writer.instructions)
+                generator.compileSubroutine(node)
+                code = (vm_writer.instructions[start:], generator.while_count - code_key[1],
+                        generator.if_count - code_key[2])
+                generated += 1
+            else:
+                vm_writer.instructions += code[0]
+                generator.while_count += code[1]
+                generator.if_count += code[2]
+            vm_code[code_key] = code
+        generator.finishClass()
+        self.header, self.subroutines, self.vm_code = header_key, subroutines, vm_code
+
+        xml = tokens_xml = None
+        if self.xml:
+            tokens_xml = '<tokens>\n' + ''.join(map(tokenizer.xml_line, tokens)) + '</tokens>\n'
+            xml_file = io.StringIO()
+            xmlWriter.XMLWriter(xml_file).writeClass(jackAST.Class(class_node.name, class_node.class_vars, nodes))
+            xml = xml_file.getvalue()
+        return {'vm': vm_file.getvalue(), 'xml': xml, 'tokens_xml': tokens_xml, 'tokens': len(tokens),
+                'subroutines': len(slices), 'parsed': parsed, 'generated': generated}
@@ -0,0 +1,185 @@
+"""
+Abstract syntax tree of a Jack class, built by the CompilationEngline parser. Nodes are plain __slots__ records, one
+class per grammar rule, so a parsed class can be walked by any number of back ends (XMLWriter, CodeGenerator) and
+optimization passes without parsing it again.
+"""
+
+
+class Node:
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+
+# ---- program structure ----
+
+class Class(Node):
+    """class name { classVarDec* subroutineDec* }"""
+    __slots__ = ('name', 'class_vars', 'subroutines')
+
+    def __init__(self, name, class_vars, subroutines):
+        self.name = name
+        self.class_vars = class_vars
+        self.subroutines = subroutines
+
+
+class ClassVarDec(Node):
+    """(static | field) type varName (, varName)* ;"""
+    __slots__ = ('kind', 'type', 'names')
+
+    def __init__(self, kind, type, names):
+        self.kind = kind
+        self.type = type
+        self.names = names
+
+
+class SubroutineDec(Node):
+    """(constructor | function | method) (void | type) subroutineName ( parameterList ) subroutineBody"""
+    __slots__ = ('kind', 'return_type', 'name', 'parameters', 'var_decs', 'statements')
+
+    def __init__(self, kind, return_type, name, parameters, var_decs, statements):
+        self.kind = kind
+        self.return_type = return_type
+        self.name = name
+        self.parameters = parameters  # list of (type, name)
+        self.var_decs = var_decs
+        self.statements = statements
+
+
+class VarDec(Node):
+    """var type varName (, varName)* ;"""
+    __slots__ = ('type', 'names')
+
+    def __init__(self, type, names):
+        self.type = type
+        self.names = names
+
+
+# ---- statements ----
+
+class LetStatement(Node):
+    """let varName ([ expression ])? = expression ;"""
+    __slots__ = ('name', 'index', 'value')
+
+    def __init__(self, name, index, value):
+        self.name = name
+        self.index = index  # Expression, or None if not an array element
+        self.value = value
+
+
+class IfStatement(Node):
+    """if ( expression ) { statements } (else { statements })?"""
+    __slots__ = ('condition', 'statements', 'else_statements')
+
+    def __init__(self, condition, statements, else_statements):
+        self.condition = condition
+        self.statements = statements
+        self.else_statements = else_statements  # list of statements, or None without else clause
+
+
+class WhileStatement(Node):
+    """while ( expression ) { statements }"""
+    __slots__ = ('condition', 'statements')
+
+    def __init__(self, condition, statements):
+        self.condition = condition
+        self.statements = statements
+
+
+class DoStatement(Node):
+    """do subroutineCall ;"""
+    __slots__ = ('call',)
+
+    def __init__(self, call):
+        self.call = call
+
+
+class ReturnStatement(Node):
+    """return expression? ;"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value  # Expression, or None for a void return
+
+
+# ---- expressions ----
+
+class Expression(Node):
+    """term (op term)*"""
+    __slots__ = ('term', 'operations')
+
+    def __init__(self, term, operations):
+        self.term = term
+        self.operations = operations  # list of (operator, term)
+
+
+class IntegerConstant(Node):
+    __slots__ = ('value', 'text')
+
+    def __init__(self, value, text=None):
+        self.value = value
+        self.text = str(value) if text is None else text  # as written in the source, such as 007
+
+
+class StringConstant(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value  # without quotes
+
+
+class KeywordConstant(Node):
+    """true, false, null or this"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class VarName(Node):
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+
+class ArrayAccess(Node):
+    """varName [ expression ]"""
+    __slots__ = ('name', 'index')
+
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+
+
+class SubroutineCall(Node):
+    """subroutineName ( expressionList ) | (className | varName) . subroutineName ( expressionList )"""
+    __slots__ = ('receiver', 'name', 'arguments')
+
+    def __init__(self, receiver, name, arguments):
+        self.receiver = receiver  # className or varName, or None for a call on this
+        self.name = name
+        self.arguments = arguments
+
+
+class ParenExpression(Node):
+    """( expression )"""
+    __slots__ = ('expression',)
+
+    def __init__(self, expression):
+        self.expression = expression
+
+
+class UnaryOp(Node):
+    """(- | ~) term"""
+    __slots__ = ('operator', 'term')
+
+    def __init__(self, operator, term):
+        self.operator = operator
+        self.term = term
@@ -0,0 +1,51 @@
+"""
+Library interface of the compiler, working on strings instead of files: no file is read or written, so it can be
+embedded in a service. Every call builds its own tokenizer, engine and optimizer; the only state shared between calls
+is the cache of rendered push/pop commands of VMWriter, where concurrent inserts store equal strings. It is therefore
+safe to call from many threads at once.
+
+    result = jackCompiler.compile_source(source)
+    results = jackCompiler.compile_sources({'Main': main_source, 'Point': point_source}, xml=True)
+"""
+
+import io
+import tokenizer, compilationEngine
+
+
+def compile_source(source, xml=False, optimize=0, pool_strings=False):
+    """
+    Compile the jack source of one class in memory.
+    :param source: string of jack source
+    :param xml: True to also produce the T.xml and .xml outputs
+    :param optimize: optimization level of the VM code, see CompilationEngline
+    :param pool_strings: build each string literal once per class, see CompilationEngline
+    :return: dict of class_name, vm (VM code), xml and tokens_xml (None unless xml), tokens (number of tokens)
+    """
+    token_file = io.StringIO() if xml else None
+    compile_file = io.StringIO() if xml else None
+    vm_file = io.StringIO()
+    tokenizer_object = tokenizer.Tokenizer(io.StringIO(source), token_file)
+    compile_object = compilationEngine.CompilationEngline(compile_file, vm_file, optimize, pool_strings)
+    compile_object.add_token_source(tokenizer_object.generate_tokens())
+    compile_object.compileClass()
+    return {'class_name': compile_object.class_name, 'vm': vm_file.getvalue(),
+            'xml': compile_file.getvalue() if xml else None, 'tokens_xml': token_file.getvalue() if xml else None,
+            'tokens': compile_object.tokens.consumed}
+
+
+def compile_sources(sources, xml=False, optimize=0, pool_strings=False):
+    """
+    Compile the classes of a program in memory.
+    :param sources: dict of class name to its jack source, each source declaring the class it is named after
+    :param xml: True to also produce the T.xml and .xml outputs
+    :param optimize: optimization level of the VM code, see CompilationEngline
+    :param pool_strings: build each string literal once per class, see CompilationEngline
+    :return: dict of class name to its compile_source result
+    """
+    results = {}
+    for name, source in sources.items():
+        result = compile_source(source, xml, optimize, pool_strings)
+        if result['class_name'] != name:
+            raise TypeError(f"Source of {name} declares class {result['class_name']}")
+        results[name] = result
+    return results
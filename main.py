@@ -1,54 +1,418 @@
+"""
+Command line entry point of the Jack compiler. Compiles any number of .jack files, directories and glob patterns in
+one process, grouping the files by project directory:
 
-import compilationEngine, tokenizer
+    python main.py Pong Square 'projects/*/' -o build --vm-only -j 8
+"""
+import compilationEngine, tokenizer, buildCache, wholeProgram, compileStats, incrementalCompiler, hackWriter
+import argparse
+import collections
+import cProfile
+import glob
+import json
 import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
 
-INPUT = r"C:\Users\HSapi\Documents\Computer Science\Nand2Tetris\projects\11\Pong"
 
-def file_or_directory(path):
+def output_paths(path, xml=True, output_directory=None, bytecode=False):
     """
-    Yield a file if path is a file or yield files if path is a directory.
-    :param path: os path or path-like object containing .jack file(s)
-    :return: yield a tuple of opened file for reading, .xml file for writing tokens and .xml file for writing compilation.
+    Return the output paths of a .jack file.
+    :param path: os path of a .jack file
+    :param xml: False if the .xml files are not written, their paths are then None
+    :param output_directory: directory of the outputs, defaults to the my_jack directory next to the .jack file
+    :param bytecode: True if the VM code is written as a .vmb file
+    :return: tuple of T.xml, .xml and .vm (or .vmb) paths
     """
-    # helper function to create .xml files.
-    def xml_helper(f, read_file):
-        root, ext = os.path.splitext(f)
-        directory = os.path.join(path, 'my_jack')
-        os.makedirs(directory, exist_ok=True)
-        token_output = open(os.path.join(directory, root + 'T.xml'), "w")
-        compile_output = open(os.path.join(directory, root + '.xml'), "w")
-        vm_output = open(os.path.join(directory, root + '.vm'), "w")
-        return tuple((read_file, token_output, compile_output, vm_output))
+    root, ext = os.path.splitext(os.path.basename(path))
+    directory = output_directory or os.path.join(os.path.dirname(path), 'my_jack')
+    vm_path = os.path.join(directory, root + ('.vmb' if bytecode else '.vm'))
+    if not xml:
+        return None, None, vm_path
+    return os.path.join(directory, root + 'T.xml'), os.path.join(directory, root + '.xml'), vm_path
 
-    # path is a single .jack file
+
+def jack_files(path):
+    """
+    List the .jack files to compile, sorted so the compile order is deterministic.
+    :param path: os path of a .jack file or of a directory containing .jack files
+    :return: list of .jack file paths
+    """
     if os.path.isfile(path):
-        read_file = open(path, 'r')
-        file = os.path.basename(path)
-        # make path without file name for creating folder
-        path = os.path.dirname(path)
-        yield xml_helper(file, read_file)
-    # path is a directory containing multi .jack files
-    else:
-        filelist = os.listdir(path)
-        for file in filelist:
-            if file.endswith(".jack"):
-                read_file = open(os.path.join(path,file), 'r')
-                yield xml_helper(file, read_file)
+        return [path]
+    return sorted(os.path.join(path, file) for file in os.listdir(path) if file.endswith(".jack"))
 
-if __name__ == "__main__":
 
-    file_objects = file_or_directory(INPUT)
-    for read_file, token_file, compile_file, vm_file in file_objects:
-        print(read_file)
-        tokenizer_object = tokenizer.Tokenizer(read_file, token_file)
-        compile_object = compilationEngine.CompilationEngline(compile_file, vm_file)
+def find_projects(inputs):
+    """
+    Expand files, directories and glob patterns into projects, a project being a directory of .jack files.
+    :param inputs: list of os paths or glob patterns
+    :return: dict of project directory to its list of .jack files, in input order
+    """
+    projects = {}
+    for pattern in inputs:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise FileNotFoundError(f"No match for {pattern}")
+        for match in matches:
+            if os.path.isdir(match):
+                project, files = os.path.normpath(match), jack_files(match)
+                if not files and glob.has_magic(pattern):
+                    continue
+            elif os.path.isfile(match) and match.endswith('.jack'):
+                project, files = os.path.dirname(os.path.normpath(match)) or '.', [match]
+            elif glob.has_magic(pattern):
+                continue
+            else:
+                raise FileNotFoundError(f"{match} is not a .jack file or a directory")
+            known = projects.setdefault(project, [])
+            known.extend(file for file in files if file not in known)
+    return projects
+
+
+def project_output_directories(projects, output_root):
+    """
+    Map each project to its output directory under output_root, mirroring the project paths below their common parent.
+    :param projects: list of project directories
+    :param output_root: os path of the output directory, None to write in my_jack next to the sources
+    :return: dict of project directory to output directory or None
+    """
+    if output_root is None:
+        return {project: None for project in projects}
+    absolute = [os.path.abspath(project) for project in projects]
+    parent = os.path.commonpath([os.path.dirname(project) for project in absolute])
+    return {project: os.path.join(output_root, os.path.relpath(path, parent))
+            for project, path in zip(projects, absolute)}
+
 
-        # write on token_file and stores token list in compileEngine object
-        tokenizer_object.write_tokens(compile_object)
+def compile_file(path, xml=True, cache_directory=None, output_directory=None, optimize=0, pool_strings=False,
+                 stats=False, bytecode=False):
+    """
+    Compile a single .jack file.
+    :param path: os path of a .jack file
+    :param xml: False to only emit the .vm file
+    :param cache_directory: os path of a BuildCache, outputs of unchanged files are then restored from it
+    :param output_directory: directory of the outputs, defaults to the my_jack directory next to the .jack file
+    :param optimize: optimization level of the VM code
+    :param pool_strings: build each string literal once per class, see CompilationEngline
+    :param stats: collect the statistics of the compilation, see compileStats
+    :param bytecode: write the VM code as a binary .vmb file, see vmBytecode
+    :return: dict of cached (True if the outputs were restored from the cache), tokens, seconds, the hit counts of
+    the optimizer rules and stats (a compileStats report with the tracemalloc peak, or None if not collected)
+    """
+    start = time.perf_counter()
+    token_path, compile_path, vm_path = outputs = output_paths(path, xml, output_directory, bytecode)
+    outputs = [output for output in outputs if output is not None]
+    os.makedirs(os.path.dirname(vm_path), exist_ok=True)
 
-        # write on compile_file
-        compile_object.add_tokens(tokenizer_object.tokens)
+    if cache_directory is not None:
+        cache = buildCache.BuildCache(cache_directory)
+        with open(path, 'rb') as source:
+            key = cache.key(source.read(), {'file': os.path.basename(path), 'xml': xml, 'optimize': optimize,
+                                            'pool_strings': pool_strings, 'bytecode': bytecode})
+        metadata = cache.restore(key, outputs)
+        if metadata is not None:
+            return {'cached': True, 'tokens': metadata['tokens'], 'seconds': time.perf_counter() - start, 'rules': {},
+                    'stats': None}
+
+    if stats:
+        collected = compileStats.Stats()
+        tracemalloc.start()
+    files = [open(path, 'r')]
+    try:
+        for output in (token_path, compile_path):
+            files.append(open(output, 'w') if output is not None else None)
+        files.append(open(vm_path, 'wb' if bytecode else 'w'))
+        read_file, token_file, xml_file, vm_file = files
+        tokenizer_object = tokenizer.Tokenizer(read_file, token_file)
+        compile_object = compilationEngine.CompilationEngline(xml_file, vm_file, optimize, pool_strings, bytecode)
+
+        # tokens are written on token_file as compile_object pulls them while writing on compile_file
+        if stats:
+            compileStats.instrument(collected, tokenizer_object, compile_object)
+        else:
+            compile_object.add_token_source(tokenizer_object.generate_tokens())
         compile_object.compileClass()
+    finally:
+        for file in files:
+            if file is not None:
+                file.close()
+        if stats:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    if cache_directory is not None:
+        cache.store(key, outputs, {'tokens': compile_object.tokens.consumed})
+    rules = dict(compile_object.optimizer.hits) if compile_object.optimizer is not None else {}
+    report = None
+    if stats:
+        report = dict(collected.report(), peak_memory=peak_memory)
+    return {'cached': False, 'tokens': compile_object.tokens.consumed, 'seconds': time.perf_counter() - start,
+            'rules': rules, 'stats': report}
 
 
+def compile_files(paths, xml=True, jobs=None, cache_directory=None, output_directories=None, optimize=0,
+                  pool_strings=False, stats=False, bytecode=False):
+    """
+    Compile .jack files in parallel across a process pool. Each file is independent, so they are compiled by separate
+    workers, but results are reported in the order of paths.
+    :param paths: list of .jack file paths
+    :param xml: False to only emit the .vm files
+    :param jobs: number of worker processes, defaults to the cpu count. 1 compiles in this process.
+    :param cache_directory: os path of a BuildCache to restore unchanged files from
+    :param output_directories: list of output directories matching paths, None for the default my_jack directories
+    :param optimize: optimization level of the VM code
+    :param pool_strings: build each string literal once per class, see CompilationEngline
+    :param stats: collect the statistics of each compilation, see compileStats
+    :param bytecode: write the VM code as binary .vmb files, see vmBytecode
+    :return: list of (path, result, error) tuples, result is the compile_file dict or None if error is raised
+    """
+    if output_directories is None:
+        output_directories = [None] * len(paths)
+    results = []
+    if jobs == 1 or len(paths) <= 1:
+        for path, output_directory in zip(paths, output_directories):
+            try:
+                results.append((path, compile_file(path, xml, cache_directory, output_directory, optimize,
+                                                   pool_strings, stats, bytecode), None))
+            except Exception as error:
+                results.append((path, None, error))
+        return results
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(compile_file, path, xml, cache_directory, output_directory, optimize, pool_strings,
+                                   stats, bytecode)
+                   for path, output_directory in zip(paths, output_directories)]
+        for path, future in zip(paths, futures):
+            try:
+                results.append((path, future.result(), None))
+            except Exception as error:
+                results.append((path, None, error))
+    return results
+
+
+def watch(inputs, output_root=None, xml=True, optimize=0, pool_strings=False, interval=0.5, rounds=None):
+    """
+    Keep compiling inputs as they change, polling the modification times of their .jack files. Each class keeps an
+    IncrementalCompiler, so an edit only re-parses and regenerates the subroutines it touches.
+    :param inputs: list of os paths or glob patterns, see find_projects
+    :param output_root: os path of the output directory, see project_output_directories
+    :param xml: False to only emit the .vm files
+    :param optimize: optimization level of the VM code
+    :param pool_strings: build each string literal once per class, see CompilationEngline
+    :param interval: seconds between two polls
+    :param rounds: number of polls before returning, None to poll until interrupted
+    :return:
+    """
+    compilers = {}  # .jack path: IncrementalCompiler
+    versions = {}  # .jack path: (modification time, size) of the compiled version
+    while rounds is None or rounds > 0:
+        try:
+            projects = find_projects(inputs)
+        except FileNotFoundError as error:
+            projects = {}
+            print(f"error: {error}", file=sys.stderr)
+        output_directories = project_output_directories(list(projects), output_root)
+        seen = set()
+        for project, files in projects.items():
+            for path in files:
+                seen.add(path)
+                try:
+                    status = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                version = (status.st_mtime_ns, status.st_size)
+                if versions.get(path) == version:
+                    continue
+                versions[path] = version
+                start = time.perf_counter()
+                compiler = compilers.setdefault(path, incrementalCompiler.IncrementalCompiler(xml, optimize,
+                                                                                           pool_strings))
+                try:
+                    with open(path, 'r') as read_file:
+                        result = compiler.compile(read_file.read())
+                except Exception as error:
+                    print(f"{path}: error: {error}", file=sys.stderr)
+                    continue
+                token_path, compile_path, vm_path = output_paths(path, xml, output_directories[project])
+                os.makedirs(os.path.dirname(vm_path), exist_ok=True)
+                for output, text in ((token_path, result['tokens_xml']), (compile_path, result['xml']),
+                                     (vm_path, result['vm'])):
+                    if output is not None:
+                        with open(output, 'w') as output_file:
+                            output_file.write(text)
+                print(f"{path}: {(time.perf_counter() - start) * 1000:.1f} ms, {result['parsed']} parsed and "
+                      f"{result['generated']} generated of {result['subroutines']} subroutines", flush=True)
+        for path in set(compilers) - seen:
+            del compilers[path]
+            versions.pop(path, None)
+        if rounds is not None:
+            rounds -= 1
+            if not rounds:
+                break
+        time.sleep(interval)
+
+
+def main(argv=None):
+    """
+    Run the command line compiler.
+    :param argv: list of command line arguments, defaults to sys.argv
+    :return: exit status, 1 if any file failed to compile
+    """
+    parser = argparse.ArgumentParser(description="Compile .jack files into .vm files.")
+    parser.add_argument('inputs', nargs='+', metavar='PATH',
+                        help=".jack files, directories of .jack files or glob patterns")
+    parser.add_argument('-o', '--output', metavar='DIR',
+                        help="write outputs under DIR, one sub-directory per project (default: my_jack next to sources)")
+    parser.add_argument('--vm-only', action='store_true', help="only emit .vm files, skip the .xml outputs")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="number of files compiled in parallel (default: cpu count)")
+    parser.add_argument('-O', dest='optimize', type=int, choices=(0, 1), default=0,
+                        help="optimization level: -O0 none (default), -O1 constant folding, branches on "
+                             "true conditions and peephole optimization of the VM code")
+    parser.add_argument('--pool-strings', action='store_true',
+                        help="build each distinct string literal once per class and reuse it, for programs that never "
+                             "modify or dispose string literals")
+    parser.add_argument('--bytecode', action='store_true',
+                        help="write the VM code as binary .vmb files instead of .vm text, see vmBytecode.py")
+    parser.add_argument('--inline', type=int, default=0, metavar='N',
+                        help="inline the leaf subroutines of at most N VM commands at their call sites across each "
+                             "project (default: 0, no inlining)")
+    parser.add_argument('--whole-program', action='store_true',
+                        help="drop the subroutines no call path from Main.main (or Sys.init) can reach from the .vm "
+                             "files of each project")
+    parser.add_argument('--asm', action='store_true',
+                        help="also translate the VM code of each project, the OS .vm files in its output directory "
+                             "included, into a single Hack .asm file, see hackWriter.py")
+    parser.add_argument('-v', '--verbose', action='store_true', help="print every compiled file")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running and recompile the classes that change, only redoing the edited subroutines")
+    parser.add_argument('--interval', type=float, default=0.5, metavar='SECONDS',
+                        help="polling interval of --watch (default: 0.5)")
+    parser.add_argument('--stats', metavar='PATH',
+                        help="save a JSON report of per-file and per-phase times, token counts, VM commands by kind, "
+                             "symbol table operations and peak memory")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="save a cProfile dump of the compilation, which then runs in this process (-j 1)")
+    parser.add_argument('--cache', metavar='DIR', help="restore the outputs of unchanged files from a build cache")
+    parser.add_argument('--cache-max-size', type=int, default=256, metavar='MB',
+                        help="evict least recently used cache entries above this size (default: 256)")
+    parser.add_argument('--cache-max-age', type=int, default=30, metavar='DAYS',
+                        help="evict cache entries unused for this many days (default: 30)")
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        parser.error(f"--jobs must be at least 1, got {args.jobs}")
+    if args.bytecode and (args.inline or args.whole_program or args.watch):
+        parser.error("--bytecode does not support --inline, --whole-program and --watch")
+    if args.watch and args.asm:
+        parser.error("--watch does not support --asm")
+    if args.watch:
+        if args.inline or args.whole_program or args.cache or args.stats or args.profile:
+            parser.error("--watch does not support --inline, --whole-program, --cache, --stats and --profile")
+        try:
+            watch(args.inputs, args.output, not args.vm_only, args.optimize, args.pool_strings, args.interval)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    try:
+        projects = find_projects(args.inputs)
+    except FileNotFoundError as error:
+        parser.error(str(error))
+    output_directories = project_output_directories(list(projects), args.output)
+
+    paths, directories = [], []
+    for project, files in projects.items():
+        paths += files
+        directories += [output_directories[project]] * len(files)
 
+    start = time.perf_counter()
+    profile = cProfile.Profile() if args.profile is not None else None
+    if profile is not None:
+        profile.enable()
+    results = iter(compile_files(paths, xml=not args.vm_only, jobs=1 if profile is not None else args.jobs,
+                                 cache_directory=args.cache, output_directories=directories, optimize=args.optimize,
+                                 pool_strings=args.pool_strings, stats=args.stats is not None,
+                                 bytecode=args.bytecode))
+    if profile is not None:
+        profile.disable()
+        profile.dump_stats(args.profile)
+    failed = 0
+    rules = collections.Counter()
+    file_stats = []
+    pass_seconds = collections.Counter()
+    for project, files in projects.items():
+        tokens = cached = errors = 0
+        seconds = 0.0
+        for path, result, error in (next(results) for file in files):
+            if error is not None:
+                errors += 1
+                print(f"{path}: error: {error}", file=sys.stderr)
+                continue
+            cached += result['cached']
+            tokens += result['tokens']
+            seconds += result['seconds']
+            rules.update(result['rules'])
+            if result['stats'] is not None:
+                file_stats.append(dict(result['stats'], path=path, seconds=result['seconds']))
+            if args.verbose:
+                print(f"{path}" + (" (cached)" if result['cached'] else ""))
+        summary = f"{project}: {len(files)} files, {tokens} tokens, {seconds:.3f}s"
+        if cached:
+            summary += f", {cached} cached"
+        if errors:
+            summary += f", {errors} failed"
+        print(summary)
+        failed += errors
+        vm_paths = [output_paths(path, False, output_directories[project])[2] for path in files]
+        if args.inline and not errors:
+            pass_start = time.perf_counter()
+            report = wholeProgram.inline_subroutines(vm_paths, args.inline)
+            pass_seconds['inline'] += time.perf_counter() - pass_start
+            if args.verbose:
+                for name, count in sorted(report['inlined'].items()):
+                    print(f"inlined {name} at {count} call sites")
+            print(f"{project}: inlined {sum(report['inlined'].values())} calls of {len(report['inlined'])} "
+                  f"subroutines, {report['commands']} -> {report['commands'] - report['saved']} VM commands")
+        if args.whole_program and not errors:
+            pass_start = time.perf_counter()
+            report = wholeProgram.eliminate_dead_subroutines(vm_paths)
+            pass_seconds['whole-program'] += time.perf_counter() - pass_start
+            if args.verbose:
+                for name, size in report['removed']:
+                    print(f"removed {name} ({size} commands)")
+            print(f"{project}: removed {len(report['removed'])} unreachable subroutines, "
+                  f"{report['saved']} of {report['commands']} VM commands")
+        if args.asm and not errors:
+            directory = os.path.dirname(vm_paths[0])
+            asm_path = os.path.join(directory, os.path.basename(os.path.abspath(project)) + '.asm')
+            pass_start = time.perf_counter()
+            try:
+                report = hackWriter.translate_directory(directory, asm_path, args.bytecode)
+            except TypeError as error:
+                failed += 1
+                print(f"{project}: error: {error}", file=sys.stderr)
+            else:
+                print(f"{project}: {asm_path}, {report['instructions']} instructions")
+            pass_seconds['asm'] += time.perf_counter() - pass_start
+    print(f"{len(projects)} projects, {len(paths)} files, {failed} failed in {time.perf_counter() - start:.3f}s")
+    if rules:
+        print("peephole rules: " + ", ".join(f"{name} {count}" for name, count in rules.most_common()))
+    if args.stats is not None:
+        total = compileStats.merge(file_stats)
+        print("phases: " + ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in
+                                     sorted(total['phases'].items(), key=lambda item: -item[1])))
+        with open(args.stats, 'w') as stats_file:
+            json.dump({'seconds': time.perf_counter() - start, 'jobs': 1 if profile is not None else args.jobs,
+                       'total': total, 'passes': dict(pass_seconds), 'files': file_stats}, stats_file, indent=2)
+
+    if args.cache is not None:
+        buildCache.BuildCache(args.cache, args.cache_max_size * 1024 * 1024, args.cache_max_age * 24 * 3600).evict()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,13 +4,33 @@ identifier properties needed for compilation: type, kind and running index. The
 two nested scopes (class/ subroutine).
 """
 
+# VM memory segment of each kind of variable
+segments = {'static': 'static', 'field': 'this', 'argument': 'argument', 'local': 'local'}
+class_kinds = ('static', 'field')
+
+
+class Symbol:
+    """Properties of an identifier: its type, kind, VM segment and running index."""
+    __slots__ = ('type', 'kind', 'segment', 'index')
+
+    def __init__(self, type, kind, index):
+        self.type = type
+        self.kind = kind
+        self.segment = segments[kind]
+        self.index = index
+
+    def __repr__(self):
+        return f"Symbol({self.type!r}, {self.kind!r}, {self.index})"
+
+
 class symbolTable:
-    # create a new empty symbol table: { name : (type, kind, index) }
+    # two scopes of { name : Symbol }, with a running count per kind
 
 
     def __init__(self):
-        self.current_scope = None
-        self.symbol_table = {}
+        self.class_scope = {}
+        self.subroutine_scope = {}
+        self.counts = {'static': 0, 'field': 0, 'argument': 0, 'local': 0}
 
 
     def startSubroutine(self):
@@ -18,16 +38,9 @@ class symbolTable:
         starts a new subroutine scope (ie reset the subroutine's symbol table)
         :return:
         """
-        # saves the keys with 'argument' and 'local' value to delete
-
-        keys_to_pop = []
-        for name in self.symbol_table:
-            if self.KindOf(name) in ('argument', 'local'):
-                keys_to_pop.append(name)
-
-        # delete the elements
-        for key in keys_to_pop:
-            self.symbol_table.pop(key)
+        self.subroutine_scope = {}
+        self.counts['argument'] = 0
+        self.counts['local'] = 0
 
 
 
@@ -40,8 +53,10 @@ class symbolTable:
         :param kind: Static, Field, ARG, VAR
         :return:
         """
-        index = self.VarCount(kind)
-        self.symbol_table[name] = (type, kind, index)
+        index = self.counts[kind]
+        self.counts[kind] = index + 1
+        scope = self.class_scope if kind in class_kinds else self.subroutine_scope
+        scope[name] = Symbol(type, kind, index)
 
 
 
@@ -52,12 +67,20 @@ class symbolTable:
         :param kind: Static, Field, ARG, or VAR
         :return: int
         """
-        values = self.symbol_table.values()
-        count = 0
-        for t in values:
-            if kind in t:
-                count += 1
-        return count
+        return self.counts[kind]
+
+
+
+    def lookup(self, name):
+        """
+        Return the Symbol of the named identifier, looking in the subroutine scope first then in the class scope.
+        :param name: string
+        :return: Symbol, or None if the identifier is unknown
+        """
+        symbol = self.subroutine_scope.get(name)
+        if symbol is None:
+            symbol = self.class_scope.get(name)
+        return symbol
 
 
 
@@ -68,10 +91,8 @@ class symbolTable:
         :param name: string
         :return: STATIC, FIELD, ARG, VAR, or NONE
         """
-        if self.symbol_table.get(name) == None:
-            return None
-        else:
-            return self.symbol_table[name][1]
+        symbol = self.lookup(name)
+        return symbol.kind if symbol is not None else None
 
 
     def Typeof(self, name):
@@ -80,10 +101,8 @@ class symbolTable:
         :param name: string
         :return: String
         """
-        if self.symbol_table.get(name) == None:
-            return None
-        else:
-            return self.symbol_table[name][0]
+        symbol = self.lookup(name)
+        return symbol.type if symbol is not None else None
 
     def IndexOf(self, name):
         """
@@ -91,5 +110,4 @@ class symbolTable:
         :param name: String
         :return: Int
         """
-        return self.symbol_table[name][2]
-
+        return self.lookup(name).index
@@ -0,0 +1,72 @@
+"""
+Tests of the multiplication by constants of VMWriter, and of what its inline sequences cost in Hack cycles and
+instructions against a call of Math.multiply.
+"""
+
+import hackEmulator
+import hackWriter
+import jackCompiler
+import vmEmulator
+import VMWriter
+
+# the textbook shift and add Math.multiply, so that hackEmulator runs it instead of its single step stand-in
+math_source = '''class Math {
+    function int multiply(int x, int y) {
+        var int sum, shifted, bit;
+        let shifted = x;
+        let bit = 1;
+        while (~(bit = 0)) {
+            if (~((y & bit) = 0)) { let sum = sum + shifted; }
+            let shifted = shifted + shifted;
+            let bit = bit + bit;
+        }
+        return sum;
+    }
+}
+'''
+
+
+def run_hack(commands):
+    """
+    Translate a Main.main printing the value commands compute from 1234, and run it with hackEmulator.
+    :param commands: VM commands multiplying the top of the stack
+    :return: tuple of (instructions, cycles, output)
+    """
+    main = ['function Main.main 0', 'push constant 1234'] + commands + [
+        'call Output.printInt 1', 'pop temp 0', 'push constant 0', 'return']
+    math = jackCompiler.compile_source(math_source, optimize=1)['vm'].splitlines()
+    translation = hackWriter.translate({'Main': main, 'Math': math}, os_traps=True)
+    cpu = hackEmulator.HackCPU(hackEmulator.assemble(translation['asm']), translation['traps'])
+    cpu.run()
+    return translation['instructions'], cpu.cycles, ''.join(cpu.output)
+
+
+def test_multiply_commands_multiply():
+    for value in (2, 3, 7, 10, 100, -3, -64, 63):
+        emulator = vmEmulator.VMEmulator()
+        emulator.load('Main', ['function Main.main 0', 'push constant 1234'] + VMWriter.multiply_commands(value) + [
+            'call Output.printInt 1', 'pop temp 0', 'push constant 0', 'return'])
+        emulator.run()
+        assert ''.join(emulator.output) == str(vmEmulator.wrap(1234 * value))
+    assert VMWriter.multiply_commands(1) is None
+    assert VMWriter.multiply_commands(1000) is None  # 48 commands
+
+
+def test_multiply_commands_cover_small_factors():
+    for value in range(2, 64):
+        assert len(VMWriter.multiply_commands(value)) <= VMWriter.max_multiply_commands
+    assert len(VMWriter.multiply_commands(100)) <= VMWriter.max_multiply_commands
+
+
+def test_longest_sequence_trades_instructions_for_cycles():
+    base_instructions, base_cycles, _ = run_hack([])
+    call = ['push constant 63', 'call Math.multiply 2']
+    one_call = run_hack(call)
+    two_calls = run_hack(call + call)
+    inline = run_hack(VMWriter.multiply_commands(63))
+    assert len(VMWriter.multiply_commands(63)) == VMWriter.max_multiply_commands
+    assert inline[2] == one_call[2] == str(1234 * 63 - 65536)
+    call_instructions, call_cycles = two_calls[0] - one_call[0], two_calls[1] - one_call[1]
+    inline_instructions, inline_cycles = inline[0] - base_instructions, inline[1] - base_cycles
+    assert inline_instructions - call_instructions <= 100
+    assert inline_cycles * 10 < call_cycles
@@ -0,0 +1,11 @@
+"""
+Tests of the benchmark suite, on programs small enough to run with the tests.
+"""
+
+import benchmark
+
+
+def test_scaling_grows_a_single_class():
+    curve = benchmark.scaling((20, 40), repeat=1, dimension='statements')
+    assert [point['statements'] for point in curve] == [20, 40]
+    assert curve[0]['tokens'] < curve[1]['tokens']
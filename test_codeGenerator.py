@@ -0,0 +1,159 @@
+"""
+Tests of the VM code generator, running the compiled classes with vmEmulator.
+"""
+
+import codeGenerator
+import jackCompiler
+import vmEmulator
+
+
+def run_program(sources, optimize=0):
+    """
+    Compile a program in memory and run it with vmEmulator.
+    :param sources: dict of class name to its jack source
+    :param optimize: optimization level of the VM code
+    :return: string printed by the program
+    """
+    emulator = vmEmulator.VMEmulator()
+    for name, result in jackCompiler.compile_sources(sources, optimize=optimize).items():
+        emulator.load(name, result['vm'].splitlines())
+    emulator.run()
+    return ''.join(emulator.output)
+
+
+def main_class(statements, variables='int x, n'):
+    """
+    Return the source of a Main class running statements.
+    :param statements: jack statements of Main.main
+    :param variables: local variables of Main.main
+    :return: string of jack source
+    """
+    return f'''class Main {{
+    function void main() {{
+        var {variables};
+        {statements}
+        return;
+    }}
+}}
+'''
+
+
+def test_non_boolean_conditions_keep_their_meaning():
+    source = main_class('''let x = 5;
+        if (x & 1) { do Output.printInt(1); } else { do Output.printInt(0); }
+        let n = 3;
+        while (n) { let n = n - 1; do Output.printInt(7); }
+        if (x) { do Output.printInt(2); }
+        let n = -2;
+        while (n + 1) { let n = n + 1; do Output.printInt(8); }''')
+    output = run_program({'Main': source})
+    assert output == '08'
+    assert run_program({'Main': source}, optimize=1) == output
+
+
+def test_boolean_conditions_branch_on_true():
+    source = main_class('''let x = 5;
+        if ((x > 3) & ~(x = 4)) { do Output.printInt(1); } else { do Output.printInt(0); }
+        let n = 0;
+        while (n < 3) { let n = n + 1; do Output.printInt(n); }
+        if (true | (x < 0)) { do Output.printInt(9); }''')
+    vm = jackCompiler.compile_source(source, optimize=1)['vm']
+    assert vm.split('\n').count('not') == 1  # the ~ of the source
+    assert run_program({'Main': source}, optimize=1) == run_program({'Main': source}) == '11239'
+
+
+def main_vm(expression, optimize=1):
+    """
+    Return the VM code of Main.main returning expression, compiled with a Main.f function printing 1.
+    :param expression: jack expression over the local x
+    :param optimize: optimization level of the VM code
+    :return: list of VM commands of Main.main, without its function command
+    """
+    source = '''class Main {
+    function int f() { do Output.printInt(1); return 2; }
+    function int main() { var int x; return %s; }
+}
+''' % expression
+    vm = jackCompiler.compile_source(source, optimize=optimize)['vm']
+    return vm.split('function Main.main 1\n')[1].splitlines()
+
+
+def test_fold_constant_wraps_to_16_bits():
+    assert codeGenerator.fold_constant('+', 32767, 1) == -32768
+    assert codeGenerator.fold_constant('-', -32768, 1) == 32767
+    assert codeGenerator.fold_constant('*', 256, 256) == 0
+    assert codeGenerator.fold_constant('/', -32768, -1) == -32768
+    assert main_vm('32767 + 1') == main_vm('-32768') == ['push constant 32767', 'not', 'return']
+
+
+def test_fold_constant_divides_toward_zero():
+    assert codeGenerator.fold_constant('/', 7, 2) == 3
+    assert codeGenerator.fold_constant('/', -7, 2) == -3
+    assert codeGenerator.fold_constant('/', 7, -2) == -3
+    assert codeGenerator.fold_constant('/', -7, -2) == 3
+    assert codeGenerator.fold_constant('/', 7, 0) is None
+    assert main_vm('7 / 0') == ['push constant 7', 'push constant 0', 'call Math.divide 2', 'return']
+
+
+def test_folding_keeps_calls_multiplied_by_zero():
+    assert main_vm('Main.f() * 0') == ['call Main.f 0', 'pop temp 0', 'push constant 0', 'return']
+    assert main_vm('0 * Main.f()') == ['call Main.f 0', 'pop temp 0', 'push constant 0', 'return']
+    assert main_vm('x * 0') == ['push constant 0', 'return']
+
+
+def test_folding_subtracts_negative_constants_as_adds():
+    assert main_vm('x - (-3)') == ['push local 0', 'push constant 3', 'add', 'return']
+    assert main_vm('x + (-3)') == ['push local 0', 'push constant 3', 'sub', 'return']
+
+
+def test_folding_goes_strictly_left_to_right():
+    assert main_vm('2 + x + 3') == ['push constant 2', 'push local 0', 'add', 'push constant 3', 'add', 'return']
+    assert main_vm('2 + 3 + x') == ['push constant 5', 'push local 0', 'add', 'return']
+    assert main_vm('x * (2 + 3)') == main_vm('x * 5')
+
+
+def test_folded_program_prints_the_same():
+    source = main_class('''let x = 7;
+        do Output.printInt(32767 + 1);
+        do Output.printInt(-7 / 2);
+        do Output.printInt(7 / -2);
+        do Output.printInt(x - (-3));
+        do Output.printInt(2 + x + 3 * 2);
+        do Output.printInt(Main.count() * 0);
+        do Output.printInt(0 * Main.count());''').replace('''        return;
+    }
+}''', '''        return;
+    }
+    function int count() { do Output.printInt(9); return 5; }
+}''')
+    output = run_program({'Main': source})
+    assert output == '-32768-3-310249090'
+    assert run_program({'Main': source}, optimize=1) == output
+
+
+def test_pooled_strings_are_built_once_per_class():
+    greeter = '''class Greeter {
+    function void greet(int times) {
+        while (times > 0) { do Output.printString("hello"); let times = times - 1; }
+        do Output.printString("bye");
+        do Output.printString("hello");
+        return;
+    }
+}
+'''
+    source = main_class('''do Greeter.greet(3);
+        do Output.printString("hello");
+        do Greeter.greet(1);''')
+    sources = {'Main': source, 'Greeter': greeter}
+    output = run_program(sources)
+    assert output == 'hello' * 3 + 'byehello' + 'hello' * 2 + 'byehello'
+    emulator = vmEmulator.VMEmulator()
+    for name, result in jackCompiler.compile_sources(sources, pool_strings=True).items():
+        vm = result['vm'].splitlines()
+        assert vm.count(f'function {name}.$strings 0') == 1
+        assert vm.count('call String.new 1') == (2 if name == 'Greeter' else 1)
+        emulator.load(name, vm)
+    emulator.run()
+    assert ''.join(emulator.output) == output
+    for name in sources:  # the guard of the pool calls each $strings function once
+        assert emulator.counts[emulator.functions[f'{name}.$strings']] == 1
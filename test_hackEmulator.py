@@ -0,0 +1,41 @@
+"""
+Tests of the Hack assembler and CPU simulator.
+"""
+
+import hackEmulator
+
+
+def test_assemble():
+    words = hackEmulator.assemble(['// comment', '@17', 'D=A', '(LOOP)', '@x', 'M=D+M', 'AM=M-1  // inline comment',
+                                   '@LOOP', 'D;JGT', '0;JMP', '@SCREEN', 'A=-1'])
+    assert words == [17, 0b1110110000010000, 16, 0b1111000010001000, 0b1111110010101000, 2, 0b1110001100000001,
+                     0b1110101010000111, 16384, 0b1110111010100000]
+
+
+def test_comp_codes():
+    assert hackEmulator.comp_code('M+D') == hackEmulator.comp_code('D+M')
+    assert hackEmulator.comp_code('A&D') == hackEmulator.comp_code('D&A')
+    assert hackEmulator.comp_code('M-D') != hackEmulator.comp_code('D-M')
+    for instruction in ('D=D*M', 'D=M-D;JUMP', 'X=D', '@40000'):
+        try:
+            hackEmulator.assemble([instruction])
+        except TypeError:
+            pass
+        else:
+            raise AssertionError(f"{instruction} was assembled")
+
+
+def test_run_until_halt():
+    # R0 = 6 * 7 by repeated addition, then loop forever at END
+    program = ['@6', 'D=A', '@n', 'M=D', '(LOOP)', '@n', 'D=M', '@END', 'D;JEQ', '@7', 'D=A', '@R0', 'M=D+M',
+               '@n', 'M=M-1', '@LOOP', '0;JMP', '(END)', '@END', '0;JMP']
+    cpu = hackEmulator.HackCPU(hackEmulator.assemble(program))
+    cpu.run()
+    assert cpu.ram[0] == 42
+    assert cpu.cycles == 4 + 6 * 12 + 4 + 2
+    try:
+        hackEmulator.HackCPU(hackEmulator.assemble(['(A)', '@B', '0;JMP', '(B)', '@A', '0;JMP'])).run(100)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("an endless loop did not stop")
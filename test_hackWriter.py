@@ -0,0 +1,123 @@
+"""
+Tests of the Hack assembly back end, checked against vmEmulator by hackEmulator.compare.
+"""
+
+import hackEmulator
+import hackWriter
+import jackCompiler
+import main
+import test_main
+
+list_source = '''class List {
+    field int head;
+    field List tail;
+    static int count;
+    constructor List new(int ahead, List atail) {
+        let head = ahead;
+        let tail = atail;
+        let count = count + 1;
+        return this;
+    }
+    method int sum() {
+        if (tail = null) { return head; }
+        return head + tail.sum();
+    }
+    function int fib(int n) {
+        if (n < 2) { return n; }
+        return List.fib(n - 1) + List.fib(n - 2);
+    }
+    function int count() { return count; }
+}
+'''
+
+main_source = '''class Main {
+    function void main() {
+        var List list;
+        var Array a;
+        var int i;
+        let a = Array.new(5);
+        while (i < 5) {
+            let a[i] = i * i - 3;
+            let list = List.new(a[i], list);
+            let i = i + 1;
+        }
+        do Output.printInt(list.sum());
+        do Output.printChar(32);
+        do Output.printInt(List.fib(12));
+        do Output.printChar(32);
+        do Output.printInt(List.count());
+        do Output.printChar(32);
+        do Output.printInt((a[4] > a[3]) | (a[0] = -3) & ~(a[1] < -9));
+        do Output.printString(" done");
+        return;
+    }
+}
+'''
+
+
+def test_translations_print_like_the_vm_emulator():
+    for optimize in (0, 1):
+        results = jackCompiler.compile_sources({'Main': main_source, 'List': list_source}, optimize=optimize)
+        classes = {name: result['vm'].splitlines() for name, result in results.items()}
+        result = hackEmulator.compare(classes)
+        assert result['output'] == '15 144 5 -1 done'
+        assert result['standard']['output'] == result['cached']['output'] == result['output']
+        assert result['cached']['cycles'] < result['standard']['cycles']
+        assert result['cached']['instructions'] < result['standard']['instructions']
+
+
+def test_undefined_functions_need_the_os():
+    classes = {'Main': ['function Main.main 0', 'push constant 1', 'call Output.printInt 1', 'return']}
+    try:
+        hackWriter.translate(classes)
+    except TypeError as error:
+        assert 'Output.printInt' in str(error)
+    else:
+        raise AssertionError("a call to an undefined function was translated")
+    assert hackWriter.translate(classes, os_traps=True)['traps'] == [('Output.printInt', 1)]
+    try:
+        hackWriter.translate({'Point': ['function Point.new 0', 'push constant 0', 'return']})
+    except TypeError as error:
+        assert 'Main.main' in str(error)
+    else:
+        raise AssertionError("a program without an entry point was translated")
+
+
+def test_asm_from_the_command_line(tmp_path, capsys):
+    project = test_main.write_project(tmp_path)
+    assert main.main([str(project), '-o', str(tmp_path / 'out'), '-j', '1', '--vm-only']) == 0
+    directory = tmp_path / 'out' / 'Project'
+    assert hackEmulator.main([str(directory)]) == 0
+    assert capsys.readouterr().out.count('output matches') == 2
+    # without the OS .vm files in the directory, the translation needs the OS
+    assert main.main([str(project), '-o', str(tmp_path / 'out'), '-j', '1', '--vm-only', '--asm']) == 1
+    assert 'the OS .vm files are needed' in capsys.readouterr().err
+
+
+def test_asm_of_a_program_without_os_calls(tmp_path, capsys):
+    project = tmp_path / 'Square'
+    project.mkdir()
+    (project / 'Main.jack').write_text('''class Main {
+    static int result;
+    function void main() {
+        let result = Main.square(12);
+        return;
+    }
+    function int square(int x) { return x * x + 1 - 1; }
+}
+''')
+    # x * x calls Math.multiply, defined here by repeated addition so the program needs no OS
+    (project / 'Math.jack').write_text('''class Math {
+    function int multiply(int x, int y) {
+        var int product;
+        while (y > 0) { let product = product + x; let y = y - 1; }
+        return product;
+    }
+}
+''')
+    assert main.main([str(project), '-o', str(tmp_path / 'out'), '-j', '1', '--vm-only', '--asm']) == 0
+    asm_path = tmp_path / 'out' / 'Square' / 'Square.asm'
+    assert f'{asm_path}, ' in capsys.readouterr().out
+    cpu = hackEmulator.HackCPU(hackEmulator.assemble(asm_path.read_text().splitlines()))
+    cpu.run()
+    assert cpu.ram[16] == 144  # Main.0, the first static variable
@@ -0,0 +1,92 @@
+"""
+Tests of the incremental compiler, whose output must always equal a full compilation of the same source.
+"""
+
+import jackCompiler
+import incrementalCompiler
+import main
+
+source = '''class Counter {
+    field int count;
+    constructor Counter new() {
+        let count = 0;
+        return this;
+    }
+    method void add(int n) {
+        while (n > 0) { let count = count + 1; let n = n - 1; }
+        return;
+    }
+    method int get() {
+        if (count > 9) { return 9; }
+        return count;
+    }
+    method void print() {
+        do Output.printString("count");
+        do Output.printInt(count);
+        return;
+    }
+}
+'''
+
+
+def assert_full_compile(result, text, optimize=0, pool_strings=False):
+    full = jackCompiler.compile_source(text, xml=True, optimize=optimize, pool_strings=pool_strings)
+    assert result['vm'] == full['vm']
+    assert result['xml'] == full['xml']
+    assert result['tokens_xml'] == full['tokens_xml']
+    assert result['tokens'] == full['tokens']
+
+
+def test_edit_of_one_subroutine():
+    for optimize in (0, 1):
+        compiler = incrementalCompiler.IncrementalCompiler(optimize=optimize)
+        first = compiler.compile(source)
+        assert (first['subroutines'], first['parsed'], first['generated']) == (4, 4, 4)
+        assert_full_compile(first, source, optimize)
+
+        edited = source.replace('"count"', '"total"')
+        result = compiler.compile(edited)
+        assert (result['parsed'], result['generated']) == (1, 1)
+        assert_full_compile(result, edited, optimize)
+
+        result = compiler.compile(edited)
+        assert (result['parsed'], result['generated']) == (0, 0)
+        assert_full_compile(result, edited, optimize)
+
+
+def test_edit_shifting_labels():
+    compiler = incrementalCompiler.IncrementalCompiler()
+    compiler.compile(source)
+    # a new if statement in add shifts the label numbers of the subroutines after it, whose VM code is generated again
+    edited = source.replace('        return;\n    }\n    method int get',
+                            '        if (n < 0) { let n = 0; }\n        return;\n    }\n    method int get', 1)
+    result = compiler.compile(edited)
+    assert (result['parsed'], result['generated']) == (1, 3)
+    assert_full_compile(result, edited)
+
+
+def test_edit_of_the_class_header():
+    compiler = incrementalCompiler.IncrementalCompiler()
+    compiler.compile(source)
+    edited = source.replace('field int count;', 'static int instances;\n    field int count;')
+    result = compiler.compile(edited)
+    assert (result['parsed'], result['generated']) == (0, 4)
+    assert_full_compile(result, edited)
+
+
+def test_pooled_strings_are_always_generated():
+    compiler = incrementalCompiler.IncrementalCompiler(pool_strings=True)
+    compiler.compile(source)
+    result = compiler.compile(source)
+    assert (result['parsed'], result['generated']) == (0, 4)
+    assert_full_compile(result, source, pool_strings=True)
+
+
+def test_watch(tmp_path, capsys):
+    project = tmp_path / 'Project'
+    project.mkdir()
+    (project / 'Counter.jack').write_text(source)
+    main.watch([str(project)], str(tmp_path / 'out'), xml=False, rounds=1)
+    assert '4 parsed and 4 generated of 4 subroutines' in capsys.readouterr().out
+    vm_path = tmp_path / 'out' / 'Project' / 'Counter.vm'
+    assert vm_path.read_text() == jackCompiler.compile_source(source)['vm']
@@ -0,0 +1,46 @@
+"""
+Tests of the in-memory compile API, against the files written by the command line compiler.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import jackCompiler
+import main
+import test_main
+
+sources = {'Main': test_main.main_source, 'Point': test_main.point_source}
+
+
+def test_strings_compile_like_files(tmp_path):
+    project = test_main.write_project(tmp_path)
+    for optimize in (0, 1):
+        out = tmp_path / f'O{optimize}'
+        assert main.main([str(project), '-o', str(out), '-j', '1', '-O', str(optimize), '--pool-strings']) == 0
+        results = jackCompiler.compile_sources(sources, xml=True, optimize=optimize, pool_strings=True)
+        for name, result in results.items():
+            assert result['class_name'] == name
+            assert result['vm'] == (out / 'Project' / f'{name}.vm').read_text()
+            assert result['xml'] == (out / 'Project' / f'{name}.xml').read_text()
+            assert result['tokens_xml'] == (out / 'Project' / f'{name}T.xml').read_text()
+
+
+def test_concurrent_calls():
+    expected = {name: jackCompiler.compile_source(source, xml=True, optimize=1) for name, source in sources.items()}
+    jobs = [(name, optimize) for name in sources for optimize in (0, 1)] * 25
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda job: jackCompiler.compile_source(sources[job[0]], xml=True,
+                                                                            optimize=job[1]), jobs))
+    for (name, optimize), result in zip(jobs, results):
+        if optimize == 1:
+            assert result == expected[name]
+        else:
+            assert result['vm'] == jackCompiler.compile_source(sources[name])['vm']
+
+
+def test_class_name_must_match():
+    try:
+        jackCompiler.compile_sources({'Other': test_main.point_source})
+    except TypeError as error:
+        assert 'Point' in str(error)
+    else:
+        raise AssertionError("a source declaring another class was accepted")
+    assert jackCompiler.compile_source(test_main.point_source)['xml'] is None
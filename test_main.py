@@ -0,0 +1,75 @@
+"""
+Command line tests of main.py, compiling small projects into a temporary directory.
+"""
+
+import json
+import main
+
+point_source = '''class Point {
+    field int x, y;
+    constructor Point new(int ax, int ay) {
+        let x = ax;
+        let y = ay;
+        return this;
+    }
+    method int sum() {
+        return x + y;
+    }
+}
+'''
+
+main_source = '''class Main {
+    function void main() {
+        var Point p;
+        let p = Point.new(3, 4);
+        do Output.printInt(p.sum());
+        return;
+    }
+}
+'''
+
+
+def write_project(directory):
+    """
+    Write a two class project into directory.
+    :param directory: pathlib.Path
+    :return: pathlib.Path of the project
+    """
+    project = directory / 'Project'
+    project.mkdir()
+    (project / 'Main.jack').write_text(main_source)
+    (project / 'Point.jack').write_text(point_source)
+    return project
+
+
+def test_bytecode_stats(tmp_path):
+    project = write_project(tmp_path)
+    stats_path = tmp_path / 'stats.json'
+    status = main.main([str(project), '-o', str(tmp_path / 'out'), '-j', '1', '--bytecode',
+                        '--stats', str(stats_path)])
+    assert status == 0
+    assert (tmp_path / 'out' / 'Project' / 'Main.vmb').exists()
+    total = json.loads(stats_path.read_text())['total']
+    assert total['vm_commands']['function'] == 3
+    assert total['vm_commands']['return'] == 3
+
+
+def test_cached_file_keeps_token_count(tmp_path):
+    project = write_project(tmp_path)
+    arguments = (str(project / 'Point.jack'), False, str(tmp_path / 'cache'), str(tmp_path / 'out'))
+    cold = main.compile_file(*arguments)
+    warm = main.compile_file(*arguments)
+    assert not cold['cached'] and warm['cached']
+    assert warm['tokens'] == cold['tokens'] > 0
+
+
+def test_jobs_must_be_positive(tmp_path, capsys):
+    project = write_project(tmp_path)
+    for jobs in ('0', '-2'):
+        try:
+            main.main([str(project), '-o', str(tmp_path / 'out'), '-j', jobs])
+        except SystemExit as exit:
+            assert exit.code == 2
+        else:
+            raise AssertionError(f"-j {jobs} was accepted")
+        assert '--jobs must be at least 1' in capsys.readouterr().err
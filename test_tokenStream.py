@@ -0,0 +1,45 @@
+"""
+Tests of the lookahead token stream of the parser.
+"""
+
+import tokenStream
+
+
+def test_peek_pulls_tokens_lazily():
+    pulled = []
+
+    def source():
+        for token in ('let', 'x', '=', '1', ';'):
+            pulled.append(token)
+            yield token
+
+    tokens = tokenStream.TokenStream(source())
+    assert pulled == []
+    assert tokens.peek(2) == '='
+    assert pulled == ['let', 'x', '=']
+    assert tokens.peek() == 'let'
+    assert tokens.advance() == 'let'
+    assert tokens.peek(0) == 'x'
+    assert tokens.peek(3) == ';'
+    assert tokens.peek(4) is None
+    assert tokens.consumed == 1
+
+
+def test_advance_keeps_history():
+    tokens = tokenStream.TokenStream('abcdef', history=3)
+    for token in 'abcd':
+        assert tokens.advance() == token
+    assert tokens.consumed == 4
+    assert tokens.context(-3) == ['b', 'c', 'd']
+    assert tokens.context(5) == ['e', 'f']
+    assert not tokens.at_end()
+    tokens.advance()
+    tokens.advance()
+    assert tokens.at_end()
+    try:
+        tokens.advance()
+    except TypeError as error:
+        assert "['d', 'e', 'f']" in str(error)
+    else:
+        raise AssertionError("advance past the end did not raise")
+
@@ -0,0 +1,70 @@
+"""
+Tests of the binary .vmb form of VM code, which must disassemble to the exact text of the VM commands.
+"""
+
+import jackCompiler
+import main
+import test_main
+import vmBytecode
+import vmEmulator
+
+sources = {'Main': test_main.main_source, 'Point': test_main.point_source}
+
+
+def test_round_trip():
+    commands = ['push constant 32767', 'pop that 0', 'push pointer 1', 'pop temp 7', 'add', 'sub', 'neg', 'eq',
+                'gt', 'lt', 'and', 'or', 'not', 'label Loop', 'goto Loop', 'if-goto Loop', 'call Point.new 2',
+                'function Point.new 0', 'return', 'label Précis']
+    data = vmBytecode.encode(commands)
+    bytecode = vmBytecode.BytecodeFile(data)
+    assert len(bytecode) == len(commands)
+    assert len(data) == 16 + 8 * len(commands) + sum(2 + len(name.encode()) for name in bytecode.strings)
+    assert bytecode.strings == ['Loop', 'Point.new', 'Précis']
+    assert bytecode.commands() == commands
+    for optimize in (0, 1):
+        for result in jackCompiler.compile_sources(sources, optimize=optimize, pool_strings=True).values():
+            commands = result['vm'].splitlines()
+            assert vmBytecode.BytecodeFile(vmBytecode.encode(commands)).commands() == commands
+
+
+def test_invalid_input():
+    try:
+        vmBytecode.encode(['jump Loop'])
+    except TypeError as error:
+        assert 'jump Loop' in str(error)
+    else:
+        raise AssertionError("an unknown command was encoded")
+    try:
+        vmBytecode.BytecodeFile(b'JVMA' + bytes(12))
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("a file with another magic was loaded")
+    assert vmBytecode.BytecodeFile(b'').commands() == []
+
+
+def test_bytecode_output_runs_like_text(tmp_path):
+    project = test_main.write_project(tmp_path)
+    assert main.main([str(project), '-o', str(tmp_path / 'text'), '-j', '1', '--vm-only']) == 0
+    assert main.main([str(project), '-o', str(tmp_path / 'binary'), '-j', '1', '--bytecode']) == 0
+    loaded = vmBytecode.load_directory(str(tmp_path / 'binary' / 'Project'))
+    assert list(loaded) == ['Main', 'Point']
+    for name, bytecode in loaded.items():
+        assert bytecode.commands() == (tmp_path / 'text' / 'Project' / f'{name}.vm').read_text().splitlines()
+    outputs = []
+    for directory in ('text', 'binary'):
+        emulator = vmEmulator.VMEmulator()
+        emulator.load_directory(str(tmp_path / directory / 'Project'))
+        emulator.run()
+        outputs.append(''.join(emulator.output))
+    assert outputs == ['7', '7']
+
+
+def test_command_line(tmp_path, capsys):
+    vm_path = tmp_path / 'Point.vm'
+    vm_path.write_text(jackCompiler.compile_source(test_main.point_source)['vm'])
+    assert vmBytecode.main(['--assemble', str(vm_path)]) == 0
+    assert vmBytecode.main([str(tmp_path / 'Point.vmb')]) == 0
+    assert capsys.readouterr().out == vm_path.read_text()
+    (tmp_path / 'Empty.vmb').write_bytes(b'')
+    assert len(vmBytecode.load(str(tmp_path / 'Empty.vmb'))) == 0
@@ -0,0 +1,66 @@
+"""
+Tests of the static cost report of VM code.
+"""
+
+import json
+import jackCompiler
+import vmCost
+
+nested_loops = ['function Main.f 1', 'push constant 2', 'label W1true', 'push local 0', 'label W2true',
+                'call Math.multiply 2', 'label W2false', 'goto W1true', 'label W1false', 'return']
+
+
+def test_function_cost():
+    result = vmCost.function_cost(nested_loops)
+    assert result['commands'] == 10
+    assert result['kinds'] == {'function': 1, 'push': 2, 'label': 4, 'call': 1, 'goto': 1, 'return': 1}
+    assert result['calls'] == {'Math.multiply': 1}
+    assert result['loop_depth'] == 2
+    # function with 1 local, push constant, push local, call, goto and return
+    assert result['cost'] == 4 + 7 + 10 + 44 + 2 + 40
+    # push local and goto are in one loop, the call in two
+    assert result['weighted_cost'] == 4 + 7 + 10 * 10 + 44 * 100 + 2 * 10 + 40
+
+
+def test_cost_model_and_loop_factor():
+    costs = dict(vmCost.hack_costs, call=10, **{'call argument': 1})
+    result = vmCost.function_cost(nested_loops, costs, factor=2)
+    assert result['cost'] == 4 + 7 + 10 + 12 + 2 + 40
+    assert result['weighted_cost'] == 4 + 7 + 10 * 2 + 12 * 4 + 2 * 2 + 40
+
+
+def test_loop_depth_at_every_optimization_level(tmp_path):
+    source = '''class Main {
+    function void main() {
+        var int i, j;
+        while (i < 3) {
+            let j = 0;
+            while (j < i) { let j = j + 1; }
+            let i = i + 1;
+        }
+        if (i = 3) { do Output.printInt(i * 3); }
+        return;
+    }
+}
+'''
+    for optimize in (0, 1):
+        vm_path = tmp_path / f'O{optimize}' / 'Main.vm'
+        vm_path.parent.mkdir()
+        vm_path.write_text(jackCompiler.compile_source(source, optimize=optimize)['vm'])
+        report = vmCost.analyze([str(vm_path.parent)])
+        main = report['Main']['Main.main']
+        assert main['loop_depth'] == 2
+        assert main['calls'] == ({'Math.multiply': 1} if optimize == 0 else {})
+
+
+def test_command_line(tmp_path, capsys):
+    (tmp_path / 'Main.vm').write_text('\n'.join(nested_loops) + '\n')
+    model = tmp_path / 'model.json'
+    model.write_text(json.dumps({'return': 0}))
+    assert vmCost.main([str(tmp_path), '--cost-model', str(model), '--json', '-']) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report['Main']['Main.f']['cost'] == 4 + 7 + 10 + 44 + 2
+    assert vmCost.main([str(tmp_path)]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split()[:3] == ['function', 'commands', 'cost']
+    assert lines[1].split()[:5] == ['Main.f', '10', '107', '4571', '2']
@@ -0,0 +1,87 @@
+"""
+Tests of the VM emulator, on hand-written VM code and on compiled programs.
+"""
+
+import json
+import jackCompiler
+import vmEmulator
+
+countdown = '''function Main.main 1
+push constant 3
+pop local 0
+label W1true
+push local 0
+push constant 0
+gt
+not
+if-goto W1false
+push local 0
+call Output.printInt 1
+pop temp 0
+push local 0
+push constant 1
+sub
+pop local 0
+goto W1true
+label W1false
+push constant 0
+return'''.splitlines()
+
+
+def test_report_counts_commands_functions_and_constructs():
+    emulator = vmEmulator.VMEmulator()
+    emulator.load('Main', countdown)
+    assert emulator.run() == 0
+    report = emulator.report()
+    # 3 commands before the loop, 3 iterations of 5 test and 8 body commands, the last test and 2 after the loop
+    assert report['steps'] == 3 + 3 * 13 + 5 + 2
+    assert report['functions'] == {'Main.main': 49}
+    assert report['constructs'] == {'Main.main:while W1': 44}
+    assert report['commands']['push'] == 1 + 3 * 5 + 2 + 1
+    assert report['os_calls'] == {'Output.printInt': 3}
+    assert report['estimated_steps'] == 49 + 3 * (vmEmulator.os_costs['Output.printInt'] - 1)
+    assert report['output'] == '321'
+
+
+def test_os_stand_ins():
+    source = '''class Main {
+    function void main() {
+        var Array a;
+        var String s;
+        let a = Array.new(3);
+        let a[2] = -7 / 2;
+        let s = String.new(4);
+        let s = s.appendChar(79);
+        let s = s.appendChar(75);
+        do Output.printString(s);
+        do Output.printInt(a[2] * Math.sqrt(17));
+        do Output.println();
+        do Sys.halt();
+        do Output.printInt(1);
+        return;
+    }
+}
+'''
+    emulator = vmEmulator.VMEmulator()
+    emulator.load('Main', jackCompiler.compile_source(source)['vm'].splitlines())
+    assert emulator.run() is None
+    assert emulator.halted
+    assert ''.join(emulator.output) == 'OK-12\n'
+
+
+def test_step_limit():
+    emulator = vmEmulator.VMEmulator()
+    emulator.load('Main', ['function Main.main 0', 'label L', 'goto L'])
+    try:
+        emulator.run(max_steps=100)
+    except RuntimeError as error:
+        assert '100' in str(error)
+    else:
+        raise AssertionError("an endless loop did not stop")
+
+
+def test_command_line_json(tmp_path, capsys):
+    (tmp_path / 'Main.vm').write_text('\n'.join(countdown) + '\n')
+    assert vmEmulator.main([str(tmp_path), '--json', '-']) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report['steps'] == 49 and report['output'] == '321'
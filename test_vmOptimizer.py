@@ -0,0 +1,59 @@
+"""
+Tests of the peephole rules, one rule at a time and together.
+"""
+
+import pytest
+import vmOptimizer
+
+array_store = ['push local 0', 'push local 1', 'add']
+
+# rule name, commands, optimized commands, hits of the rule
+cases = [
+    ('double-negation', ['push local 0', 'not', 'not'], ['push local 0'], 1),
+    ('double-negation', ['push local 0', 'neg', 'neg', 'neg'], ['push local 0', 'neg'], 1),
+    ('double-negation', ['push local 0', 'neg', 'not'], ['push local 0', 'neg', 'not'], 0),
+    ('negated-constant', ['push constant 1', 'neg', 'not'], ['push constant 0'], 1),
+    ('negated-constant', ['push constant 0', 'neg'], ['push constant 0'], 1),
+    ('negated-constant', ['push constant 2', 'neg', 'not'], ['push constant 2', 'neg', 'not'], 0),
+    ('constant-if-goto', ['push constant 1', 'neg', 'if-goto L'], ['goto L'], 1),
+    ('constant-if-goto', ['push constant 0', 'not', 'if-goto L'], ['goto L'], 1),
+    ('constant-if-goto', ['push constant 0', 'if-goto L'], [], 1),
+    ('constant-if-goto', ['push constant 5', 'if-goto L'], ['goto L'], 1),
+    ('constant-if-goto', ['push local 0', 'if-goto L'], ['push local 0', 'if-goto L'], 0),
+    ('goto-next-label', ['goto L', 'label L'], ['label L'], 1),
+    ('goto-next-label', ['goto L', 'label L2'], ['goto L', 'label L2'], 0),
+    ('temp-round-trip', ['pop temp 0', 'push temp 0'], [], 1),
+    ('temp-round-trip', ['pop temp 1', 'push temp 1'], ['pop temp 1', 'push temp 1'], 0),
+    ('array-store-simple-value', array_store + ['push argument 2', 'pop temp 0', 'pop pointer 1', 'push temp 0',
+                                                'pop that 0'],
+     array_store + ['pop pointer 1', 'push argument 2', 'pop that 0'], 1),
+    ('array-store-simple-value', array_store + ['push that 0', 'pop temp 0', 'pop pointer 1', 'push temp 0',
+                                                'pop that 0'],
+     array_store + ['push that 0', 'pop temp 0', 'pop pointer 1', 'push temp 0', 'pop that 0'], 0),
+    ('add-zero', ['push local 0', 'push constant 0', 'add'], ['push local 0'], 1),
+    ('add-zero', ['push local 0', 'push constant 0', 'sub'], ['push local 0'], 1),
+    ('add-zero', ['push local 0', 'push constant 0', 'eq'], ['push local 0', 'push constant 0', 'eq'], 0),
+    ('unreachable', ['return', 'push constant 1', 'pop local 0', 'label L'], ['return', 'label L'], 2),
+    ('unreachable', ['goto L', 'call Math.abs 1', 'label L2'], ['goto L', 'label L2'], 1),
+]
+
+
+@pytest.mark.parametrize('name, commands, optimized, hits', cases)
+def test_rule(name, commands, optimized, hits):
+    optimizer = vmOptimizer.PeepholeOptimizer([rule for rule in vmOptimizer.peephole_rules if rule.name == name])
+    assert optimizer.optimize(commands) == optimized
+    assert optimizer.hits[name] == hits
+    assert sum(optimizer.hits.values()) == hits
+
+
+def test_rewrites_cascade():
+    optimizer = vmOptimizer.optimizer(1)
+    commands = ['push local 0', 'push constant 1', 'neg', 'not', 'if-goto L', 'pop temp 0', 'push temp 0',
+                'push constant 0', 'add', 'return', 'push constant 0', 'return']
+    assert optimizer.optimize(commands) == ['push local 0', 'return']
+    assert optimizer.hits == {'negated-constant': 1, 'constant-if-goto': 1, 'temp-round-trip': 1, 'add-zero': 1,
+                              'unreachable': 2}
+
+
+def test_no_optimizer_at_level_0():
+    assert vmOptimizer.optimizer(0) is None
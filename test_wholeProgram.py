@@ -0,0 +1,117 @@
+"""
+Tests of the whole-program passes, on the .vm files of a small project.
+"""
+
+import jackCompiler
+import main
+import vmEmulator
+import wholeProgram
+
+sources = {
+    'Main': '''class Main {
+    function void main() {
+        var Point p;
+        let p = Point.new(3, 4);
+        do Output.printInt(p.getX());
+        do Output.printInt(Point.twice(p.getY()));
+        return;
+    }
+}
+''',
+    'Point': '''class Point {
+    field int x, y;
+    constructor Point new(int ax, int ay) {
+        let x = ax;
+        let y = ay;
+        return this;
+    }
+    method int getX() { return x; }
+    method int getY() { return y; }
+    function int twice(int a) { return a + a; }
+    function int unused() { return Point.unusedHelper(); }
+    function int unusedHelper() { return 1; }
+}
+''',
+}
+
+
+def write_project(directory, classes=sources):
+    """
+    Compile classes into .vm files of directory.
+    :param directory: pathlib.Path
+    :param classes: dict of class name to its jack source
+    :return: list of the .vm paths
+    """
+    vm_paths = []
+    for name, result in jackCompiler.compile_sources(classes).items():
+        vm_path = directory / f'{name}.vm'
+        vm_path.write_text(result['vm'])
+        vm_paths.append(str(vm_path))
+    return vm_paths
+
+
+def run_directory(directory):
+    """
+    Run the .vm files of a directory with vmEmulator.
+    :param directory: pathlib.Path
+    :return: string printed by the program
+    """
+    emulator = vmEmulator.VMEmulator()
+    emulator.load_directory(str(directory))
+    emulator.run()
+    return ''.join(emulator.output)
+
+
+def test_eliminate_dead_subroutines(tmp_path):
+    vm_paths = write_project(tmp_path)
+    commands = sum(len(functions[name]) for functions in map(wholeProgram.read_functions, vm_paths)
+                   for name in functions)
+    report = wholeProgram.eliminate_dead_subroutines(vm_paths)
+    assert report['removed'] == [('Point.unused', 3), ('Point.unusedHelper', 3)]
+    assert report['commands'] == commands
+    assert report['saved'] == 6
+    assert list(wholeProgram.read_functions(vm_paths[1])) == ['Point.new', 'Point.getX', 'Point.getY', 'Point.twice']
+    assert run_directory(tmp_path) == '38'
+
+
+def test_library_without_entry_point_is_kept(tmp_path):
+    vm_paths = write_project(tmp_path, {'Point': sources['Point']})
+    report = wholeProgram.eliminate_dead_subroutines(vm_paths)
+    assert report['removed'] == [] and report['saved'] == 0
+    assert len(wholeProgram.read_functions(vm_paths[0])) == 6
+
+
+def test_inline_subroutines(tmp_path):
+    vm_paths = write_project(tmp_path)
+    output = run_directory(tmp_path)
+    commands = sum(len(functions[name]) for functions in map(wholeProgram.read_functions, vm_paths)
+                   for name in functions)
+    report = wholeProgram.inline_subroutines(vm_paths, 8)
+    assert report['inlined'] == {'Point.getX': 1, 'Point.getY': 1, 'Point.twice': 1, 'Point.unusedHelper': 1}
+    after = sum(len(functions[name]) for functions in map(wholeProgram.read_functions, vm_paths) for name in functions)
+    assert report['commands'] == commands and report['saved'] == commands - after
+    main_vm = wholeProgram.read_functions(vm_paths[0])['Main.main']
+    assert [command for command in main_vm if command.startswith('call ')] == [
+        'call Point.new 2', 'call Output.printInt 1', 'call Output.printInt 1']
+    assert run_directory(tmp_path) == output
+
+
+def test_inline_skips_large_subroutines(tmp_path):
+    vm_paths = write_project(tmp_path)
+    report = wholeProgram.inline_subroutines(vm_paths, 1)
+    assert report['inlined'] == {'Point.getX': 1, 'Point.getY': 1, 'Point.unusedHelper': 1}
+    assert run_directory(tmp_path) == '38'
+
+
+def test_whole_program_and_inline_from_the_command_line(tmp_path, capsys):
+    project = tmp_path / 'Project'
+    project.mkdir()
+    for name, source in sources.items():
+        (project / f'{name}.jack').write_text(source)
+    status = main.main([str(project), '-o', str(tmp_path / 'out'), '-j', '1', '--vm-only', '-O', '1',
+                        '--whole-program', '--inline', '8'])
+    assert status == 0
+    printed = capsys.readouterr().out
+    assert 'inlined 4 calls of 4 subroutines' in printed
+    assert 'removed 5 unreachable subroutines'  # the inlined ones included in printed
+    assert run_directory(tmp_path / 'out' / 'Project') == '38'
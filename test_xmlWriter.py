@@ -0,0 +1,19 @@
+"""
+Tests of the XML back end, through the in-memory compiler.
+"""
+
+import jackCompiler
+
+source = '''class Main {
+    function int main() {
+        return 007;
+    }
+}
+'''
+
+
+def test_integer_constant_keeps_source_text():
+    result = jackCompiler.compile_source(source, xml=True)
+    assert '<integerConstant>007</integerConstant>' in result['tokens_xml']
+    assert '<integerConstant>007</integerConstant>' in result['xml']
+    assert 'push constant 7' in result['vm']
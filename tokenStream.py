@@ -0,0 +1,81 @@
+"""
+Provides a token stream for the CompilationEngline. Tokens are pulled on demand from a token source, such as the
+Tokenizer's generator, into a small lookahead buffer, so the parser only holds the tokens it is currently looking at.
+Consuming a token is O(1).
+"""
+
+from collections import deque
+from itertools import islice
+
+
+class TokenStream:
+
+    def __init__(self, tokens=(), history=20):
+        """
+        Initialize TokenStream with a token source.
+        :param tokens: iterable of tokens, consumed lazily
+        :param history: number of consumed tokens kept for error messages
+        """
+        self.source = iter(tokens)
+        self.buffer = deque()
+        self.history = deque(maxlen=history)
+        self.consumed = 0
+
+    def append(self, token):
+        """
+        Add a token at the end of the lookahead buffer.
+        :param token:
+        :return:
+        """
+        self.buffer.append(token)
+
+    def fill(self, size):
+        """
+        Pull tokens from the source until the buffer holds size tokens or the source is exhausted.
+        :param size: int
+        :return: True if the buffer holds size tokens
+        """
+        buffer = self.buffer
+        while len(buffer) < size:
+            token = next(self.source, None)
+            if token is None:
+                return False
+            buffer.append(token)
+        return True
+
+    def advance(self):
+        """
+        Consume the current token and move to the next one.
+        :return: token consumed
+        """
+        if not self.buffer and not self.fill(1):
+            raise TypeError(f"Unexpected end of tokens after {self.context(-20)}")
+        token = self.buffer.popleft()
+        self.history.append(token)
+        self.consumed += 1
+        return token
+
+    def peek(self, k=0):
+        """
+        check the k-th token after the cursor without consuming it.
+        :param k: lookahead distance, 0 is the current token
+        :return: token, or None if the stream ends before it
+        """
+        if k < len(self.buffer) or self.fill(k + 1):
+            return self.buffer[k]
+        return None
+
+    def at_end(self):
+        """Returns True if every token has been consumed."""
+        return self.peek() is None
+
+    def context(self, count=20):
+        """
+        Return tokens around the cursor for error messages.
+        :param count: number of upcoming tokens, or of already consumed tokens if negative
+        :return: list of tokens
+        """
+        if count < 0:
+            return list(self.history)[count:]
+        self.fill(count)
+        return list(islice(self.buffer, count))
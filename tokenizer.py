@@ -3,6 +3,7 @@ Ignores all comments and while space in the input stream, and serialize it into
 """
 
 import re
+import sys
 
 # Jack Tokens:
 keyword = ('class' , 'constructor' , 'function' , 'method' , 'field' , 'static' , 'var' , 'int' , 'char' , 'boolean' ,
@@ -12,113 +13,133 @@ symbol = ('{' , '}' , '(' , ')' , '[' , ']' , '.' , ',' , ';' , '+' , '-' , '*'
 special_symbols = {'<': '&lt;', '>': '&gt;', '\"': '&quot;', '&':'&amp;'}
 
 
+# Master regex scanning the whole source in one pass. Whitespace and comments match without a named group and are
+# skipped; every other alternative is named after the token type it produces.
+token_regex = re.compile(r"""
+      \s+
+    | //[^\n]*
+    | /\*.*?\*/
+    | (?P<stringConstant>"[^"\n]*")
+    | (?P<unterminated>/\*|"[^"\n]*)
+    | (?P<integerConstant>\d+)
+    | (?P<identifier>[A-Za-z_]\w*)
+    | (?P<symbol>[{}()\[\].,;+\-*/&|<>=~])
+    | (?P<error>.)
+""", re.DOTALL | re.VERBOSE)
+
+keyword_set = frozenset(keyword)
+
+# Token type codes, classified once when the token is scanned.
+KEYWORD, SYMBOL, INTEGER_CONSTANT, STRING_CONSTANT, IDENTIFIER = range(5)
+type_names = ('keyword', 'symbol', 'integerConstant', 'stringConstant', 'identifier')
+group_types = {'symbol': SYMBOL, 'integerConstant': INTEGER_CONSTANT, 'stringConstant': STRING_CONSTANT,
+               'identifier': IDENTIFIER}
+
+
+class Token:
+    """A scanned token: its type code, its value and its offset in the source."""
+    __slots__ = ('type', 'value', 'start')
+
+    def __init__(self, type, value, start):
+        self.type = type
+        self.value = value
+        self.start = start
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+def xml_line(token):
+    """
+    Return the xml line of a terminal token, escaping special symbols.
+    :param token: Token
+    :return: string
+    """
+    type = type_names[token.type]
+    if token.type == STRING_CONSTANT:  # remove the leading double quote from the stringConstant
+        value = token.value[1:]
+    else:
+        value = special_symbols.get(token.value, token.value)
+    return f'<{type}>{value}</{type}>\n'
+
+
 class Tokenizer:
 
     def __init__(self, read_file, token_file):
         """
         Initialize Tokenizer object with file objects passed in.
+        :param read_file: file object of the .jack source
+        :param token_file: file object for the T.xml output, or None to skip it
         """
         self.read_file = read_file
         self.token_file = token_file
-        self.current_char = None
+        self.matches = None
+        self.next_match = None
+        self.current = None
         self.current_token = ""
-        self.tokens = []
 
-    def ignore_comment_space(self, c):
+    def scan(self):
         """
-        helper function to check if char is part of a comment or space. If so, continues reading next char
-        :param c: char to check
-        :return: set current_char to the char after space or comment
+        Reads the whole source once and yields a regex match for every token, skipping comments and white space.
+        :return: generator of re.Match
         """
-        while c in ('/', ' ', '\n', '\t'):
-            next = self.read_file.read(1)
-            if c == '/' and  next == '/': # ignoring all chars until next line
-                while next != '\n':
-                    next = self.read_file.read(1)
-                c = self.read_file.read(1)
-            elif c == '/' and next == '*':  # ignoring all chars until */ encountered
-                while not (c == '*' and next == '/'):
-                    c = next
-                    next = self.read_file.read(1)
-                c = self.read_file.read(1)
-            elif c == '/' and next == ' ':  # handles 3 / 4
-                break
-            else:
-                c = next
-
-            # TODO: handle if next char is another token. (ie in 4/5)
-
-        self.current_char = c
+        source = self.read_file.read()
+        for match in token_regex.finditer(source):
+            kind = match.lastgroup
+            if kind is None:
+                continue
+            if kind in ('unterminated', 'error'):
+                line = source.count('\n', 0, match.start()) + 1
+                raise TypeError(f"Unexpected {match.group()[:20]!r} at line {line}")
+            yield match
 
     def has_more_token(self):
         """Returns True if there is more tokens in input and use advance() to set current_token"""
-
-        if self.current_char == None:
-            char = self.read_file.read(1)
-        else:
-            char = self.current_char  # reuse additional char read and reset current_char to None
-            self.current_char = None
-
-        # continue parsing until all comment and space ignored
-        self.ignore_comment_space(char)
-
-        # Return false if EOF
-        if self.current_char == "":
-            return False
-
-        # returns true when current_char ready for to be advanced as a token.
-        return True
+        if self.matches is None:
+            self.matches = self.scan()
+        self.next_match = next(self.matches, None)
+        return self.next_match is not None
 
     def advance(self):
         """
         Gets the next token from the input and makes it the current token.
-        :return:
+        :return: Token
         """
-        char = self.current_char
-
-        if char in symbol:
-            self.current_token = char
-            self.current_char = None
-
-        # Tokenize stringConstant
-        elif char == "\"":
-            self.current_token += char
-            char = self.read_file.read(1)
-            while char != "\"":
-                self.current_token += char
-                char = self.read_file.read(1)
-            self.current_char = None
-
-        # Tokenize integerConstant
-        elif re.search("\d", char):
-            while re.search("\d", char):
-                self.current_token += char
-                char = self.read_file.read(1)
-            self.current_char = char  # save the next char since it could be another token (ie 33+22)
-
-        # Tokenize identifiers
-        elif re.search("\w", char):
-            while re.search("\w", char):
-                self.current_token += char
-                char = self.read_file.read(1)
-            self.current_char = char
+        match = self.next_match
+        type = group_types[match.lastgroup]
+        if type == STRING_CONSTANT:
+            # strings keep their leading double quote only, which marks them as stringConstant
+            value = match.group()[:-1]
+        else:
+            value = sys.intern(match.group())
+            if type == IDENTIFIER and value in keyword_set:
+                type = KEYWORD
+        self.current = Token(type, value, match.start())
+        self.current_token = value
+        return self.current
 
     def token_type(self):
         """
         Return the current type of token as constant.
         """
+        return type_names[self.current.type]
 
-        if self.current_token in keyword:
-            return 'keyword'
-        elif self.current_token in symbol:
-            return 'symbol'
-        elif "\"" in self.current_token:
-            return 'stringConstant'
-        else:
-            if re.search(r'\d', self.current_token[0]):
-                return 'integerConstant'
-            else:
-                return 'identifier'
+    def generate_tokens(self):
+        """
+        write to token xml while yielding tokens one at a time, so the tokens can be consumed as they are read.
+        :return: generator of Token
+        """
+        if self.token_file is None:
+            while self.has_more_token():
+                yield self.advance()
+            return
+
+        self.token_file.write('<tokens>\n')
+        while self.has_more_token():
+            token = self.advance()
+            self.token_file.write(xml_line(token))
+            yield token
+        self.token_file.write('</tokens>\n')
 
     def write_tokens(self, compiler_engline):
         """
@@ -126,20 +147,5 @@ class Tokenizer:
         :param compiler_tokens:
         :return:
         """
-        self.token_file.write('<tokens>\n')
-        while self.has_more_token():
-            self.advance()
-            token_type = self.token_type()
-            if token_type == 'stringConstant':
-                self.token_file.write(
-                    '<' + token_type + '>' + self.current_token[1:] + '</' + token_type + '>' + '\n')
-            elif self.current_token in special_symbols:
-                self.token_file.write(
-                    '<' + token_type + '>' + special_symbols[self.current_token] + '</' + token_type + '>' + '\n'
-                )
-            else:
-                self.token_file.write(
-                    '<' + token_type + '>' + self.current_token + '</' + token_type + '>' + '\n')
-            compiler_engline.add_tokens(self.current_token)
-            self.current_token = ''
-        self.token_file.write('</tokens>\n')
\ No newline at end of file
+        for token in self.generate_tokens():
+            compiler_engline.add_tokens(token)
@@ -0,0 +1,169 @@
+"""
+Binary form of VM code, written by VMWritter in place of the text .vm files with --bytecode, into .vmb files. Loading
+it needs no text parsing: a .vmb file is a header, then one fixed 8 byte record per VM command, then a string table of
+the function and label names the records refer to.
+
+    header   magic b'JVMB', version u16, 2 padding bytes, record count u32, string count u32
+    record   opcode u8, segment u8, operand u16, name u32 (index in the string table, no_name if unused)
+    string   length u16, utf-8 bytes
+
+The operand is the index of push/pop, the argument count of call and the local count of function. All integers are
+little endian. Files are loaded through mmap, and disassemble back to the exact text of the VM commands:
+
+    python vmBytecode.py Pong/my_jack/Main.vmb
+    python vmBytecode.py --assemble Pong/my_jack/Main.vm
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+magic = b'JVMB'
+version = 1
+header_format = struct.Struct('<4sHxxII')
+record_format = struct.Struct('<BBHI')
+no_name = 0xFFFFFFFF
+
+opcodes = ('push', 'pop', 'add', 'sub', 'neg', 'eq', 'gt', 'lt', 'and', 'or', 'not', 'label', 'goto', 'if-goto',
+           'call', 'function', 'return')
+segments = ('constant', 'argument', 'local', 'static', 'this', 'that', 'pointer', 'temp')
+opcode_codes = {name: code for code, name in enumerate(opcodes)}
+segment_codes = {name: code for code, name in enumerate(segments)}
+PUSH, POP, LABEL, GOTO, IF_GOTO, CALL, FUNCTION = (opcode_codes[name] for name in
+                                                    ('push', 'pop', 'label', 'goto', 'if-goto', 'call', 'function'))
+
+
+def encode(commands):
+    """
+    Encode VM commands into the bytes of a .vmb file.
+    :param commands: iterable of VM command strings
+    :return: bytes
+    """
+    strings = {}  # name: its index in the string table
+    records = bytearray()
+    count = 0
+    for command in commands:
+        words = command.split()
+        opcode = opcode_codes.get(words[0])
+        if opcode is None:
+            raise TypeError(f"Unknown VM command {command!r}")
+        segment = operand = 0
+        name = no_name
+        if opcode == PUSH or opcode == POP:
+            segment, operand = segment_codes[words[1]], int(words[2])
+        elif opcode >= LABEL and opcode <= FUNCTION:
+            name = strings.setdefault(words[1], len(strings))
+            if opcode >= CALL:
+                operand = int(words[2])
+        records += record_format.pack(opcode, segment, operand, name)
+        count += 1
+    table = bytearray()
+    for string in strings:
+        data = string.encode('utf-8')
+        table += struct.pack('<H', len(data)) + data
+    return header_format.pack(magic, version, count, len(strings)) + bytes(records) + bytes(table)
+
+
+class BytecodeFile:
+    """VM code of a .vmb file, read in place from a buffer such as an mmap."""
+
+    def __init__(self, data):
+        """
+        Initialize BytecodeFile over the bytes of a .vmb file.
+        :param data: bytes-like object, an empty one being an empty file
+        """
+        self.data = data
+        self.count = 0
+        self.strings = []
+        if len(data) == 0:
+            return
+        file_magic, file_version, self.count, string_count = header_format.unpack_from(data, 0)
+        if file_magic != magic or file_version != version:
+            raise TypeError(f"Not a version {version} .vmb file")
+        offset = header_format.size + self.count * record_format.size
+        for index in range(string_count):
+            length, = struct.unpack_from('<H', data, offset)
+            self.strings.append(bytes(data[offset + 2:offset + 2 + length]).decode('utf-8'))
+            offset += 2 + length
+
+    def __len__(self):
+        return self.count
+
+    def records(self):
+        """
+        Return the records of the file, decoded without copying the file.
+        :return: iterator of (opcode, segment, operand, name) tuples, name being an index in strings
+        """
+        start = header_format.size
+        return record_format.iter_unpack(memoryview(self.data)[start:start + self.count * record_format.size])
+
+    def commands(self):
+        """
+        Disassemble the file into the text of its VM commands.
+        :return: list of VM command strings
+        """
+        strings = self.strings
+        commands = []
+        for opcode, segment, operand, name in self.records():
+            if opcode == PUSH or opcode == POP:
+                commands.append(f'{opcodes[opcode]} {segments[segment]} {operand}')
+            elif opcode >= CALL and opcode <= FUNCTION:
+                commands.append(f'{opcodes[opcode]} {strings[name]} {operand}')
+            elif opcode >= LABEL and opcode < CALL:
+                commands.append(f'{opcodes[opcode]} {strings[name]}')
+            else:
+                commands.append(opcodes[opcode])
+        return commands
+
+
+def load(path):
+    """
+    Map a .vmb file into memory.
+    :param path: os path of a .vmb file
+    :return: BytecodeFile
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return BytecodeFile(b'')
+        # the mapping stays valid after the file is closed
+        return BytecodeFile(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def load_directory(path):
+    """
+    Map every .vmb file of a directory into memory.
+    :param path: os path of a directory, or of a single .vmb file
+    :return: dict of class name to BytecodeFile, sorted by class name
+    """
+    files = [path] if os.path.isfile(path) else sorted(
+        os.path.join(path, file) for file in os.listdir(path) if file.endswith('.vmb'))
+    return {os.path.splitext(os.path.basename(file))[0]: load(file) for file in files}
+
+
+def main(argv=None):
+    """
+    Disassemble .vmb files, or assemble .vm files into .vmb files.
+    :param argv: list of command line arguments, defaults to sys.argv
+    :return: exit status
+    """
+    parser = argparse.ArgumentParser(description="Disassemble .vmb files into VM commands.")
+    parser.add_argument('paths', nargs='+', metavar='PATH', help=".vmb files, or .vm files with --assemble")
+    parser.add_argument('--assemble', action='store_true', help="write a .vmb file next to each .vm file instead")
+    args = parser.parse_args(argv)
+    for path in args.paths:
+        if args.assemble:
+            with open(path, 'r') as vm_file:
+                commands = [line.split('//', 1)[0].strip() for line in vm_file]
+            with open(os.path.splitext(path)[0] + '.vmb', 'wb') as vmb_file:
+                vmb_file.write(encode(command for command in commands if command))
+        else:
+            commands = load(path).commands()
+            if commands:
+                print('\n'.join(commands))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Static cost report of VM code, such as the .vm files written by VMWritter. Without running anything, walks the commands
+of every function and counts them by kind, counts the calls of the expensive OS functions, measures the nesting depth
+of the while loops from their labels and estimates the number of Hack instructions the function takes under a cost
+model, once straight through and weighted by loop nesting.
+
+    python vmCost.py Pong/my_jack --json cost.json --cost-model model.json
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import wholeProgram
+
+# Hack instructions of each VM command of a typical VM translator, by command kind or by push/pop segment. call is
+# counted per call plus per argument, function per local. A cost model file overrides any of these keys.
+hack_costs = {
+    'push constant': 7, 'push local': 10, 'push argument': 10, 'push this': 10, 'push that': 10,
+    'push static': 6, 'push temp': 6, 'push pointer': 6,
+    'pop local': 12, 'pop argument': 12, 'pop this': 12, 'pop that': 12, 'pop static': 5, 'pop temp': 5,
+    'pop pointer': 5,
+    'add': 5, 'sub': 5, 'and': 5, 'or': 5, 'neg': 3, 'not': 3, 'eq': 13, 'gt': 13, 'lt': 13,
+    'label': 0, 'goto': 2, 'if-goto': 4,
+    'call': 44, 'call argument': 0, 'function': 0, 'function local': 4, 'return': 40,
+}
+
+# OS functions whose calls are reported, being the costly ones the compiler can avoid
+counted_calls = ('Math.multiply', 'Math.divide', 'String.appendChar')
+
+# weight of a command in a loop relative to the enclosing code, for the loop weighted cost
+loop_factor = 10
+
+while_labels = re.compile(r'label W\d+(true|false)$')
+
+
+def command_cost(command, costs):
+    """
+    Return the Hack instructions of a VM command under a cost model.
+    :param command: VM command string
+    :param costs: dict of cost model keys to Hack instructions, see hack_costs
+    :return: int
+    """
+    words = command.split()
+    kind = words[0]
+    if kind in ('push', 'pop'):
+        return costs.get(f'{kind} {words[1]}', 0)
+    if kind == 'call':
+        return costs.get('call', 0) + costs.get('call argument', 0) * int(words[2])
+    if kind == 'function':
+        return costs.get('function', 0) + costs.get('function local', 0) * int(words[2])
+    return costs.get(kind, 0)
+
+
+def function_cost(commands, costs=hack_costs, factor=loop_factor):
+    """
+    Analyze the VM commands of a function.
+    :param commands: VM commands, starting with the function command
+    :param costs: cost model, see hack_costs
+    :param factor: weight of a loop nesting level for weighted_cost
+    :return: dict of commands (total), kinds (counts by command kind), calls (counts of counted_calls), loop_depth
+    (deepest while loop nesting), cost (Hack instructions) and weighted_cost (Hack instructions weighted by factor per
+    enclosing loop)
+    """
+    kinds, calls = {}, {}
+    depth = loop_depth = cost = weighted = 0
+    for command in commands:
+        kind = command.split(' ', 1)[0]
+        kinds[kind] = kinds.get(kind, 0) + 1
+        if kind == 'call':
+            callee = command.split()[1]
+            if callee in counted_calls:
+                calls[callee] = calls.get(callee, 0) + 1
+        elif kind == 'label':
+            match = while_labels.match(command)
+            if match is not None:
+                # a while loop spans from its W{n}true label to its W{n}false label
+                depth += 1 if match.group(1) == 'true' else -1
+                loop_depth = max(loop_depth, depth)
+        hack = command_cost(command, costs)
+        cost += hack
+        weighted += hack * factor ** max(depth, 0)
+    return {'commands': len(commands), 'kinds': kinds, 'calls': calls, 'loop_depth': loop_depth, 'cost': cost,
+            'weighted_cost': weighted}
+
+
+def analyze(paths, costs=hack_costs, factor=loop_factor):
+    """
+    Analyze every function of .vm files.
+    :param paths: os paths of .vm files or of directories of .vm files
+    :param costs: cost model, see hack_costs
+    :param factor: weight of a loop nesting level for weighted_cost
+    :return: dict of class name to dict of function name to its function_cost
+    """
+    report = {}
+    for path in paths:
+        files = [path] if os.path.isfile(path) else sorted(
+            os.path.join(path, file) for file in os.listdir(path) if file.endswith('.vm'))
+        for vm_path in files:
+            class_name = os.path.splitext(os.path.basename(vm_path))[0]
+            functions = wholeProgram.read_functions(vm_path)
+            report[class_name] = {name: function_cost(commands, costs, factor) for name, commands in functions.items()}
+    return report
+
+
+def summary(report, key='weighted_cost'):
+    """
+    Format a report as a text table of every function, the most expensive first.
+    :param report: dict returned by analyze
+    :param key: function_cost key to sort by
+    :return: string
+    """
+    rows = [(name, result) for functions in report.values() for name, result in functions.items()]
+    rows.sort(key=lambda row: (-row[1][key], row[0]) if key != 'name' else row[0])
+    width = max([len(name) for name, result in rows] + [8])
+    lines = [f"{'function':<{width}} {'commands':>8} {'cost':>8} {'weighted':>10} {'loops':>5} "
+             f"{'multiply':>8} {'divide':>6} {'appendChar':>10}"]
+    for name, result in rows:
+        calls = result['calls']
+        lines.append(f"{name:<{width}} {result['commands']:>8} {result['cost']:>8} {result['weighted_cost']:>10} "
+                     f"{result['loop_depth']:>5} {calls.get('Math.multiply', 0):>8} {calls.get('Math.divide', 0):>6} "
+                     f"{calls.get('String.appendChar', 0):>10}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """
+    Print the static cost report of compiled directories.
+    :param argv: list of command line arguments, defaults to sys.argv
+    :return: exit status
+    """
+    parser = argparse.ArgumentParser(description="Report the static cost of every function of VM code.")
+    parser.add_argument('paths', nargs='+', metavar='PATH', help=".vm files or directories of .vm files")
+    parser.add_argument('--json', metavar='FILE', help="write the report as JSON to FILE ('-' for stdout)")
+    parser.add_argument('--cost-model', metavar='FILE',
+                        help="JSON object of Hack instructions per VM command, overriding the keys of hack_costs")
+    parser.add_argument('--loop-factor', type=int, default=loop_factor,
+                        help=f"weight of a loop nesting level in the weighted cost (default: {loop_factor})")
+    parser.add_argument('--sort', choices=('weighted_cost', 'cost', 'commands', 'loop_depth', 'name'),
+                        default='weighted_cost', help="order of the text summary (default: weighted_cost)")
+    args = parser.parse_args(argv)
+
+    costs = dict(hack_costs)
+    if args.cost_model is not None:
+        with open(args.cost_model) as model_file:
+            costs.update(json.load(model_file))
+    report = analyze(args.paths, costs, args.loop_factor)
+    if args.json:
+        text = json.dumps(report, indent=2)
+        if args.json == '-':
+            print(text)
+            return 0
+        with open(args.json, 'w') as json_file:
+            json_file.write(text + '\n')
+    print(summary(report, args.sort))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,496 @@
+"""
+Executes Hack VM code, such as the .vm files written by VMWritter, to measure the runtime cost of the generated code.
+The core OS classes (Math, Memory, Array, String, Output, Screen, Keyboard, Sys) are provided by Python stand-ins
+unless the program defines them. Every executed VM command is counted, and the counts are reported per function, per
+command kind and per source construct (the while loops and if statements recognized from their labels). OS stand-ins
+run as a single step, their cost is estimated from os_costs.
+
+    python vmEmulator.py Pong/my_jack --max-steps 10000000
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import vmBytecode
+
+# RAM layout of the Hack platform
+SP, LCL, ARG, THIS, THAT = range(5)
+TEMP, STATIC, STACK, HEAP, SCREEN = 5, 16, 256, 2048, 16384
+
+# decoded opcodes
+(PUSH_CONSTANT, PUSH_SEGMENT, PUSH_FIXED, POP_SEGMENT, POP_FIXED, ADD, SUB, NEG, EQ, GT, LT, AND, OR, NOT,
+ GOTO, IF_GOTO, CALL, CALL_BUILTIN, FUNCTION, RETURN) = range(20)
+
+arithmetic_opcodes = {'add': ADD, 'sub': SUB, 'neg': NEG, 'eq': EQ, 'gt': GT, 'lt': LT, 'and': AND, 'or': OR,
+                      'not': NOT}
+segment_registers = {'local': LCL, 'argument': ARG, 'this': THIS, 'that': THAT}
+
+# labels written by CodeGenerator for while loops and if statements
+construct_labels = re.compile(r'(?:(?P<while>W\d+)true|(?P<if>\w*IF\d+)true)$')
+
+# rough number of VM commands the reference Jack OS executes per call, for the estimated total of report(). Calls of
+# other OS functions count as one command.
+os_costs = {
+    'Math.multiply': 250, 'Math.divide': 300, 'Math.sqrt': 600, 'Math.abs': 10, 'Math.min': 10, 'Math.max': 10,
+    'Memory.alloc': 40, 'Memory.deAlloc': 15, 'Array.new': 45, 'Array.dispose': 20,
+    'String.new': 60, 'String.appendChar': 20, 'String.charAt': 10, 'String.setCharAt': 10, 'String.length': 5,
+    'Output.printChar': 150, 'Output.printString': 20, 'Output.printInt': 200,
+}
+
+
+def wrap(value):
+    """Return value wrapped into a signed 16-bit integer."""
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+class VMEmulator:
+
+    def __init__(self):
+        """
+        Initialize an empty VMEmulator, load VM code with load() or load_directory() then run().
+        """
+        self.ram = [0] * 32768
+        self.files = []  # (class name, list of VM commands)
+        self.code = []
+        self.functions = {}  # function name: pc of its function command
+        self.output = []
+        self.steps = 0
+        self.counts = []
+        self.builtins = {}
+        self.strings = {}  # String object address: list of char codes
+        self.free_blocks = None
+        self.halted = False
+
+    # ---- loading ----
+
+    def load(self, class_name, commands):
+        """
+        Add the VM commands of a class.
+        :param class_name: name of the class, which scopes its static segment
+        :param commands: iterable of VM command strings, comments and blank lines are ignored
+        :return:
+        """
+        commands = [command.split('//')[0].strip() for command in commands]
+        self.files.append((class_name, [command for command in commands if command]))
+
+    def load_directory(self, path):
+        """
+        Add every .vm file of a directory, or a single .vm file. Binary .vmb files are loaded as well.
+        :param path: os path
+        :return:
+        """
+        files = [path] if os.path.isfile(path) else sorted(
+            os.path.join(path, file) for file in os.listdir(path) if file.endswith(('.vm', '.vmb')))
+        for file in files:
+            class_name = os.path.splitext(os.path.basename(file))[0]
+            if file.endswith('.vmb'):
+                self.load(class_name, vmBytecode.load(file).commands())
+                continue
+            with open(file) as vm_file:
+                self.load(class_name, vm_file.read().splitlines())
+
+    def decode(self):
+        """
+        Translate the loaded VM commands into (opcode, a, b) tuples, resolving labels, calls and static addresses.
+        :return:
+        """
+        code = []
+        source = []  # (function name, VM command) of each decoded instruction
+        labels = {}
+        pending = []  # (code index, function name, label) to resolve
+        static_base = STATIC
+        function = None
+        for class_name, commands in self.files:
+            statics = 0
+            for command in commands:
+                parts = command.split()
+                name = parts[0]
+                if name == 'label':
+                    labels[function, parts[1]] = len(code)
+                    continue
+                if name == 'push' or name == 'pop':
+                    segment, index = parts[1], int(parts[2])
+                    if segment == 'constant':
+                        instruction = (PUSH_CONSTANT, index, 0)
+                    elif segment in segment_registers:
+                        instruction = (PUSH_SEGMENT if name == 'push' else POP_SEGMENT, segment_registers[segment],
+                                       index)
+                    else:
+                        if segment == 'static':
+                            address = static_base + index
+                            statics = max(statics, index + 1)
+                        elif segment == 'temp':
+                            address = TEMP + index
+                        elif segment == 'pointer':
+                            address = THIS + index
+                        else:
+                            raise RuntimeError(f"Unknown segment in {command!r}")
+                        instruction = (PUSH_FIXED if name == 'push' else POP_FIXED, address, 0)
+                elif name in arithmetic_opcodes:
+                    instruction = (arithmetic_opcodes[name], 0, 0)
+                elif name == 'goto' or name == 'if-goto':
+                    pending.append((len(code), function, parts[1]))
+                    instruction = (GOTO if name == 'goto' else IF_GOTO, parts[1], 0)
+                elif name == 'call':
+                    instruction = (CALL, parts[1], int(parts[2]))
+                elif name == 'function':
+                    function = parts[1]
+                    self.functions[function] = len(code)
+                    instruction = (FUNCTION, int(parts[2]), 0)
+                elif name == 'return':
+                    instruction = (RETURN, 0, 0)
+                else:
+                    raise RuntimeError(f"Unknown VM command {command!r}")
+                code.append(instruction)
+                source.append((function, command))
+            static_base += statics
+
+        for index, function, label in pending:
+            if (function, label) not in labels:
+                raise RuntimeError(f"Undefined label {label} in {function}")
+            opcode, name, b = code[index]
+            code[index] = (opcode, labels[function, label], b)
+
+        builtins = os_functions(self)
+        for index, (opcode, name, nArgs) in enumerate(code):
+            if opcode == CALL:
+                if name in self.functions:
+                    code[index] = (CALL, self.functions[name], nArgs)
+                elif name in builtins:
+                    code[index] = (CALL_BUILTIN, builtins[name], nArgs)
+                else:
+                    raise RuntimeError(f"Call to undefined function {name}")
+        self.code = code
+        self.source = source
+        self.labels = labels
+
+    # ---- execution ----
+
+    def run(self, entry=None, max_steps=100_000_000):
+        """
+        Run the program from Sys.init if it is defined, else from Main.main, until it returns or halts.
+        :param entry: name of the function to start from
+        :param max_steps: maximum number of VM commands executed before giving up
+        :return: value returned by the entry function, or None if the program halted
+        """
+        if not self.code:
+            self.decode()
+        if entry is None:
+            entry = 'Sys.init' if 'Sys.init' in self.functions else 'Main.main'
+        if entry not in self.functions:
+            raise RuntimeError(f"Entry function {entry} is not defined")
+
+        self.ram[SP] = STACK
+        self.ram[LCL] = self.ram[ARG] = STACK
+        counts = self.counts = [0] * len(self.code)
+        ram = self.ram
+        code = self.code
+        # a return to pc -1 stops the emulator
+        sp = self.push_frame(STACK, -1, 0)
+        pc = self.functions[entry]
+        steps = 0
+        while pc >= 0 and steps < max_steps:
+            steps += 1
+            counts[pc] += 1
+            opcode, a, b = code[pc]
+            pc += 1
+            if opcode == PUSH_CONSTANT:
+                ram[sp] = a
+                sp += 1
+            elif opcode == PUSH_SEGMENT:
+                ram[sp] = ram[ram[a] + b]
+                sp += 1
+            elif opcode == PUSH_FIXED:
+                ram[sp] = ram[a]
+                sp += 1
+            elif opcode == POP_SEGMENT:
+                sp -= 1
+                ram[ram[a] + b] = ram[sp]
+            elif opcode == POP_FIXED:
+                sp -= 1
+                ram[a] = ram[sp]
+            elif opcode <= OR:
+                if opcode == NEG:
+                    ram[sp - 1] = wrap(-ram[sp - 1])
+                    continue
+                sp -= 1
+                x, y = ram[sp - 1], ram[sp]
+                if opcode == ADD:
+                    ram[sp - 1] = wrap(x + y)
+                elif opcode == SUB:
+                    ram[sp - 1] = wrap(x - y)
+                elif opcode == EQ:
+                    ram[sp - 1] = -1 if x == y else 0
+                elif opcode == GT:
+                    ram[sp - 1] = -1 if x > y else 0
+                elif opcode == LT:
+                    ram[sp - 1] = -1 if x < y else 0
+                elif opcode == AND:
+                    ram[sp - 1] = x & y
+                else:
+                    ram[sp - 1] = x | y
+            elif opcode == NOT:
+                ram[sp - 1] = ~ram[sp - 1]
+            elif opcode == GOTO:
+                pc = a
+            elif opcode == IF_GOTO:
+                sp -= 1
+                if ram[sp]:
+                    pc = a
+            elif opcode == CALL:
+                sp = self.push_frame(sp, pc, b)
+                pc = a
+            elif opcode == FUNCTION:
+                for i in range(a):
+                    ram[sp + i] = 0
+                sp += a
+            elif opcode == RETURN:
+                frame = ram[LCL]
+                pc = ram[frame - 5]
+                ram[ram[ARG]] = ram[sp - 1]
+                sp = ram[ARG] + 1
+                ram[THAT], ram[THIS], ram[ARG], ram[LCL] = ram[frame - 1], ram[frame - 2], ram[frame - 3], ram[frame - 4]
+                if pc < 0:
+                    self.steps = steps
+                    ram[SP] = sp
+                    return ram[sp - 1]
+            else:  # CALL_BUILTIN
+                ram[SP] = sp - b
+                result = a(*ram[sp - b:sp])
+                if self.halted:
+                    break
+                sp -= b
+                ram[sp] = wrap(result or 0)
+                sp += 1
+        ram[SP] = sp
+        self.steps = steps
+        if not self.halted and pc >= 0:
+            raise RuntimeError(f"Program did not halt within {max_steps} steps")
+        return None
+
+    def push_frame(self, sp, return_address, nArgs):
+        """
+        Push a call frame and set ARG and LCL for the callee.
+        :return: new stack pointer
+        """
+        ram = self.ram
+        ram[sp:sp + 5] = return_address, ram[LCL], ram[ARG], ram[THIS], ram[THAT]
+        ram[ARG] = sp - nArgs
+        ram[LCL] = sp + 5
+        return sp + 5
+
+    # ---- reporting ----
+
+    def report(self, costs=os_costs):
+        """
+        Return instruction counts of the last run.
+        :param costs: dict of OS function name to its estimated number of VM commands per call
+        :return: dict with total steps, counts per function, per command kind, per while/if construct (including the
+        constructs nested in it), the calls of OS stand-ins, and estimated_steps counting the OS calls at their cost
+        """
+        functions, kinds, constructs, os_calls = {}, {}, {}, {}
+        # a while loop spans from its W{n}true label to its W{n}false label. An if statement has no label before its
+        # condition, it spans from the if-goto jumping to its IF{n}true label to its last label.
+        jumps = {(self.source[pc][0], self.source[pc][1].split()[1]): pc for pc, (opcode, a, b) in
+                 enumerate(self.code) if opcode == IF_GOTO}
+        ranges = []
+        for (function, label), start in self.labels.items():
+            match = construct_labels.match(label)
+            if match is None:
+                continue
+            if match.group('while'):
+                name, kind = match.group('while'), 'while'
+                end = self.labels.get((function, name + 'false'), start)
+            else:
+                name, kind = match.group('if'), 'if'
+                end = self.labels.get((function, name + 'false'), start)
+                start = jumps.get((function, label), start)
+            ranges.append((f"{function}:{kind} {name}", min(start, end), max(start, end)))
+
+        for pc, count in enumerate(self.counts):
+            if not count:
+                continue
+            function, command = self.source[pc]
+            functions[function] = functions.get(function, 0) + count
+            kind = command.split()[0]
+            kinds[kind] = kinds.get(kind, 0) + count
+            if self.code[pc][0] == CALL_BUILTIN:
+                name = command.split()[1]
+                os_calls[name] = os_calls.get(name, 0) + count
+        for name, start, end in ranges:
+            total = sum(self.counts[start:end])
+            if total:
+                constructs[name] = total
+        estimated = self.steps + sum(count * (costs.get(name, 1) - 1) for name, count in os_calls.items())
+        by_count = lambda counts: dict(sorted(counts.items(), key=lambda item: -item[1]))
+        return {'steps': self.steps, 'estimated_steps': estimated, 'functions': by_count(functions),
+                'commands': by_count(kinds), 'constructs': by_count(constructs), 'os_calls': by_count(os_calls),
+                'output': ''.join(self.output)}
+
+
+def os_functions(emulator):
+    """
+    Return the Python stand-ins of the Jack OS functions that the loaded program does not define itself.
+    :param emulator: VMEmulator
+    :return: dict of function name: callable taking the VM arguments and returning the VM return value
+    """
+    ram = emulator.ram
+    strings = emulator.strings
+    output = emulator.output
+    heap = {'free': [(HEAP, SCREEN - HEAP)]}
+    sizes = {}
+
+    def alloc(size):
+        size = max(size, 1)
+        for i, (start, length) in enumerate(heap['free']):
+            if length >= size:
+                if length == size:
+                    heap['free'].pop(i)
+                else:
+                    heap['free'][i] = (start + size, length - size)
+                sizes[start] = size
+                return start
+        raise RuntimeError("Memory.alloc: heap overflow")
+
+    def de_alloc(address):
+        size = sizes.pop(address, None)
+        if size is not None:
+            heap['free'].append((address, size))
+            strings.pop(address, None)
+        return 0
+
+    def string_new(max_length):
+        address = alloc(max_length + 1)
+        strings[address] = []
+        return address
+
+    def string_of(address):
+        if address not in strings:
+            raise RuntimeError(f"String operation on a non String object {address}")
+        return strings[address]
+
+    def append_char(address, char):
+        string_of(address).append(char)
+        return address
+
+    def set_char_at(address, index, char):
+        string_of(address)[index] = char
+        return 0
+
+    def erase_last_char(address):
+        string_of(address).pop()
+        return 0
+
+    def int_value(address):
+        text = ''.join(map(chr, string_of(address)))
+        match = re.match(r'-?\d*', text).group()
+        return int(match) if match not in ('', '-') else 0
+
+    def set_int(address, value):
+        strings[address] = [ord(char) for char in str(value)]
+        return 0
+
+    def divide(x, y):
+        if y == 0:
+            raise RuntimeError("Math.divide: division by zero")
+        quotient = abs(x) // abs(y)
+        return quotient if (x < 0) == (y < 0) else -quotient
+
+    def sqrt(x):
+        if x < 0:
+            raise RuntimeError("Math.sqrt: negative argument")
+        return int(x ** 0.5)
+
+    def print_char(char):
+        output.append('\n' if char == 128 else chr(char))
+        return 0
+
+    def print_string(address):
+        output.append(''.join(map(chr, string_of(address))))
+        return 0
+
+    def halt():
+        emulator.halted = True
+        return 0
+
+    def error(code):
+        raise RuntimeError(f"Sys.error {code}")
+
+    def sys_init():
+        raise RuntimeError("Sys.init stand-in cannot be called, run Main.main instead")
+
+    def noop(*args):
+        return 0
+
+    functions = {
+        'Math.init': noop, 'Math.abs': abs, 'Math.multiply': lambda x, y: x * y, 'Math.divide': divide,
+        'Math.min': min, 'Math.max': max, 'Math.sqrt': sqrt,
+        'Memory.init': noop, 'Memory.peek': lambda address: ram[address],
+        'Memory.poke': lambda address, value: ram.__setitem__(address, value), 'Memory.alloc': alloc,
+        'Memory.deAlloc': de_alloc,
+        'Array.new': alloc, 'Array.dispose': de_alloc,
+        'String.new': string_new, 'String.dispose': de_alloc, 'String.length': lambda address: len(string_of(address)),
+        'String.charAt': lambda address, index: string_of(address)[index], 'String.setCharAt': set_char_at,
+        'String.appendChar': append_char, 'String.eraseLastChar': erase_last_char, 'String.intValue': int_value,
+        'String.setInt': set_int, 'String.backSpace': lambda: 129, 'String.doubleQuote': lambda: 34,
+        'String.newLine': lambda: 128,
+        'Output.init': noop, 'Output.moveCursor': noop, 'Output.printChar': print_char,
+        'Output.printString': print_string, 'Output.printInt': lambda value: output.append(str(value)),
+        'Output.println': lambda: output.append('\n'), 'Output.backSpace': noop,
+        'Screen.init': noop, 'Screen.clearScreen': noop, 'Screen.setColor': noop, 'Screen.drawPixel': noop,
+        'Screen.drawLine': noop, 'Screen.drawRectangle': noop, 'Screen.drawCircle': noop,
+        'Keyboard.init': noop, 'Keyboard.keyPressed': noop, 'Keyboard.readChar': noop,
+        'Keyboard.readLine': lambda message: string_new(0), 'Keyboard.readInt': noop,
+        'Sys.init': sys_init, 'Sys.halt': halt, 'Sys.error': error, 'Sys.wait': noop,
+    }
+    return {name: function for name, function in functions.items() if name not in emulator.functions}
+
+
+def main(argv=None):
+    """
+    Run a compiled directory and print its instruction counts.
+    :param argv: list of command line arguments, defaults to sys.argv
+    :return: exit status
+    """
+    parser = argparse.ArgumentParser(description="Run Hack VM code and count the executed VM commands.")
+    parser.add_argument('path', help=".vm file or directory of .vm files, such as a my_jack output directory")
+    parser.add_argument('--entry', help="function to start from (default: Sys.init if defined, else Main.main)")
+    parser.add_argument('--max-steps', type=int, default=100_000_000, help="stop after this many VM commands")
+    parser.add_argument('--json', metavar='FILE', help="write the report as JSON to FILE ('-' for stdout)")
+    parser.add_argument('--top', type=int, default=15, help="number of functions and constructs listed")
+    parser.add_argument('--os-cost', action='append', default=[], metavar='NAME=N',
+                        help="estimated VM commands per call of an OS function, overriding os_costs")
+    args = parser.parse_args(argv)
+
+    costs = dict(os_costs)
+    for option in args.os_cost:
+        name, _, cost = option.partition('=')
+        if not cost.isdigit():
+            parser.error(f"--os-cost expects NAME=N, got {option}")
+        costs[name] = int(cost)
+
+    emulator = VMEmulator()
+    emulator.load_directory(args.path)
+    emulator.run(args.entry, args.max_steps)
+    report = emulator.report(costs)
+    if args.json:
+        text = json.dumps(report, indent=2)
+        if args.json == '-':
+            print(text)
+            return 0
+        with open(args.json, 'w') as json_file:
+            json_file.write(text + '\n')
+
+    print(report['output'], end='' if report['output'].endswith('\n') or not report['output'] else '\n')
+    print(f"{report['steps']} VM commands executed, {report['estimated_steps']} with the estimated OS costs")
+    for title in ('functions', 'commands', 'constructs', 'os_calls'):
+        print(f"\n{title}:")
+        for name, count in list(report[title].items())[:args.top]:
+            print(f"  {count:>12}  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
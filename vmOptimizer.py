@@ -0,0 +1,154 @@
+"""
+Peephole optimizer over the VM commands buffered by VMWritter. Each rule matches a short window of commands and
+rewrites it into a shorter equivalent sequence. Rules are checked against the tail of the optimized output every time a
+command is appended, so rewrites cascade (ie `push constant 1; neg; not; if-goto L` first becomes
+`push constant 0; if-goto L`, which is then removed).
+
+Rules rely on the code CodeGenerator generates: temp 0 is only used as scratch, always written before it is read.
+"""
+
+from collections import Counter
+
+# segments whose value does not depend on pointer 1
+stable_segments = ('constant', 'argument', 'local', 'static', 'this', 'temp')
+
+
+class Rule:
+    """A named rewrite of a window of size commands, triggered when the last command starts with one of last."""
+    __slots__ = ('name', 'size', 'last', 'rewrite')
+
+    def __init__(self, name, size, last, rewrite):
+        self.name = name
+        self.size = size
+        self.last = last
+        self.rewrite = rewrite
+
+
+def is_push_constant(command):
+    return command.startswith('push constant ')
+
+
+def double_negation(window):
+    """not; not and neg; neg cancel out."""
+    if window[0] == window[1]:
+        return []
+
+
+def negated_constant(window):
+    """~(-1) and -0 are the constant 0."""
+    if window == ['push constant 1', 'neg', 'not'] or window[-2:] == ['push constant 0', 'neg']:
+        return window[:-3] + ['push constant 0']
+
+
+def constant_if_goto(window):
+    """if-goto on a constant is either never or always taken."""
+    *condition, jump = window
+    if condition in (['push constant 1', 'neg'], ['push constant 0', 'not']):
+        return ['goto' + jump[7:]]
+
+
+def constant_if_goto_single(window):
+    condition, jump = window
+    if is_push_constant(condition):
+        return [] if condition == 'push constant 0' else ['goto' + jump[7:]]
+
+
+def goto_next_label(window):
+    """a jump to the label right after it falls through."""
+    if window[0].startswith('goto ') and window[0][5:] == window[1][6:]:
+        return [window[1]]
+
+
+def temp_round_trip(window):
+    """pop temp 0; push temp 0 leaves the stack unchanged, and temp 0 is scratch."""
+    if window == ['pop temp 0', 'push temp 0']:
+        return []
+
+
+def array_store_simple_value(window):
+    """
+    let a[i] = value, when value is a single push that does not depend on pointer 1, can set pointer 1 first and
+    push the value straight into that 0 instead of going through temp 0.
+    """
+    value, *rest = window
+    if rest == ['pop temp 0', 'pop pointer 1', 'push temp 0', 'pop that 0'] and value.startswith('push '):
+        if value.split()[1] in stable_segments:
+            return ['pop pointer 1', value, 'pop that 0']
+
+
+def add_zero(window):
+    """x + 0 and x - 0 are x."""
+    if window[0] == 'push constant 0':
+        return []
+
+
+def unreachable(window):
+    """commands after goto or return are unreachable until the next label."""
+    if window[0] == 'return' or window[0].startswith('goto '):
+        return [window[0]]
+
+
+peephole_rules = (
+    Rule('double-negation', 2, ('not', 'neg'), double_negation),
+    Rule('negated-constant', 3, ('not',), negated_constant),
+    Rule('negated-constant', 2, ('neg',), negated_constant),
+    Rule('constant-if-goto', 3, ('if-goto',), constant_if_goto),
+    Rule('constant-if-goto', 2, ('if-goto',), constant_if_goto_single),
+    Rule('goto-next-label', 2, ('label',), goto_next_label),
+    Rule('temp-round-trip', 2, ('push',), temp_round_trip),
+    Rule('array-store-simple-value', 5, ('pop',), array_store_simple_value),
+    Rule('add-zero', 2, ('add', 'sub'), add_zero),
+    Rule('unreachable', 2, ('push', 'pop', 'add', 'sub', 'neg', 'eq', 'gt', 'lt', 'and', 'or', 'not', 'goto',
+                            'if-goto', 'call', 'return'), unreachable),
+)
+
+
+class PeepholeOptimizer:
+
+    def __init__(self, rules=peephole_rules):
+        """
+        Initialize PeepholeOptimizer with a rule set.
+        :param rules: iterable of Rule
+        """
+        self.rules = {}  # first word of the last command: rules it triggers
+        for rule in rules:
+            for last in rule.last:
+                self.rules.setdefault(last, []).append(rule)
+        self.hits = Counter()
+
+    def optimize(self, instructions):
+        """
+        Rewrite a list of VM commands.
+        :param instructions: list of VM command strings
+        :return: optimized list of VM command strings
+        """
+        output = []
+        rules = self.rules
+        for instruction in instructions:
+            output.append(instruction)
+            candidates = rules.get(instruction.split(' ', 1)[0])
+            while candidates:
+                for rule in candidates:
+                    size = rule.size
+                    if len(output) < size:
+                        continue
+                    replacement = rule.rewrite(output[-size:])
+                    if replacement is not None:
+                        output[-size:] = replacement
+                        self.hits[rule.name] += 1
+                        break
+                else:
+                    break
+                candidates = rules.get(output[-1].split(' ', 1)[0]) if output else None
+        return output
+
+
+def optimizer(level):
+    """
+    Return the optimizer of an optimization level.
+    :param level: 0 for no optimization, 1 for the peephole rules
+    :return: PeepholeOptimizer or None
+    """
+    if level >= 1:
+        return PeepholeOptimizer()
+    return None
@@ -0,0 +1,213 @@
+"""
+Whole-program passes over the .vm files of a project, run once every class of the project is compiled. Classes are
+compiled independently, so only here are all the subroutines of a program known at once.
+"""
+
+import collections
+
+# entry points of a program, Sys.init is only defined when the project brings its own OS
+entry_points = ('Sys.init', 'Main.main')
+
+
+def read_functions(vm_path):
+    """
+    Split a .vm file into its functions.
+    :param vm_path: os path of a .vm file
+    :return: dict of function name to its list of VM commands, starting with the function command, in file order
+    """
+    functions = {}
+    commands = None
+    with open(vm_path, 'r') as vm_file:
+        for line in vm_file:
+            command = line.split('//', 1)[0].strip()
+            if not command:
+                continue
+            if command.startswith('function '):
+                commands = functions[command.split()[1]] = []
+            if commands is None:
+                raise TypeError(f"{vm_path}: command outside of a function: {command}")
+            commands.append(command)
+    return functions
+
+
+def write_functions(vm_path, functions):
+    """
+    Write functions to a .vm file.
+    :param vm_path: os path of a .vm file
+    :param functions: dict of function name to its list of VM commands
+    :return:
+    """
+    with open(vm_path, 'w') as vm_file:
+        vm_file.write(''.join('\n'.join(commands) + '\n' for commands in functions.values()))
+
+
+def call_graph(program):
+    """
+    Collect the call targets of every function of a program.
+    :param program: dict of .vm path to its functions, as returned by read_functions
+    :return: dict of function name to the set of the names it calls, OS functions included
+    """
+    graph = {}
+    for functions in program.values():
+        for name, commands in functions.items():
+            graph[name] = {command.split()[1] for command in commands if command.startswith('call ')}
+    return graph
+
+
+def reachable(graph, roots):
+    """
+    Return the functions reachable from roots in a call graph.
+    :param graph: dict of function name to the set of the names it calls
+    :param roots: names of the entry points
+    :return: set of the reachable function names defined in graph
+    """
+    seen = set()
+    queue = collections.deque(root for root in roots if root in graph)
+    while queue:
+        name = queue.popleft()
+        if name in seen:
+            continue
+        seen.add(name)
+        queue.extend(callee for callee in graph[name] if callee in graph and callee not in seen)
+    return seen
+
+
+def eliminate_dead_subroutines(vm_paths, roots=entry_points):
+    """
+    Drop the functions no entry point of the program can call from the .vm files of a project, rewriting the files in
+    place. Nothing is removed from a project without any entry point, such as a library of classes.
+    :param vm_paths: os paths of every .vm file of the project
+    :param roots: names of the entry points
+    :return: dict of removed (list of (function name, number of VM commands)), commands (number of VM commands before
+    the pass) and saved (number of VM commands removed)
+    """
+    program = {vm_path: read_functions(vm_path) for vm_path in vm_paths}
+    graph = call_graph(program)
+    live = reachable(graph, roots)
+    removed = []
+    commands = 0
+    for vm_path, functions in program.items():
+        commands += sum(len(body) for body in functions.values())
+        dead = [name for name in functions if name not in live]
+        if not live or not dead:
+            continue
+        for name in dead:
+            removed.append((name, len(functions.pop(name))))
+        write_functions(vm_path, functions)
+    return {'removed': removed, 'commands': commands, 'saved': sum(size for name, size in removed)}
+
+
+def inline_template(commands, max_size):
+    """
+    Return how a function can be inlined at its call sites, if it is small enough and safe to inline: a leaf without
+    locals, labels or calls, returning only at its end. Inlined arguments live in temp 1.., so the function must not use
+    them itself. Inlined methods address their object through pointer 1, so they must not use that.
+    :param commands: VM commands of the function, starting with the function command
+    :param max_size: largest number of body commands inlined, the method prologue and return excluded
+    :return: tuple of (method, body) where body is the list of commands to inline, or None
+    """
+    if commands[0].split()[2] != '0' or commands[-1] != 'return' or 'return' in commands[1:-1]:
+        return None
+    method = commands[1:3] == ['push argument 0', 'pop pointer 0']
+    body = commands[3 if method else 1:-1]
+    if len(body) > max_size:
+        return None
+    for command in body:
+        words = command.split()
+        if words[0] in ('label', 'goto', 'if-goto', 'call', 'function'):
+            return None
+        if len(words) == 3:
+            segment, index = words[1], words[2]
+            if segment == 'temp' and index != '0':
+                return None
+            if method and (segment == 'that' or segment == 'pointer' and (index == '1' or words[0] == 'pop')):
+                return None
+            if not method and (segment == 'this' or segment == 'pointer' and index == '0'):
+                return None
+    return method, body
+
+
+def expand_call(method, body, arg_count):
+    """
+    Return the commands replacing a call of an inlined function, its arguments being on the stack already.
+    :param method: True if the function is a method
+    :param body: commands to inline, from inline_template
+    :param arg_count: number of arguments of the call, the object included for methods
+    :return: list of VM commands, or None if the arguments do not fit in the temp segment
+    """
+    # argument i is kept in temp i + 1 for functions; the object of methods goes to pointer 1, argument i to temp i
+    first_temp = 0 if method else 1
+    if arg_count + first_temp > 8:
+        return None
+    arguments = {str(i): ('pointer', '1') if method and i == 0 else ('temp', str(i + first_temp))
+                 for i in range(arg_count)}
+    reads = [command for command in body if ' argument ' in command]
+    in_order = [f'push argument {i}' for i in range(arg_count)]
+    if not method and body[:arg_count] == in_order and len(reads) == arg_count:
+        # the body starts by pushing every argument once in order: they are on the stack already
+        return body[arg_count:]
+
+    expanded = [f'pop {segment} {index}' for segment, index in
+                (arguments[str(i)] for i in reversed(range(arg_count)))]
+    for command in body:
+        action, *operand = command.split()
+        if operand:
+            segment, index = operand
+            if segment == 'argument':
+                if index not in arguments:
+                    return None
+                segment, index = arguments[index]
+            elif method and segment == 'this':
+                segment = 'that'
+            elif method and segment == 'pointer':
+                index = '1'
+            command = f'{action} {segment} {index}'
+        expanded.append(command)
+    return expanded
+
+
+def inline_subroutines(vm_paths, max_size):
+    """
+    Inline the small leaf functions and methods of a project at their call sites across all its .vm files, rewriting
+    the files in place. Inlined functions keep their definitions, so calls that are not inlined still link.
+    :param vm_paths: os paths of every .vm file of the project
+    :param max_size: largest number of body commands of an inlined function, see inline_template
+    :return: dict of inlined (collections.Counter of function name to the number of inlined call sites), commands
+    (number of VM commands before the pass) and saved (number of VM commands removed, negative if the code grew)
+    """
+    program = {vm_path: read_functions(vm_path) for vm_path in vm_paths}
+    templates = {}  # function name: (class name, inline_template)
+    for functions in program.values():
+        for name, commands in functions.items():
+            template = inline_template(commands, max_size)
+            if template is not None:
+                templates[name] = name.split('.', 1)[0], template
+
+    inlined = collections.Counter()
+    before = after = 0
+    for vm_path, functions in program.items():
+        changed = False
+        for name, commands in functions.items():
+            class_name = name.split('.', 1)[0]
+            output = []
+            for command in commands:
+                expanded = None
+                if command.startswith('call '):
+                    callee, arg_count = command.split()[1:]
+                    if callee in templates and callee != name:
+                        callee_class, (method, body) = templates[callee]
+                        # static segments belong to the .vm file of the class
+                        if callee_class == class_name or not any(' static ' in line for line in body):
+                            expanded = expand_call(method, body, int(arg_count))
+                if expanded is None:
+                    output.append(command)
+                else:
+                    output += expanded
+                    inlined[callee] += 1
+                    changed = True
+            before += len(commands)
+            after += len(output)
+            functions[name] = output
+        if changed:
+            write_functions(vm_path, functions)
+    return {'inlined': inlined, 'commands': before, 'saved': before - after}
@@ -0,0 +1,222 @@
+"""
+Writes the parse tree of a Jack class as XML, one of the two back ends over the AST built by CompilationEngline.
+"""
+
+import jackAST
+import tokenizer
+
+
+def keyword(value):
+    return f'<keyword>{value}</keyword>\n'
+
+
+def symbol(value):
+    return f'<symbol>{tokenizer.special_symbols.get(value, value)}</symbol>\n'
+
+
+def identifier(value):
+    return f'<identifier>{value}</identifier>\n'
+
+
+def type_name(value):
+    """a type is either a keyword (int, char, boolean, void) or a className"""
+    return keyword(value) if value in tokenizer.keyword_set else identifier(value)
+
+
+class XMLWriter:
+
+    def __init__(self, compile_file):
+        """
+        Initialize XMLWriter with the file object passed in.
+        :param compile_file: file object for the .xml output
+        """
+        self.compile_file = compile_file
+        self.lines = []
+        self.statements = {
+            jackAST.LetStatement: self.writeLet,
+            jackAST.IfStatement: self.writeIf,
+            jackAST.WhileStatement: self.writeWhile,
+            jackAST.DoStatement: self.writeDo,
+            jackAST.ReturnStatement: self.writeReturn,
+        }
+
+    def writeClass(self, node):
+        """
+        writes a complete class, then the whole XML to compile_file in a single write.
+        :param node: jackAST.Class
+        :return:
+        """
+        write = self.lines.append
+        write('<class>\n')
+        write(keyword('class'))
+        write(identifier(node.name))
+        write(symbol('{'))
+        for class_var in node.class_vars:
+            write('<classVarDec>\n')
+            write(keyword(class_var.kind))
+            self.writeNames(class_var.type, class_var.names)
+            write('</classVarDec>\n')
+        for subroutine in node.subroutines:
+            self.writeSubroutine(subroutine)
+        write(symbol('}'))
+        write('</class>\n')
+        self.compile_file.write(''.join(self.lines))
+        self.lines = []
+
+    def writeNames(self, type, names):
+        """writes type varName (, varName)* ;"""
+        write = self.lines.append
+        write(type_name(type))
+        write(identifier(names[0]))
+        for name in names[1:]:
+            write(symbol(','))
+            write(identifier(name))
+        write(symbol(';'))
+
+    def writeSubroutine(self, node):
+        write = self.lines.append
+        write('<subroutineDec>\n')
+        write(keyword(node.kind))
+        write(type_name(node.return_type))
+        write(identifier(node.name))
+        write(symbol('('))
+        write('<parameterList>\n')
+        for i, (type, name) in enumerate(node.parameters):
+            if i:
+                write(symbol(','))
+            write(type_name(type))
+            write(identifier(name))
+        write('</parameterList>\n')
+        write(symbol(')'))
+        write('<subroutineBody>\n')
+        write(symbol('{'))
+        for var_dec in node.var_decs:
+            write('<varDec>\n')
+            write(keyword('var'))
+            self.writeNames(var_dec.type, var_dec.names)
+            write('</varDec>\n')
+        self.writeStatements(node.statements)
+        write(symbol('}'))
+        write('</subroutineBody>\n')
+        write('</subroutineDec>\n')
+
+    def writeStatements(self, statements):
+        write = self.lines.append
+        write('<statements>\n')
+        for statement in statements:
+            self.statements[type(statement)](statement)
+        write('</statements>\n')
+
+    def writeBlock(self, statements):
+        """writes { statements }"""
+        self.lines.append(symbol('{'))
+        self.writeStatements(statements)
+        self.lines.append(symbol('}'))
+
+    def writeLet(self, node):
+        write = self.lines.append
+        write('<letStatement>\n')
+        write(keyword('let'))
+        write(identifier(node.name))
+        if node.index is not None:
+            write(symbol('['))
+            self.writeExpression(node.index)
+            write(symbol(']'))
+        write(symbol('='))
+        self.writeExpression(node.value)
+        write(symbol(';'))
+        write('</letStatement>\n')
+
+    def writeIf(self, node):
+        write = self.lines.append
+        write('<ifStatement>\n')
+        write(keyword('if'))
+        self.writeCondition(node.condition)
+        self.writeBlock(node.statements)
+        if node.else_statements is not None:
+            write(keyword('else'))
+            self.writeBlock(node.else_statements)
+        write('</ifStatement>\n')
+
+    def writeWhile(self, node):
+        write = self.lines.append
+        write('<whileStatement>\n')
+        write(keyword('while'))
+        self.writeCondition(node.condition)
+        self.writeBlock(node.statements)
+        write('</whileStatement>\n')
+
+    def writeCondition(self, condition):
+        """writes ( expression )"""
+        self.lines.append(symbol('('))
+        self.writeExpression(condition)
+        self.lines.append(symbol(')'))
+
+    def writeDo(self, node):
+        write = self.lines.append
+        write('<doStatement>\n')
+        write(keyword('do'))
+        self.writeCall(node.call)
+        write(symbol(';'))
+        write('</doStatement>\n')
+
+    def writeReturn(self, node):
+        write = self.lines.append
+        write('<returnStatement>\n')
+        write(keyword('return'))
+        if node.value is not None:
+            self.writeExpression(node.value)
+        write(symbol(';'))
+        write('</returnStatement>\n')
+
+    def writeCall(self, node):
+        write = self.lines.append
+        if node.receiver is not None:
+            write(identifier(node.receiver))
+            write(symbol('.'))
+        write(identifier(node.name))
+        write(symbol('('))
+        write('<expressionList>\n')
+        for i, argument in enumerate(node.arguments):
+            if i:
+                write(symbol(','))
+            self.writeExpression(argument)
+        write('</expressionList>\n')
+        write(symbol(')'))
+
+    def writeExpression(self, node):
+        write = self.lines.append
+        write('<expression>\n')
+        self.writeTerm(node.term)
+        for operator, term in node.operations:
+            write(symbol(operator))
+            self.writeTerm(term)
+        write('</expression>\n')
+
+    def writeTerm(self, node):
+        write = self.lines.append
+        write('<term>\n')
+        kind = type(node)
+        if kind is jackAST.VarName:
+            write(identifier(node.name))
+        elif kind is jackAST.IntegerConstant:
+            write(f'<integerConstant>{node.text}</integerConstant>\n')
+        elif kind is jackAST.SubroutineCall:
+            self.writeCall(node)
+        elif kind is jackAST.ArrayAccess:
+            write(identifier(node.name))
+            write(symbol('['))
+            self.writeExpression(node.index)
+            write(symbol(']'))
+        elif kind is jackAST.StringConstant:
+            write(f'<stringConstant>{node.value}</stringConstant>\n')
+        elif kind is jackAST.KeywordConstant:
+            write(keyword(node.value))
+        elif kind is jackAST.ParenExpression:
+            write(symbol('('))
+            self.writeExpression(node.expression)
+            write(symbol(')'))
+        else:  # UnaryOp
+            write(symbol(node.operator))
+            self.writeTerm(node.term)
+        write('</term>\n')